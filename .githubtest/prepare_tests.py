@@ -29,5 +29,5 @@ internal_configs.dumpAllDCFG(
 # Directories for test result
 import os
 test_result = "test_0"
-for i in range(1, 5):
+for i in range(1, 9):
     os.makedirs(test_result + str(i))
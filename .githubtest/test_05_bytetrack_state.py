@@ -0,0 +1,85 @@
+#################################################################################
+# Test 05: Tracker ByteTrack & State snapshot (CPU-Only)
+#################################################################################
+
+import cv2
+import copy
+import numpy as np
+
+from pyppbox.standalone import MT
+from pyppbox.utils.statetools import saveState, loadState
+
+
+mydetector={
+    'dt_name': 'GT', # Use the ground-truth -> No model is needed
+    'gt_file': '../examples/data/gta.mp4.txt', # Set path of ground-truth text file
+    'gt_map_file': '../examples/data/gt_map.txt' # Set path of Video:GT mapping text file
+}
+
+# GT people have `det_conf=0.5` -> Lower the thresholds to start the tracks
+mytracker={
+    'tk_name': 'ByteTrack', 
+    'track_thresh': 0.4, 
+    'low_thresh': 0.1, 
+    'new_track_thresh': 0.45, 
+    'match_thresh': 0.8, 
+    'track_buffer': 30
+}
+
+def newMT():
+    ppbmt = MT()
+    ppbmt.setMainDetector(detector=mydetector)
+    ppbmt.setMainTracker(tracker=mytracker)
+    ppbmt.setMainReIDer(reider="None")
+    return ppbmt
+
+def getIDs(people):
+    return [(p.cid, [round(float(v), 3) for v in p.box_xyxy]) for p in people]
+
+input_video = "../examples/data/gta.mp4"
+cap = cv2.VideoCapture(input_video)
+
+ppbmt = newMT()
+frames = []
+detections = []
+stop_after = 20 # Stop the test after 20 frames
+
+while cap.isOpened():
+    hasFrame, frame = cap.read()
+
+    if hasFrame:
+        detected_people, _ = ppbmt.detectPeople(frame, img_is_mat=True, visual=False)
+        frames.append(frame)
+        detections.append(detected_people)
+        if len(frames) == stop_after:
+            break
+    else:
+        break
+cap.release()
+
+# Track the first half, and save the snapshot of MT
+resume_at = stop_after // 2
+for frame, detected_people in zip(frames[:resume_at], detections[:resume_at]):
+    ppbmt.trackPeople(frame, copy.deepcopy(detected_people), img_is_mat=True)
+saveState(ppbmt.getState(), "test_05/state.npz")
+
+# Track the second half without interruption
+expected = []
+for frame, detected_people in zip(frames[resume_at:], detections[resume_at:]):
+    tracked_people = ppbmt.trackPeople(frame, copy.deepcopy(detected_people), img_is_mat=True)
+    expected.append(getIDs(tracked_people))
+
+# Resume the second half from the saved snapshot by a new MT
+resumed_mt = newMT()
+resumed_mt.setState(loadState("test_05/state.npz"))
+for i, (frame, detected_people) in enumerate(zip(frames[resume_at:], detections[resume_at:])):
+    tracked_people = resumed_mt.trackPeople(frame, copy.deepcopy(detected_people), img_is_mat=True)
+    assert getIDs(tracked_people) == expected[i], "Resumed tracking differs at frame " + str(resume_at + i)
+
+# Both MTs must end with the same tracker state, e.g. the same frame count and track ages
+state, resumed_state = ppbmt.getState(), resumed_mt.getState()
+assert state.keys() == resumed_state.keys(), "Resumed state has different keys"
+for key in state:
+    assert np.array_equal(state[key], resumed_state[key]), "Resumed state differs at '" + key + "'"
+assert sum(len(ids) for ids in expected) > 0, "ByteTrack did not track anybody"
+print("Test 05: ByteTrack resumed " + str(len(expected)) + " frames from the snapshot")
@@ -0,0 +1,49 @@
+#################################################################################
+# Test 06: Model pool (CPU-Only) -> Size estimation & LRU eviction by budget
+#################################################################################
+
+import gc
+import os
+
+from pyppbox.modules.modelpool import ModelPool
+
+
+class FakeCFG(object):
+    def __init__(self, document):
+        self.document = document
+    def getDocument(self):
+        return self.document
+
+class FakeModel(object):
+    def __init__(self, cfg):
+        self.cfg = cfg
+
+
+# Two fake weight files of 2 MB, and a dataset folder which is not model memory
+os.makedirs("test_06/dataset", exist_ok=True)
+for name in ["test_06/weights_a.bin", "test_06/weights_b.bin", "test_06/dataset/image.bin"]:
+    with open(name, "wb") as f:
+        f.write(b"\0" * (2 * 1024 * 1024))
+
+# A path relative to the pyppbox root, as written by the configuration files
+pool = ModelPool(max_idle=2, max_memory_mb=0)
+relative = pool.acquire(FakeModel, FakeCFG({'model_file': 'config/cfg/reiders.yaml'}))
+assert pool.getInfo()[0]['size_mb'] > 0, "The relative model file is not measured"
+del relative
+gc.collect()
+
+# The weights are measured, the train_data folder is not
+pool = ModelPool(max_idle=2, max_memory_mb=3)
+model_a = pool.acquire(FakeModel, FakeCFG({'model_file': os.path.abspath("test_06/weights_a.bin"), 
+                                           'train_data': os.path.abspath("test_06/dataset")}))
+size_a = pool.getInfo()[0]['size_mb']
+assert abs(size_a - 2.0) < 0.01, "Unexpected size_mb=" + str(size_a)
+
+# Releasing A makes it idle, loading B exceeds the 3 MB budget -> A is evicted
+del model_a
+gc.collect()
+assert [e['idle'] for e in pool.getInfo()] == [True], "The released model is not idle"
+model_b = pool.acquire(FakeModel, FakeCFG({'model_file': os.path.abspath("test_06/weights_b.bin")}))
+info = pool.getInfo()
+assert len(info) == 1 and not info[0]['idle'], "The idle model is not evicted: " + str(info)
+print("Test 06: Model pool sizes and eviction are correct")
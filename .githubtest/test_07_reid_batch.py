@@ -0,0 +1,29 @@
+#################################################################################
+# Test 07: ReID batch mode (CPU-Only) -> `batch=True` is the same as `batch=False`
+#################################################################################
+
+import copy
+
+from pyppbox.standalone import MT
+
+
+ppbmt = MT()
+ppbmt.setMainModules(main_yaml={'detector': 'YOLO_Ultralytics', 
+                                'tracker': 'None', 
+                                'reider': 'FaceNet'})
+
+image = "../examples/data/gta.jpg"
+detected_people, _ = ppbmt.detectPeople(image, visual=False)
+assert len(detected_people) > 0, "Nobody is detected"
+
+# Re-identify the same people per person and in a batch, without deduplicating
+single_people, single_count = ppbmt.reidPeople(image, copy.deepcopy(detected_people), 
+                                               deduplicate=False, batch=False)
+batch_people, batch_count = ppbmt.reidPeople(image, copy.deepcopy(detected_people), 
+                                             deduplicate=False, batch=True)
+
+assert single_count == batch_count, str(single_count) + " != " + str(batch_count)
+for single, batch in zip(single_people, batch_people):
+    assert single.faceid == batch.faceid, single.faceid + " != " + batch.faceid
+    assert abs(single.faceid_conf - batch.faceid_conf) < 1e-3, "Different confidences"
+print("Test 07: " + str(len(batch_people)) + " people have the same IDs in batch mode")
@@ -0,0 +1,60 @@
+#################################################################################
+# Test 08: ByteTrack low score association (CPU-Only)
+#################################################################################
+
+import numpy as np
+
+from pyppbox.standalone import MT
+from pyppbox.utils.persontools import Person
+
+
+def newTrackingMT(low_thresh):
+    ppbmt = MT()
+    ppbmt.setMainTracker(tracker={'tk_name': 'ByteTrack',
+                                  'track_thresh': 0.5,
+                                  'low_thresh': low_thresh,
+                                  'new_track_thresh': 0.6,
+                                  'match_thresh': 0.8,
+                                  'track_buffer': 30})
+    return ppbmt
+
+def newPerson(x, det_conf):
+    box_xyxy = np.array([x, 100, x + 80, 300])
+    box_xywh = np.array([x, 100, 80, 200])
+    return Person(0, 0, box_xywh=box_xywh, box_xyxy=box_xyxy,
+                  repspoint=(x + 40, 250), det_conf=det_conf)
+
+# One person walks with high detection confidences, then gets blurred with `det_conf=0.3`
+frame = np.zeros((480, 640, 3), dtype=np.uint8)
+det_confs = [0.9, 0.9, 0.9, 0.3, 0.3, 0.3]
+
+# The low score people are matched by the second stage when they are above `low_thresh`
+for low_thresh, kept in [(0.1, True), (0.35, False)]:
+    ppbmt = newTrackingMT(low_thresh)
+    cids = []
+    for i, det_conf in enumerate(det_confs):
+        detected_people = [newPerson(100 + 5 * i, det_conf)]
+        tracked_people = ppbmt.trackPeople(frame, detected_people, img_is_mat=True)
+        cids.append([p.cid for p in tracked_people])
+    if kept:
+        assert all(c == cids[0] for c in cids) and len(cids[0]) == 1, "Lost " + str(cids)
+    else:
+        assert all(len(c) == 0 for c in cids[3:]), "Tracked below low_thresh " + str(cids)
+
+# MT lowers the `conf` of the detector to `low_thresh` of ByteTrack -> Nobody of `conf` is dropped
+image = "../examples/data/gta.jpg"
+ppbmt = MT()
+ppbmt.setMainModules(main_yaml={'detector': 'YOLO_Ultralytics',
+                                'tracker': 'None',
+                                'reider': 'None'})
+detected_people, _ = ppbmt.detectPeople(image, visual=False)
+ppbmt.setMainModules(main_yaml={'detector': 'YOLO_Ultralytics',
+                                'tracker': 'ByteTrack',
+                                'reider': 'None'})
+low_people, _ = ppbmt.detectPeople(image, visual=False)
+
+boxes = set(tuple(p.box_xyxy.tolist()) for p in detected_people)
+low_boxes = set(tuple(p.box_xyxy.tolist()) for p in low_people)
+assert len(boxes) > 0 and boxes <= low_boxes, "People detected for ByteTrack are not a superset"
+print("Test 08: ByteTrack kept the low score people, " +
+      str(len(low_boxes - boxes)) + " more people detected for ByteTrack")
@@ -0,0 +1,23 @@
+#################################################################################
+# Example of using a pyppbox in a pipeline
+#################################################################################
+
+import cv2
+from pyppbox.standalone import MT, MTPipeline
+
+ppbmt = MT()
+ppbmt.setMainModules(main_yaml={'detector': 'YOLO_Classic',
+                                'tracker': 'SORT',
+                                'reider': 'Torchreid'})
+
+# Each stage (read, detect, track, reid, visual) runs in its own worker
+pipeline = MTPipeline(ppbmt, queue_size=4, visual=True)
+
+for frame_index, visualized_mat, reidentified_people, reid_count in pipeline.run("data/gta.mp4"):
+    cv2.imshow("pyppbox: example_14_pipeline.py", visualized_mat)
+    if frame_index % 100 == 0:
+        print("Queue depths:", pipeline.getQueueDepths())
+    if cv2.waitKey(1) & 0xFF == ord('q'):
+        break
+
+cv2.destroyAllWindows()
@@ -598,6 +598,76 @@ class TCFGSORT(BaseCGF):
             "iou_threshold": self.iou_threshold
         }
         return sort_doc
+
+
+class TCFGByteTrack(BaseCGF):
+
+    """
+    A class used to store the necessary configurations of tracker ByteTrack.
+
+    Attributes
+    ----------
+    tk_name : str
+        Configured name of tracker ByteTrack.
+    track_thresh : float
+        Parameter :obj:`track_thresh` of tracker ByteTrack.
+    low_thresh : float
+        Parameter :obj:`low_thresh` of tracker ByteTrack, which is also the detection 
+        confidence threshold of the main detector of :class:`pyppbox.standalone.MT` if it is 
+        lower than the :obj:`conf` of the detector.
+    new_track_thresh : float
+        Parameter :obj:`new_track_thresh` of tracker ByteTrack.
+    match_thresh : float
+        Parameter :obj:`match_thresh` of tracker ByteTrack.
+    track_buffer : int
+        Parameter :obj:`track_buffer` of tracker ByteTrack.
+    """
+
+    def set(self, input):
+        """
+        Set configurations according to :obj:`input`.
+
+        Parameters
+        ----------
+        input : str or dict
+            A YAML/JSON file path, or a raw/ready dictionary.
+        """
+        super().loadDoc(input)
+        if self.configs:
+            try:
+                self.tk_name = self.unified_strings.getUnifiedFormat(self.configs['tk_name'])
+                self.track_thresh = self.configs['track_thresh']
+                self.low_thresh = self.configs['low_thresh']
+                self.new_track_thresh = self.configs['new_track_thresh']
+                self.match_thresh = self.configs['match_thresh']
+                self.track_buffer = self.configs['track_buffer']
+                self.configs = self.getDocument()
+            except Exception as e:
+                msg = "TCFGByteTrack : set() -> " + str(e)
+                add_error_log(msg)
+                raise ValueError(msg)
+        else:
+            add_warning_log("TCFGByteTrack : set() -> The configuration is empty.")
+
+    def getDocument(self):
+        """
+        Return a configuration dictionary of a single document of the attributes which 
+        are the parameters of tracker ByteTrack.
+
+        Returns
+        -------
+        dict
+            A configuration dictionary of a single document of the configurations.
+        """
+        bytetrack_doc = {
+            "tk_name": self.tk_name,
+            "track_thresh": self.track_thresh,
+            "low_thresh": self.low_thresh,
+            "new_track_thresh": self.new_track_thresh,
+            "match_thresh": self.match_thresh,
+            "track_buffer": self.track_buffer
+        }
+        return bytetrack_doc
         
 
 class TCFGDeepSORT(BaseCGF):
@@ -617,6 +687,10 @@ class TCFGDeepSORT(BaseCGF):
         Parameter :obj:`max_cosine_distance` of tracker DeepSORT.
     model_file : str
         Path of model file for tracker DeepSORT.
+    encoder : str
+        Appearance encoder of tracker DeepSORT, :code:`'Default'` for the encoder of 
+        :attr:`model_file` or :code:`'Torchreid'` to reuse the embeddings of reider Torchreid. 
+        Optional, :code:`'Default'` if it is not configured.
     from_dir : str
         Path of the root directory, relative to path of :attr:`model_file`.
     """
@@ -659,6 +733,7 @@ class TCFGDeepSORT(BaseCGF):
                 self.nms_max_overlap = self.configs['nms_max_overlap']
                 self.max_cosine_distance = self.configs['max_cosine_distance']
                 self.model_file = getAdaptiveAbsPathFDS(self.from_dir, self.configs['model_file'])
+                self.encoder = self.configs.get('encoder', "Default")
                 self.configs = self.getDocument()
             except Exception as e:
                 msg = "TCFGDeepSORT : set() -> " + str(e)
@@ -681,7 +756,8 @@ class TCFGDeepSORT(BaseCGF):
             "nn_budget": self.nn_budget,
             "nms_max_overlap": self.nms_max_overlap,
             "max_cosine_distance": self.max_cosine_distance,
-            "model_file": normalizePathFDS(internal_root_dir, self.model_file)
+            "model_file": normalizePathFDS(internal_root_dir, self.model_file), 
+            "encoder": self.encoder
         }
         return deepsort_doc
 
@@ -705,6 +781,12 @@ class RCFGFaceNet(BaseCGF):
         Path of a pretrained model file for reider FaceNet.
     classifier_pkl : str
         Path of classifier PKL file.
+    classifier : str
+        Classifier of reider FaceNet, :code:`'SVC'` for the SVC classifier of 
+        :attr:`classifier_pkl` or :code:`'Gallery'` for the embedding gallery of the 
+        :code:`.npz` file named after :attr:`classifier_pkl`, see 
+        :class:`pyppbox.modules.reiders.reidtools.EmbeddingGallery`. Optional, :code:`'SVC'` 
+        if it is not configured.
     train_data : str
         Path of a data directory where there must be 2 or more sub-folders which 
         classify different people.
@@ -712,6 +794,10 @@ class RCFGFaceNet(BaseCGF):
         Parameter :obj:`batch_size` of reider FaceNet.
     min_confidence : float
         Mininum confidence of the prediction.
+    min_similarity : float
+        Minimum cosine similarity of the prediction of :code:`classifier: Gallery`, which is 
+        used instead of :attr:`min_confidence` because the similarities are not probabilities. 
+        Optional, :code:`0.5` if it is not configured.
     yl_h_calibration : list[int, int], default=[-125, 75]
         When YOLO is used as the detector, this list of :code:`[val_1, val_2]` and a :class:`Person`'s 
         respoint :code:`(X, Y)` are used to find the from-to :code:`Y` for cropping the face: 
@@ -720,6 +806,20 @@ class RCFGFaceNet(BaseCGF):
         When YOLO is used as the detector, this list of :code:`[val_1, val_2]` and a :class:`Person`'s 
         respoint :code:`(X, Y)` are used to find the from-to :code:`X` for cropping the face: 
         :code:`[..., X + val_1 : X + val_2]`.
+    face_locator : str
+        Face localization of reider FaceNet in :func:`reidPeople()`, :code:`'MTCNN'` to find the 
+        face in the head region, or :code:`'Keypoints'` to align the face by the pose keypoints 
+        of the detector, e.g. YOLO Ultralytics with a pose model, and fall back to MTCNN for 
+        the people without confident keypoints. Optional, :code:`'MTCNN'` if it is not 
+        configured.
+    min_keypoint_conf : float
+        Minimum confidence of the keypoints used by :code:`face_locator: Keypoints`. Optional, 
+        :code:`0.5` if it is not configured.
+    bulk_mtcnn : bool
+        Indicate whether the batch mode of :func:`reidPeople()` localizes the faces of all 
+        people by a single bulk MTCNN, which is faster in crowded scenes but may localize the 
+        faces slightly differently than the per-person MTCNN. Optional, :code:`False` if it is 
+        not configured.
     from_dir : str
         Path of the root directory, relative to path of :attr:`model_file`.
     """
@@ -763,11 +863,16 @@ class RCFGFaceNet(BaseCGF):
                 self.model_det = getAdaptiveAbsPathFDS(self.from_dir, self.configs['model_det'])
                 self.model_file = getAdaptiveAbsPathFDS(self.from_dir, self.configs['model_file'])
                 self.classifier_pkl = getAdaptiveAbsPathFDS(self.from_dir, self.configs['classifier_pkl'])
+                self.classifier = self.configs.get('classifier', "SVC")
                 self.train_data = getAdaptiveAbsPathFDS(self.from_dir, self.configs['train_data'])
                 self.batch_size = self.configs['batch_size']
                 self.min_confidence = self.configs['min_confidence']
+                self.min_similarity = self.configs.get('min_similarity', 0.5)
                 self.yl_h_calibration = self.configs['yl_h_calibration']
                 self.yl_w_calibration = self.configs['yl_w_calibration']
+                self.face_locator = self.configs.get('face_locator', "MTCNN")
+                self.min_keypoint_conf = self.configs.get('min_keypoint_conf', 0.5)
+                self.bulk_mtcnn = self.configs.get('bulk_mtcnn', False)
                 self.configs = self.getDocument()
             except Exception as e:
                 msg = "RCFGFaceNet : set() -> " + str(e)
@@ -791,11 +896,16 @@ class RCFGFaceNet(BaseCGF):
             "model_det": normalizePathFDS(internal_root_dir, self.model_det), 
             "model_file": normalizePathFDS(internal_root_dir, self.model_file),
             "classifier_pkl": normalizePathFDS(internal_root_dir, self.classifier_pkl),
+            "classifier": self.classifier,
             "train_data": normalizePathFDS(internal_root_dir, self.train_data),
             "batch_size": self.batch_size,
             "min_confidence": self.min_confidence,
+            "min_similarity": self.min_similarity,
             "yl_h_calibration": self.yl_h_calibration,
-            "yl_w_calibration": self.yl_w_calibration
+            "yl_w_calibration": self.yl_w_calibration,
+            "face_locator": self.face_locator,
+            "min_keypoint_conf": self.min_keypoint_conf,
+            "bulk_mtcnn": self.bulk_mtcnn
         }
         return facenet_doc
 
@@ -813,6 +923,12 @@ class RCFGTorchreid(BaseCGF):
         Configured name of reider Torchreid.
     classifier_pkl : str
         Path of classifier PKL file.
+    classifier : str
+        Classifier of reider Torchreid, :code:`'SVC'` for the SVC classifier of 
+        :attr:`classifier_pkl` or :code:`'Gallery'` for the embedding gallery of the 
+        :code:`.npz` file named after :attr:`classifier_pkl`, see 
+        :class:`pyppbox.modules.reiders.reidtools.EmbeddingGallery`. Optional, :code:`'SVC'` 
+        if it is not configured.
     train_data : str
         Path of a data directory where there must be 2 or more sub-folders which classify 
         different people.
@@ -822,6 +938,10 @@ class RCFGTorchreid(BaseCGF):
         Path of a pretrained model file for reider Torchreid.
     min_confidence : float
         Mininum confidence of the prediction.
+    min_similarity : float
+        Minimum cosine similarity of the prediction of :code:`classifier: Gallery`, which is 
+        used instead of :attr:`min_confidence` because the similarities are not probabilities. 
+        Optional, :code:`0.6` if it is not configured.
     device : str
         Parameter device for specifying a computing device.
     base_model_path : str
@@ -873,12 +993,14 @@ class RCFGTorchreid(BaseCGF):
                 self.ri_name = self.unified_strings.getUnifiedFormat(self.configs['ri_name'])
                 self.classifier_pkl = getAdaptiveAbsPathFDS(self.from_dir, 
                                                             self.configs['classifier_pkl'])
+                self.classifier = self.configs.get('classifier', "SVC")
                 self.train_data = getAdaptiveAbsPathFDS(self.from_dir, 
                                                         self.configs['train_data'])
                 self.model_name = self.configs['model_name']
                 self.model_path = getAdaptiveAbsPathFDS(self.from_dir, 
                                                         self.configs['model_path'])
                 self.min_confidence = self.configs['min_confidence']
+                self.min_similarity = self.configs.get('min_similarity', 0.6)
                 self.device = self.configs['device']
                 self.configs = self.getDocument()
                 self.base_model_path = getAdaptiveAbsPathFDS(
@@ -906,10 +1028,12 @@ class RCFGTorchreid(BaseCGF):
         torchreid_doc = {
             "ri_name": self.ri_name,
             "classifier_pkl": normalizePathFDS(internal_root_dir, self.classifier_pkl),
+            "classifier": self.classifier,
             "train_data": normalizePathFDS(internal_root_dir, self.train_data),
             "model_name": self.model_name,
             "model_path": normalizePathFDS(internal_root_dir, self.model_path),
             "min_confidence": self.min_confidence,
+            "min_similarity": self.min_similarity,
             "device": self.device
         }
         return torchreid_doc
@@ -933,7 +1057,7 @@ class MyCFGHeaders(object):
                 "# Main config:\n"
                 "###########################################################\n"
                 "# detector: None | YOLO_Classic | YOLO_Ultralytics | GT\n"
-                "# tracker: None | Centroid | SORT | DeepSORT\n"
+                "# tracker: None | Centroid | SORT | DeepSORT | ByteTrack\n"
                 "# reider: None | FaceNet | Torchreid\n"
                 "###########################################################\n")
         return header
@@ -1005,6 +1129,15 @@ class MyCFGHeaders(object):
                 "# nms_max_overlap: 0.5\n"
                 "# max_cosine_distance: 0.1\n"
                 "# model_file: data/modules/deepsort/mars-small128.pb\n"
+                "# encoder: Default # Default or Torchreid\n"
+                "###########################################################\n"
+                "# --- # ByteTrack\n"
+                "# tk_name: ByteTrack\n"
+                "# track_thresh: 0.5\n"
+                "# low_thresh: 0.1 # Also lowers the conf of the detector\n"
+                "# new_track_thresh: 0.6\n"
+                "# match_thresh: 0.8\n"
+                "# track_buffer: 30\n"
                 "###########################################################\n")
         return header
 
@@ -1025,19 +1158,26 @@ class MyCFGHeaders(object):
                 "# model_det: data/modules/facenet/models/det\n"
                 "# model_file: data/modules/facenet/models/20180402-114759/20180402-114759.pb\n"
                 "# classifier_pkl: data/modules/facenet/classifier/gta5.pkl\n"
+                "# classifier: SVC # SVC or Gallery\n"
                 "# train_data: data/datasets/GTA_V_DATASET/face_182x182\n"
                 "# batch_size: 1000\n"
                 "# min_confidence: 0.75\n"
+                "# min_similarity: 0.5 # Gallery only\n"
                 "# yl_h_calibration: [-125, 75]\n"
                 "# yl_w_calibration: [-55, 55]\n"
+                "# face_locator: MTCNN # MTCNN or Keypoints\n"
+                "# min_keypoint_conf: 0.5\n"
+                "# bulk_mtcnn: False\n"
                 "###########################################################\n"
                 "# --- # Torchreid\n"
                 "# ri_name: Torchreid\n"
                 "# classifier_pkl: data/modules/torchreid/classifier/gta5_osnet_ain_ms_d_c.pkl\n"
+                "# classifier: SVC # SVC or Gallery\n"
                 "# train_data: data/datasets/GTA_V_DATASET/body_128x256\n"
                 "# model_name: osnet_ain_x1_0\n"
                 "# model_path: data/modules/torchreid/models/torchreid/osnet_ain_ms_d_c.pth.tar\n"
                 "# min_confidence: 0.35\n"
+                "# min_similarity: 0.6 # Gallery only\n"
                 "# device: cuda\n"
                 "###########################################################\n")
         return header
@@ -1092,6 +1232,8 @@ class MyConfigurator(PYPPBOXStructure):
         A :class:`TCFGSORT` object used to store the configurations of tracker SORT.
     tcfg_deepsort : TCFGDeepSORT, auto
         A :class:`TCFGDeepSORT` object used to store the configurations of tracker DeepSORT.
+    tcfg_bytetrack : TCFGByteTrack, auto
+        A :class:`TCFGByteTrack` object used to store the configurations of tracker ByteTrack.
     rcfg_facenet : RCFGFaceNet, auto
         A :class:`RCFGFaceNet` object used to store the configurations of reider FaceNet.
     rcfg_torchreid : RCFGTorchreid, auto
@@ -1312,6 +1454,7 @@ class MyConfigurator(PYPPBOXStructure):
         """
         self.tcfg_centroid = TCFGCentroid()
         self.tcfg_sort = TCFGSORT()
+        self.tcfg_bytetrack = TCFGByteTrack()
 
         if isinstance(relative_to_pyppbox_root, bool):
             self.tcfg_deepsort = TCFGDeepSORT(relative_to_pyppbox_root)
@@ -1338,6 +1481,9 @@ class MyConfigurator(PYPPBOXStructure):
                 elif d['tk_name'].lower() == self.unified_strings.deepsort:
                     self.tcfg_deepsort.set(d)
                     self.tk_map.append(self.tcfg_deepsort.tk_name)
+                elif d['tk_name'].lower() == self.unified_strings.bytetrack:
+                    self.tcfg_bytetrack.set(d)
+                    self.tk_map.append(self.tcfg_bytetrack.tk_name)
                 else:
                     msg = ("MyConfigurator : setAllTCFG() -> Name '" + 
                            str(d['dt_name']) + "' is not supported.")
@@ -1442,6 +1588,9 @@ class MyConfigurator(PYPPBOXStructure):
                 elif cfg['tk_name'].lower() == self.unified_strings.deepsort:
                     self.tcfg_deepsort = TCFGDeepSORT(relative_to_pyppbox_root)
                     self.tcfg_deepsort.set(cfg)
+                elif cfg['tk_name'].lower() == self.unified_strings.bytetrack:
+                    self.tcfg_bytetrack = TCFGByteTrack()
+                    self.tcfg_bytetrack.set(cfg)
                 else:
                     msg = ("MyConfigurator : setASupportedModuleCFG() -> Name '" + 
                            str(cfg['tk_name']) + "' is not supported.")
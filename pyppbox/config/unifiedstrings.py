@@ -55,6 +55,8 @@ class UnifiedStrings(object):
         Unified string of word 'DeepSORT'.
     centroid : str, auto
         Unified string of word 'Centroid'.
+    bytetrack : str, auto
+        Unified string of word 'ByteTrack'.
     facenet : str, auto
         Unified string of word 'FaceNet'.
     torchreid : str, auto
@@ -69,6 +71,8 @@ class UnifiedStrings(object):
         Unified string of words 'Tracker SORT'.
     tkname_ds : str, auto
         Unified string of words 'Tracker DeepSORT'.
+    tkname_bt : str, auto
+        Unified string of words 'Tracker ByteTrack'.
     riname_fn : str, auto
         Unified string of words 'ReIDer FaceNet'.
     riname_tr : str, auto
@@ -127,6 +131,7 @@ class UnifiedStrings(object):
         self.sort = data['sort']
         self.deepsort = data['deepsort']
         self.centroid = data['centroid']
+        self.bytetrack = data['bytetrack']
         # reider
         self.facenet = data['facenet']
         self.torchreid = data['torchreid']
@@ -136,6 +141,7 @@ class UnifiedStrings(object):
         self.tkname_ct = data['tkname_ct']
         self.tkname_st = data['tkname_st']
         self.tkname_ds = data['tkname_ds']
+        self.tkname_bt = data['tkname_bt']
         self.riname_fn = data['riname_fn']
         self.riname_tr = data['riname_tr']
         self.unk_did = data['unk_did']
@@ -169,6 +175,8 @@ class UnifiedStrings(object):
             res = input_str.upper()
         elif self.deepsort.lower() == input_str.lower():
             res = input_str.title().replace("Deepsort", "DeepSORT")
+        elif self.bytetrack.lower() == input_str.lower():
+            res = input_str.title().replace("Bytetrack", "ByteTrack")
         elif self.facenet.lower() == self.reider.lower():
             res= input_str.title().replace("Facenet", "FaceNet")
         elif self.torchreid.lower() == self.reider.lower():
@@ -127,11 +127,15 @@ class Ui_DeepSORT(object):
             "nn_budget": getInt(self.ds_nn_budget_lineEdit.text(), default_val=100),
             "nms_max_overlap": getFloat(self.ds_max_overlap_lineEdit.text(), default_val=0.5),
             "max_cosine_distance": getFloat(self.ds_cosine_distance_lineEdit.text(), default_val=0.1),
-            "model_file": normalizePathFDS(root_dir, self.ds_model_file_lineEdit.text())
+            "model_file": normalizePathFDS(root_dir, self.ds_model_file_lineEdit.text()), 
+            "encoder": self.mycfg.tcfg_deepsort.encoder
         }
         centroid_doc = self.mycfg.tcfg_centroid.getDocument()
         sort_doc = self.mycfg.tcfg_sort.getDocument()
-        self.mycfg.dumpAllTCFG([centroid_doc, sort_doc, deepsort_doc])
+        tracker_docs = [centroid_doc, sort_doc, deepsort_doc]
+        if unified_strings.getUnifiedFormat("ByteTrack") in self.mycfg.tk_map:
+            tracker_docs.append(self.mycfg.tcfg_bytetrack.getDocument())
+        self.mycfg.dumpAllTCFG(tracker_docs)
         YOLOForm.close()
 
     def browseModelFile(self):
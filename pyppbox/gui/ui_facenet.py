@@ -203,11 +203,16 @@ class Ui_FaceNet(object):
             "model_det": normalizePathFDS(root_dir, self.fn_model_det_lineEdit.text()), 
             "model_file": normalizePathFDS(root_dir, self.fn_model_file_lineEdit.text()),
             "classifier_pkl": normalizePathFDS(root_dir, self.fn_classifier_pkl_lineEdit.text()),
+            "classifier": self.mycfg.rcfg_facenet.classifier,
             "train_data": normalizePathFDS(root_dir, self.fn_train_data_lineEdit.text()),
             "batch_size": getInt(self.fn_batch_size_lineEdit.text(), default_val=0.5),
             "min_confidence": getFloat(self.fn_min_confidence_lineEdit.text(), default_val=0.75),
+            "min_similarity": self.mycfg.rcfg_facenet.min_similarity,
             "yl_h_calibration": get2Dlist(self.fn_yl_h_calib_lineEdit.text()),
-            "yl_w_calibration": get2Dlist(self.fn_yl_w_calib_lineEdit.text())
+            "yl_w_calibration": get2Dlist(self.fn_yl_w_calib_lineEdit.text()),
+            "face_locator": self.mycfg.rcfg_facenet.face_locator,
+            "min_keypoint_conf": self.mycfg.rcfg_facenet.min_keypoint_conf,
+            "bulk_mtcnn": self.mycfg.rcfg_facenet.bulk_mtcnn
         }
         deepreid_doc = self.mycfg.rcfg_torchreid.getDocument()
         self.mycfg.dumpAllRCFG([facenet_doc, deepreid_doc])
@@ -110,5 +110,8 @@ class Ui_SORT(object):
         }
         centroid_doc = self.mycfg.tcfg_centroid.getDocument()
         deepsort_doc = self.mycfg.tcfg_deepsort.getDocument()
-        self.mycfg.dumpAllTCFG([centroid_doc, sort_doc, deepsort_doc])
+        tracker_docs = [centroid_doc, sort_doc, deepsort_doc]
+        if unified_strings.getUnifiedFormat("ByteTrack") in self.mycfg.tk_map:
+            tracker_docs.append(self.mycfg.tcfg_bytetrack.getDocument())
+        self.mycfg.dumpAllTCFG(tracker_docs)
         sort_ui.close()
@@ -172,10 +172,12 @@ class Ui_Torchreid(object):
         Torchreid_doc = {
             "ri_name": unified_strings.getUnifiedFormat("Torchreid"),
             "classifier_pkl": normalizePathFDS(root_dir, self.dr_classifier_pkl_lineEdit.text()),
+            "classifier": self.mycfg.rcfg_torchreid.classifier,
             "train_data": normalizePathFDS(root_dir, self.dr_train_data_lineEdit.text()),
             "model_name": self.dr_model_name_lineEdit.text(),
             "model_path": normalizePathFDS(root_dir, self.dr_model_path_lineEdit.text()),
             "min_confidence": getFloat(self.dr_min_confidence_lineEdit.text(), default_val=0.35),
+            "min_similarity": self.mycfg.rcfg_torchreid.min_similarity,
             "device": device
         }
         facenet_doc = self.mycfg.rcfg_facenet.getDocument()
@@ -20,9 +20,9 @@
 
 
 import cv2
+import numpy as np
 
-from pyppbox.utils.persontools import Person, findRepspoint, findRepspointBB
-from pyppbox.utils.commontools import to_xyxy
+from pyppbox.utils.persontools import Person, PeopleFrame, findRepspoints, findRepspointsBB
 
 
 class MyYOLOCLS(object):
@@ -37,6 +37,8 @@ class MyYOLOCLS(object):
         YOLO_Classic.
     model: cv::dnn::DetectionModel
         A detection model object of OpenCV's deep learning network.
+    net: cv::dnn::Net
+        The OpenCV's deep learning network of :attr:`model`, used for batch detection.
     """
 
     def __init__(self, cfg):
@@ -53,6 +55,8 @@ class MyYOLOCLS(object):
         net = cv2.dnn.readNet(cfg.model_weights, cfg.model_cfg_file)
         net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
         net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+        self.net = net
+        self.out_names = net.getUnconnectedOutLayersNames()
         self.model = cv2.dnn_DetectionModel(net)
         self.model.setInputParams(size=cfg.model_resolution, scale=1/255.0)
 
@@ -84,31 +88,21 @@ class MyYOLOCLS(object):
         float
             A list of the detection confidence of every detected object.
         """
-        pboxes_xywh = []
-        pboxes_xyxy = []
-        repspoints = []
-        confs = []
         classes, confidences, boxes = self.model.detect(img, 
                                                         confThreshold=float(self.cfg.conf), 
                                                         nmsThreshold=float(self.cfg.nms))
-        if len(classes) > 0:
-            for class_id, conf, box_xywh in zip(classes.flatten(), confidences, boxes):
-                if class_id == class_filter and box_xywh[2] >= min_width_filter:
-                    box_xywh = box_xywh.astype(int)
-                    pboxes_xywh.append(box_xywh)
-                    box_xyxy = to_xyxy(box_xywh)
-                    pboxes_xyxy.append(box_xyxy)
-                    repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    repspoints.append(repspoint)
-                    confs.append(float(conf))
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), radius=5, 
-                                   color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+        (boxes_xywh, boxes_xyxy, repspoints, 
+         confs) = self.__postprocess__(classes, confidences, boxes, class_filter, 
+                                       min_width_filter, False, True)
+        pboxes_xywh = list(boxes_xywh)
+        pboxes_xyxy = list(boxes_xyxy)
+        if visual:
+            for i in range(0, len(pboxes_xyxy)):
+                self.__drawPerson__(img, pboxes_xyxy[i], repspoints[i])
         return img, pboxes_xywh, pboxes_xyxy, repspoints, confs
 
-    def detectPeople(self, img, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True):
+    def detectPeople(self, img, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True, 
+                     as_frame=False, conf=None):
         """Detect person(s) in a given cv :obj:`Mat` image.
 
         Parameters
@@ -123,34 +117,155 @@ class MyYOLOCLS(object):
             An indication of whether to use the alternative :meth:`findRepspointBB`.
         alt_repspoint_top : bool, default=True
             A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            An indication of whether to return the detected people as a :class:`PeopleFrame` 
+            built directly from the detection arrays instead of a list of :class:`Person`.
+        conf : float, default=None
+            The confidence threshold of this call, set :code:`conf=None` to use the :obj:`conf` 
+            of the configurations.
 
         Returns
         -------
-        list[Person, ...]
-            A list of detected :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            A list of detected :class:`Person` object, or a :class:`PeopleFrame` if 
+            :code:`as_frame=True`.
         Mat
             A cv :obj:`Mat` image.
         """
-        people = []
         classes, confidences, boxes = self.model.detect(
             img, 
-            confThreshold=float(self.cfg.conf), 
+            confThreshold=float(self.cfg.conf if conf is None else conf), 
             nmsThreshold=float(self.cfg.nms)
         )
-        if len(classes) > 0:
-            i = 0
-            for class_id, conf, box_xywh in zip(classes.flatten(), confidences, boxes):
-                if class_id == 0 and box_xywh[2] >= min_width_filter:
-                    box_xywh = box_xywh.astype(int)
-                    box_xyxy = to_xyxy(box_xywh)
-                    if alt_repspoint: repspoint = findRepspointBB(box_xyxy, prefer_top=alt_repspoint_top)
-                    else: repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    people.append(Person(i, i, box_xywh=box_xywh, box_xyxy=box_xyxy, 
-                                         repspoint=repspoint, det_conf=float(conf)))
-                    i += 1
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), radius=5, 
-                                   color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+        return self.__getPeople__(img, classes, confidences, boxes, visual, 
+                                  min_width_filter, alt_repspoint, alt_repspoint_top, as_frame)
+
+    def __postprocess__(self, classes, confidences, boxes, class_filter, 
+                        min_width_filter, alt_repspoint, alt_repspoint_top):
+        # Vectorized filtering and repspoints of the detections of a single image
+        classes = np.asarray(classes).reshape(-1)
+        boxes_xywh = np.asarray(boxes).reshape(-1, 4)
+        confs = np.asarray(confidences).reshape(-1)
+        keep = (classes == class_filter) & (boxes_xywh[:, 2] >= min_width_filter)
+        boxes_xywh = boxes_xywh[keep].astype(int)
+        confs = confs[keep].tolist()
+        boxes_xyxy = boxes_xywh.copy()
+        boxes_xyxy[:, 2:] += boxes_xywh[:, :2]
+        if alt_repspoint: 
+            repspoints = findRepspointsBB(boxes_xyxy, prefer_top=alt_repspoint_top)
+        else: 
+            repspoints = findRepspoints(boxes_xyxy, self.cfg.repspoint_calibration)
+        repspoints = [tuple(rp) for rp in repspoints.tolist()]
+        return boxes_xywh, boxes_xyxy, repspoints, confs
+
+    def __drawPerson__(self, img, box_xyxy, repspoint):
+        cv2.circle(img, (repspoint[0], repspoint[1]), radius=5, 
+                   color=(0, 0, 255), thickness=-1)
+        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
+                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+
+    def __getPeople__(self, img, classes, confidences, boxes, visual, 
+                      min_width_filter, alt_repspoint, alt_repspoint_top, as_frame):
+        people = []
+        (boxes_xywh, boxes_xyxy, repspoints, 
+         confs) = self.__postprocess__(classes, confidences, boxes, 0, 
+                                       min_width_filter, alt_repspoint, alt_repspoint_top)
+        if as_frame:
+            people = PeopleFrame(boxes_xyxy=boxes_xyxy, repspoints=repspoints, det_confs=confs)
+            people.boxes_xywh = boxes_xywh
+            if visual:
+                for i in range(0, len(boxes_xyxy)):
+                    self.__drawPerson__(img, boxes_xyxy[i], repspoints[i])
+            return people, img
+        for i in range(0, len(boxes_xyxy)):
+            people.append(Person(i, i, box_xywh=boxes_xywh[i], box_xyxy=boxes_xyxy[i], 
+                                 repspoint=repspoints[i], det_conf=confs[i]))
+            if visual:
+                self.__drawPerson__(img, boxes_xyxy[i], repspoints[i])
         return people, img
+
+    def __decodeRegion__(self, dets, frame_wh, class_filter=None, conf=None):
+        # Same post-processing as cv::dnn::DetectionModel::detect() for Darknet region layers,
+        # with class_filter, the other classes are dropped before the NMS
+        (frame_w, frame_h) = frame_wh
+        conf_threshold = float(self.cfg.conf if conf is None else conf)
+        scores = dets[:, 5:]
+        class_ids = np.argmax(scores, axis=1)
+        confs = scores[np.arange(len(dets)), class_ids]
+        keep = confs >= conf_threshold
+        if class_filter is not None: keep &= class_ids == class_filter
+        dets, class_ids, confs = dets[keep], class_ids[keep], confs[keep]
+        center_x = (dets[:, 0] * frame_w).astype(int)
+        center_y = (dets[:, 1] * frame_h).astype(int)
+        width = (dets[:, 2] * frame_w).astype(int)
+        height = (dets[:, 3] * frame_h).astype(int)
+        left = np.clip(center_x - width // 2, 0, frame_w - 1)
+        top = np.clip(center_y - height // 2, 0, frame_h - 1)
+        width = np.maximum(1, np.minimum(width, frame_w - left))
+        height = np.maximum(1, np.minimum(height, frame_h - top))
+        all_boxes = np.stack([left, top, width, height], axis=1)
+        classes, confidences, boxes = [], [], []
+        for class_id in np.unique(class_ids):
+            indices = np.where(class_ids == class_id)[0]
+            nms = cv2.dnn.NMSBoxes(all_boxes[indices].tolist(), confs[indices].tolist(), 
+                                   conf_threshold, float(self.cfg.nms))
+            for k in np.asarray(nms, dtype=int).flatten():
+                classes.append(class_id)
+                confidences.append(confs[indices[k]])
+                boxes.append(all_boxes[indices[k]])
+        return (np.array(classes, dtype=np.int32), 
+                np.array(confidences, dtype=np.float32), 
+                np.array(boxes, dtype=np.int32).reshape(-1, 4))
+
+    def detectPeopleBatch(self, imgs, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True, 
+                          as_frame=False, conf=None):
+        """Detect person(s) in multiple cv :obj:`Mat` images with a single forward pass of a 
+        blob of all images. The people of each image are the same as :meth:`detectPeople()`.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images, which may have different sizes.
+        visual : bool, default=True
+            An indication of whether to visualize the detected people.
+        min_width_filter : int, default=35
+            Mininum width filter of a detected person.
+        alt_repspoint : bool, default=False
+            An indication of whether to use the alternative :meth:`findRepspointBB`.
+        alt_repspoint_top : bool, default=True
+            A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            An indication of whether to return the detected people as a :class:`PeopleFrame` 
+            built directly from the detection arrays instead of a list of :class:`Person`.
+        conf : float, default=None
+            The confidence threshold of this call, set :code:`conf=None` to use the :obj:`conf` 
+            of the configurations.
+
+        Returns
+        -------
+        list[list[Person, ...] or PeopleFrame, ...]
+            A list of detected :class:`Person` object lists, or :class:`PeopleFrame` objects 
+            if :code:`as_frame=True`, one per image.
+        list[Mat, ...]
+            A list of cv :obj:`Mat` images.
+        """
+        if len(imgs) == 0: return [], []
+        blob = cv2.dnn.blobFromImages(imgs, 
+                                      scalefactor=1/255.0, 
+                                      size=tuple(self.cfg.model_resolution), 
+                                      swapRB=False, 
+                                      crop=False)
+        self.net.setInput(blob)
+        outs = self.net.forward(self.out_names)
+        outs = [np.asarray(out).reshape(len(imgs), -1, out.shape[-1]) for out in outs]
+        people_list = []
+        img_list = []
+        for i, img in enumerate(imgs):
+            dets = np.concatenate([out[i] for out in outs], axis=0)
+            classes, confidences, boxes = self.__decodeRegion__(dets, (img.shape[1], img.shape[0]), 
+                                                                class_filter=0, conf=conf)
+            people, img = self.__getPeople__(img, classes, confidences, boxes, visual, 
+                                             min_width_filter, alt_repspoint, alt_repspoint_top, as_frame)
+            people_list.append(people)
+            img_list.append(img)
+        return people_list, img_list
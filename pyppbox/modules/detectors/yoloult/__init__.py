@@ -20,9 +20,9 @@
 
 
 import cv2
+import numpy as np
 
-from pyppbox.utils.persontools import Person, findRepspoint, findRepspointBB
-from pyppbox.utils.commontools import to_xywh
+from pyppbox.utils.persontools import Person, PeopleFrame, findRepspoints, findRepspointsBB
 from pyppbox.utils.logtools import ignore_this_logger
 
 
@@ -145,12 +145,6 @@ class MyYOLOULT(object):
         float
             A list of the detection confidence of every detected object.
         """
-        numpy_dets = []
-        pboxes_xyxy = []
-        pboxes_xywh = []
-        repspoints = []
-        keypoints = []
-        confs = []
         dets = self.model.predict(
             img,
             imgsz=int(self.cfg.imgsz),
@@ -162,49 +156,19 @@ class MyYOLOULT(object):
             line_width=self.cfg.line_width,
             verbose=False
         )
-        if self.cpu_only:
-            numpy_dets = dets[0].numpy()
-        else:
-            numpy_dets = dets[0].cuda().cpu().to("cpu").numpy()
-        dt_boxes_xyxy = numpy_dets.boxes.xyxy
-        dt_confidences = numpy_dets.boxes.conf
-        dt_keypoints = dets[0].keypoints
-        if dt_keypoints is not None:
-            for box_xyxy, conf, kp in zip(dt_boxes_xyxy, dt_confidences, reversed(dt_keypoints)):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= min_width_filter:
-                    pboxes_xywh.append(box_xywh)
-                    pboxes_xyxy.append(box_xyxy)
-                    repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    repspoints.append(repspoint)
-                    keypoint = kp.data[0]
-                    keypoints.append(keypoint)
-                    confs.append(float(conf))
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), 
-                                   radius=5, color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
-                        self.__kpts__(img, keypoint, kpt_line=True)
-        elif len(dt_boxes_xyxy) > 0:
-            for box_xyxy, conf in zip(dt_boxes_xyxy, dt_confidences):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= min_width_filter:
-                    pboxes_xywh.append(box_xywh)
-                    pboxes_xyxy.append(box_xyxy)
-                    repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    repspoints.append(repspoint)
-                    confs.append(float(conf))
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), 
-                                   radius=5, color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+        (boxes_xywh, boxes_xyxy, repspoints, 
+         kpts, confs) = self.__postprocess__(dets[0], min_width_filter, False, True)
+        pboxes_xywh = list(boxes_xywh)
+        pboxes_xyxy = list(boxes_xyxy)
+        keypoints = list(kpts) if kpts is not None else []
+        if visual:
+            for i in range(0, len(pboxes_xyxy)):
+                self.__drawPerson__(img, pboxes_xyxy[i], repspoints[i], 
+                                    keypoints[i] if kpts is not None else None)
         return img, pboxes_xywh, pboxes_xyxy, repspoints, keypoints, confs
 
-    def detectPeople(self, img, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True):
+    def detectPeople(self, img, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True, 
+                     as_frame=False, conf=None):
         """Detect person(s) in a given cv :obj:`Mat` image.
 
         Parameters
@@ -219,20 +183,25 @@ class MyYOLOULT(object):
             An indication of whether to use the alternative :meth:`findRepspointBB`.
         alt_repspoint_top : bool, default=True
             A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            An indication of whether to return the detected people as a :class:`PeopleFrame` 
+            built directly from the detection arrays instead of a list of :class:`Person`.
+        conf : float, default=None
+            The confidence threshold of this call, set :code:`conf=None` to use the :obj:`conf` 
+            of the configurations.
 
         Returns
         -------
-        list[Person, ...]
-            A list of detected :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            A list of detected :class:`Person` object, or a :class:`PeopleFrame` if 
+            :code:`as_frame=True`.
         Mat
             A cv :obj:`Mat` image.
         """
-        numpy_dets = []
-        people = []
         dets = self.model.predict(
             img,
             imgsz=int(self.cfg.imgsz),
-            conf=float(self.cfg.conf),
+            conf=float(self.cfg.conf if conf is None else conf),
             classes=0,
             show_boxes=self.cfg.show_boxes,
             device=self.cfg.device,
@@ -240,45 +209,115 @@ class MyYOLOULT(object):
             line_width=self.cfg.line_width,
             verbose=False
         )
+        return self.__getPeople__(img, dets[0], visual, min_width_filter, 
+                                  alt_repspoint, alt_repspoint_top, as_frame)
+
+    def __postprocess__(self, det, min_width_filter, alt_repspoint, alt_repspoint_top):
+        # Vectorized post-processing of the result of a single image
         if self.cpu_only:
-            numpy_dets = dets[0].numpy()
+            numpy_dets = det.numpy()
         else:
-            numpy_dets = dets[0].cuda().cpu().to("cpu").numpy()
-        dt_boxes_xyxy = numpy_dets.boxes.xyxy
-        dt_confidences = numpy_dets.boxes.conf
-        dt_keypoints = dets[0].keypoints
-        if dt_keypoints is not None:
-            i = 0
-            for box_xyxy, conf, kp in zip(dt_boxes_xyxy, dt_confidences, reversed(dt_keypoints)):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= min_width_filter:
-                    keypoint = kp.data[0]
-                    if alt_repspoint: repspoint = findRepspointBB(box_xyxy, prefer_top=alt_repspoint_top)
-                    else: repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    people.append(Person(i, i, box_xywh=box_xywh, box_xyxy=box_xyxy,
-                                  keypoints=keypoint, repspoint=repspoint, det_conf=float(conf)))
-                    i += 1
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), 
-                                   radius=5, color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
-                        self.__kpts__(img, keypoint, kpt_line=True)
-        elif len(dt_boxes_xyxy) > 0:
-            i = 0
-            for box_xyxy, conf in zip(dt_boxes_xyxy, dt_confidences):
-                box_xyxy = box_xyxy.astype(int)
-                box_xywh = to_xywh(box_xyxy)
-                if box_xywh[2] >= min_width_filter:
-                    if alt_repspoint: repspoint = findRepspointBB(box_xyxy, prefer_top=alt_repspoint_top)
-                    else: repspoint = findRepspoint(box_xyxy, self.cfg.repspoint_calibration)
-                    people.append(Person(i, i, box_xywh=box_xywh, box_xyxy=box_xyxy, 
-                                  repspoint=repspoint, det_conf=float(conf)))
-                    i += 1
-                    if visual:
-                        cv2.circle(img, (repspoint[0], repspoint[1]), 
-                                   radius=5, color=(0, 0, 255), thickness=-1)
-                        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
-                                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+            numpy_dets = det.cpu().numpy()
+        boxes_xyxy = np.asarray(numpy_dets.boxes.xyxy).reshape(-1, 4).astype(int)
+        confs = np.asarray(numpy_dets.boxes.conf).reshape(-1)
+        kpts = None
+        if numpy_dets.keypoints is not None:
+            # The keypoints are paired with the boxes in reversed order
+            kpts = np.asarray(numpy_dets.keypoints.data)[::-1][:len(boxes_xyxy)]
+        keep = (boxes_xyxy[:, 2] - boxes_xyxy[:, 0]) >= min_width_filter
+        boxes_xyxy = boxes_xyxy[keep]
+        confs = confs[keep].tolist()
+        if kpts is not None: kpts = kpts[keep[:len(kpts)]]
+        boxes_xywh = boxes_xyxy.copy()
+        boxes_xywh[:, 2:] -= boxes_xyxy[:, :2]
+        if alt_repspoint: 
+            repspoints = findRepspointsBB(boxes_xyxy, prefer_top=alt_repspoint_top)
+        else: 
+            repspoints = findRepspoints(boxes_xyxy, self.cfg.repspoint_calibration)
+        repspoints = [tuple(rp) for rp in repspoints.tolist()]
+        return boxes_xywh, boxes_xyxy, repspoints, kpts, confs
+
+    def __drawPerson__(self, img, box_xyxy, repspoint, keypoint=None):
+        cv2.circle(img, (repspoint[0], repspoint[1]), 
+                   radius=5, color=(0, 0, 255), thickness=-1)
+        cv2.rectangle(img, (box_xyxy[0], box_xyxy[1]), 
+                      (box_xyxy[2], box_xyxy[3]), (255, 255, 0), 2)
+        if keypoint is not None: self.__kpts__(img, keypoint, kpt_line=True)
+
+    def __getPeople__(self, img, det, visual, min_width_filter, alt_repspoint, alt_repspoint_top, as_frame):
+        people = []
+        (boxes_xywh, boxes_xyxy, repspoints, 
+         kpts, confs) = self.__postprocess__(det, min_width_filter, alt_repspoint, alt_repspoint_top)
+        if as_frame:
+            people = PeopleFrame(boxes_xyxy=boxes_xyxy, repspoints=repspoints, 
+                                 det_confs=confs, keypoints=kpts)
+            people.boxes_xywh = boxes_xywh
+            if visual:
+                for i in range(0, len(boxes_xyxy)):
+                    self.__drawPerson__(img, boxes_xyxy[i], repspoints[i], 
+                                        kpts[i] if kpts is not None else None)
+            return people, img
+        for i in range(0, len(boxes_xyxy)):
+            if kpts is not None:
+                people.append(Person(i, i, box_xywh=boxes_xywh[i], box_xyxy=boxes_xyxy[i], 
+                                     keypoints=kpts[i], repspoint=repspoints[i], det_conf=confs[i]))
+            else:
+                people.append(Person(i, i, box_xywh=boxes_xywh[i], box_xyxy=boxes_xyxy[i], 
+                                     repspoint=repspoints[i], det_conf=confs[i]))
+            if visual:
+                self.__drawPerson__(img, boxes_xyxy[i], repspoints[i], 
+                                    kpts[i] if kpts is not None else None)
         return people, img
+
+    def detectPeopleBatch(self, imgs, visual=True, min_width_filter=35, alt_repspoint=False, alt_repspoint_top=True, 
+                          as_frame=False, conf=None):
+        """Detect person(s) in multiple cv :obj:`Mat` images with a single batched prediction. 
+        The people of each image are the same as :meth:`detectPeople()`.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images.
+        visual : bool, default=True
+            An indication of whether to visualize the detected people.
+        min_width_filter : int, default=35
+            Mininum width filter of a detected person.
+        alt_repspoint : bool, default=False
+            An indication of whether to use the alternative :meth:`findRepspointBB`.
+        alt_repspoint_top : bool, default=True
+            A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            An indication of whether to return the detected people as a :class:`PeopleFrame` 
+            built directly from the detection arrays instead of a list of :class:`Person`.
+        conf : float, default=None
+            The confidence threshold of this call, set :code:`conf=None` to use the :obj:`conf` 
+            of the configurations.
+
+        Returns
+        -------
+        list[list[Person, ...] or PeopleFrame, ...]
+            A list of detected :class:`Person` object lists, or :class:`PeopleFrame` objects 
+            if :code:`as_frame=True`, one per image.
+        list[Mat, ...]
+            A list of cv :obj:`Mat` images.
+        """
+        if len(imgs) == 0: return [], []
+        dets = self.model.predict(
+            list(imgs),
+            imgsz=int(self.cfg.imgsz),
+            conf=float(self.cfg.conf if conf is None else conf),
+            classes=0,
+            show_boxes=self.cfg.show_boxes,
+            device=self.cfg.device,
+            max_det=int(self.cfg.max_det),
+            line_width=self.cfg.line_width,
+            verbose=False
+        )
+        people_list = []
+        img_list = []
+        for img, det in zip(imgs, dets):
+            people, img = self.__getPeople__(img, det, visual, min_width_filter, 
+                                             alt_repspoint, alt_repspoint_top, as_frame)
+            people_list.append(people)
+            img_list.append(img)
+        return people_list, img_list
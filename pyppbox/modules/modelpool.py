@@ -0,0 +1,281 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+import os
+import json
+import weakref
+import threading
+from collections import OrderedDict
+
+from pyppbox.utils.logtools import add_info_log
+from pyppbox.utils.commontools import getGlobalRootDir, getAdaptiveAbsPathFDS
+
+
+class __PoolEntry__(object):
+
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.model = None
+        self.size_mb = 0.0
+        self.refs = 0
+        self.lock = threading.RLock()
+
+
+class SharedModel(object):
+
+    """A handle of a model shared by :class:`ModelPool`. A handle behaves like the model 
+    itself: attributes are read from and written to the model, and every method call holds 
+    the model's lock, so the same model can be used by many threads or :class:`MT` objects. 
+    The model is released back to the pool once the handle is garbage collected.
+    """
+
+    def __init__(self, entry):
+        object.__setattr__(self, "__entry__", entry)
+
+    @property
+    def __class__(self):
+        return type(object.__getattribute__(self, "__entry__").model)
+
+    def __getattr__(self, name):
+        entry = object.__getattribute__(self, "__entry__")
+        attr = getattr(entry.model, name)
+        if callable(attr) and not isinstance(attr, type):
+            def locked(*args, **kwargs):
+                with entry.lock:
+                    return attr(*args, **kwargs)
+            return locked
+        return attr
+
+    def __setattr__(self, name, value):
+        entry = object.__getattribute__(self, "__entry__")
+        with entry.lock:
+            setattr(entry.model, name, value)
+
+
+# The configurations of the files loaded by the models, e.g. not 'train_data' or 'gt_file'
+__model_file_keys__ = ("model_weights", "model_file", "model_path", "model_det", "classifier_pkl")
+
+def __estimateSizeMB__(document):
+    # Estimate the memory of a model by the sizes of the files it loads, the paths of a 
+    # document are relative to the pyppbox root like in the configuration files
+    size = 0
+    for key in __model_file_keys__:
+        value = document.get(key, "")
+        if not isinstance(value, str) or value == "": continue
+        path = getAdaptiveAbsPathFDS(getGlobalRootDir(), value)
+        if os.path.isfile(path):
+            size += os.path.getsize(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return size / (1024.0 * 1024.0)
+
+
+class ModelPool(object):
+
+    """A process-wide registry of the stateless inference models, i.e. the detectors and the 
+    reiders, keyed by the model class and its normalized configurations. The :class:`MT` 
+    objects asking for the same model with the same configurations share a single instance 
+    instead of loading their own copy. A model which is no longer used by any :class:`MT` 
+    stays warm in an LRU list, so switching back to it does not reload it from disk, until 
+    there are more than :attr:`max_idle` idle models or the estimated memory of all models 
+    exceeds :attr:`max_memory_mb`. The trackers keep states and are never shared.
+
+    Use :func:`getModelPool()` to get the process-wide pool.
+
+    Attributes
+    ----------
+    max_idle : int
+        Maximum number of idle models kept warm.
+    max_memory_mb : float
+        Memory budget in MB of all models, estimated by the sizes of their weight files. 
+        :code:`0` means no budget.
+    """
+
+    def __init__(self, max_idle=2, max_memory_mb=0):
+        """Initialize the pool.
+
+        Parameters
+        ----------
+        max_idle : int, default=2
+            Maximum number of idle models kept warm.
+        max_memory_mb : float, default=0
+            Memory budget in MB of all models, :code:`0` means no budget.
+        """
+        self.max_idle = max_idle
+        self.max_memory_mb = max_memory_mb
+        self.__lock__ = threading.RLock()
+        self.__entries__ = {}
+        self.__idle__ = OrderedDict()
+
+    @staticmethod
+    def getKey(model_class, cfg, variant=None):
+        """Get the pool key of a model.
+
+        Parameters
+        ----------
+        model_class : type
+            The class of the model, e.g. :class:`MyYOLOCLS`.
+        cfg : any
+            The configurations of the model, which must have :meth:`getDocument()`.
+        variant : dict, default=None
+            The creation arguments which change the model and are part of the key, e.g. 
+            :code:`{'auto_load': True}` for a reider with its classifier loaded.
+
+        Returns
+        -------
+        str
+            The pool key.
+        """
+        name = model_class.__module__ + "." + model_class.__name__
+        key = name + ":" + json.dumps(cfg.getDocument(), sort_keys=True, default=str)
+        if variant: key += ":" + json.dumps(variant, sort_keys=True, default=str)
+        return key
+
+    def setBudget(self, max_idle=2, max_memory_mb=0):
+        """Set the LRU budget and evict the idle models beyond it.
+
+        Parameters
+        ----------
+        max_idle : int, default=2
+            Maximum number of idle models kept warm.
+        max_memory_mb : float, default=0
+            Memory budget in MB of all models, :code:`0` means no budget.
+        """
+        with self.__lock__:
+            self.max_idle = max_idle
+            self.max_memory_mb = max_memory_mb
+            self.__evict__()
+
+    def acquire(self, model_class, cfg, *args, variant=None, **kwargs):
+        """Get a shared model, the model is created by :code:`model_class(cfg, *args, **kwargs)` 
+        if it is not in the pool yet.
+
+        Parameters
+        ----------
+        model_class : type
+            The class of the model, e.g. :class:`MyYOLOCLS`.
+        cfg : any
+            The configurations of the model, which must have :meth:`getDocument()`.
+        *args, **kwargs
+            The extra arguments used to create the model, which are not part of the key.
+        variant : dict, default=None
+            See :meth:`getKey()`. The arguments of :obj:`variant` must also be passed in 
+            :obj:`kwargs` to take effect.
+
+        Returns
+        -------
+        SharedModel
+            A handle of the shared model.
+        """
+        key = self.getKey(model_class, cfg, variant)
+        with self.__lock__:
+            entry = self.__entries__.get(key)
+            if entry is None:
+                entry = __PoolEntry__(key, model_class.__name__)
+                self.__entries__[key] = entry
+            entry.refs += 1
+            self.__idle__.pop(key, None)
+        with entry.lock:
+            if entry.model is None:
+                try:
+                    entry.model = model_class(cfg, *args, **kwargs)
+                except Exception:
+                    self.__release__(entry)
+                    raise
+                entry.size_mb = __estimateSizeMB__(cfg.getDocument())
+                add_info_log("ModelPool : Loaded '" + entry.name + "' (~" + 
+                             str(round(entry.size_mb, 1)) + " MB)")
+        handle = SharedModel(entry)
+        weakref.finalize(handle, self.__release__, entry)
+        with self.__lock__:
+            self.__evict__()
+        return handle
+
+    def __release__(self, entry):
+        with self.__lock__:
+            entry.refs -= 1
+            if entry.refs > 0 or self.__entries__.get(entry.key) is not entry: return
+            if entry.model is None:
+                del self.__entries__[entry.key]
+            else:
+                self.__idle__[entry.key] = entry
+                self.__evict__()
+
+    def __evict__(self):
+        total_mb = sum(e.size_mb for e in self.__entries__.values())
+        while len(self.__idle__) > 0 and (len(self.__idle__) > self.max_idle or 
+                                          (self.max_memory_mb > 0 and total_mb > self.max_memory_mb)):
+            key, entry = self.__idle__.popitem(last=False)
+            del self.__entries__[key]
+            total_mb -= entry.size_mb
+            entry.model = None
+            add_info_log("ModelPool : Evicted '" + entry.name + "'")
+
+    def invalidate(self, model_class=None):
+        """Remove the models of :obj:`model_class` from the pool, so they are created again 
+        on the next :meth:`acquire()`, e.g. after retraining a classifier. The handles in use 
+        keep their models until they are released.
+
+        Parameters
+        ----------
+        model_class : type, default=None
+            The class of the models to remove, set :code:`model_class=None` to remove all.
+        """
+        with self.__lock__:
+            for key in list(self.__entries__.keys()):
+                entry = self.__entries__[key]
+                if model_class is None or entry.name == model_class.__name__:
+                    del self.__entries__[key]
+                    if self.__idle__.pop(key, None) is not None: entry.model = None
+
+    def clear(self):
+        """Remove all models from the pool, see :meth:`invalidate()`."""
+        self.invalidate()
+
+    def getInfo(self):
+        """Get the information of the models in the pool.
+
+        Returns
+        -------
+        list[dict, ...]
+            A list of :code:`{'name': str, 'refs': int, 'idle': bool, 'size_mb': float}`.
+        """
+        with self.__lock__:
+            return [{'name': e.name, 
+                     'refs': e.refs, 
+                     'idle': e.key in self.__idle__, 
+                     'size_mb': e.size_mb} for e in self.__entries__.values()]
+
+
+__model_pool__ = ModelPool()
+
+def getModelPool():
+    """Get the process-wide :class:`ModelPool`.
+
+    Returns
+    -------
+    ModelPool
+        The process-wide model pool.
+    """
+    return __model_pool__
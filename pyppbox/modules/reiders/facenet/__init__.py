@@ -26,7 +26,8 @@ import skimage.transform
 import numpy as np
 
 from pyppbox.utils.commontools import getFileName, silencer
-from pyppbox.utils.logtools import add_info_log, add_warning_log, ignore_this_logger
+from pyppbox.utils.logtools import add_info_log, add_warning_log, add_error_log, ignore_this_logger
+from pyppbox.modules.reiders.reidtools import EmbeddingGallery, FeatureStore, ImageBatchLoader
 
 ignore_this_logger("tensorflow")
 ignore_this_logger("facenet")
@@ -61,60 +62,186 @@ class MyFaceNet(object):
         self.model_det = cfg.model_det
         self.model_file = cfg.model_file
         self.classifier_file = cfg.classifier_pkl
+        self.use_gallery = str(cfg.classifier).lower() == "gallery"
+        self.gallery_file = os.path.splitext(self.classifier_file)[0] + ".npz"
         self.batch_size = cfg.batch_size
-        self.min_confidence = int(100 * cfg.min_confidence)
+        # The gallery similarities are thresholded by min_similarity instead of min_confidence
+        self.min_confidence = int(100 * (cfg.min_similarity if self.use_gallery 
+                                         else cfg.min_confidence))
         self.gpu_mem = cfg.gpu_mem
         self.train_data = cfg.train_data
+        self.face_locator = str(cfg.face_locator)
+        self.min_keypoint_conf = float(cfg.min_keypoint_conf)
         self.minsize = 20  # minimum size of face
+        self.bulk_mtcnn = bool(cfg.bulk_mtcnn)
+        self.face_ratio = 0.2  # minimum size of face relative to the head crops in a bulk MTCNN
         self.threshold = [0.6, 0.7, 0.7]  # three steps's threshold
         self.factor = 0.709  # scale factor
         self.margin = 44
         self.image_size = 182
         self.input_image_size = 160
+        # Increased whenever the classes change, so the users of a shared reider can drop 
+        # their outdated probability vectors
+        self.classes_version = 0
         self.auto_load = auto_load
         if self.auto_load:
             self.load_classifier()
 
     def load_classifier(self):
+        """Load the MTCNN, the FaceNet model, and the classifier model from the configurations. 
+        With :code:`classifier: Gallery`, the embedding gallery is memory-mapped from the 
+        :code:`.npz` file named after :attr:`classifier_file`, or started empty if there is no 
+        such file yet.
+        """
         with tf.Graph().as_default():
             gpu_options = tf.compat.v1.GPUOptions(per_process_gpu_memory_fraction=float(self.gpu_mem))
             self.sess = tf.compat.v1.Session(config=tf.compat.v1.ConfigProto(gpu_options=gpu_options, 
                                                                              allow_soft_placement=True))
             with self.sess.as_default():
                 self.pnet, self.rnet, self.onet = df.create_mtcnn(self.sess, self.model_det)
-                self.labels_names_file = os.path.splitext(self.classifier_file)[0] + ".txt"
-                with open(self.labels_names_file, 'r') as fp:
-                    self.pnames = fp.readlines()
-                    self.pnames = [line.rstrip('\n') for line in self.pnames]
-                self.pnames = sorted(self.pnames)
+                if not self.use_gallery:
+                    self.labels_names_file = os.path.splitext(self.classifier_file)[0] + ".txt"
+                    with open(self.labels_names_file, 'r') as fp:
+                        self.pnames = fp.readlines()
+                        self.pnames = [line.rstrip('\n') for line in self.pnames]
+                    self.pnames = sorted(self.pnames)
                 # add_info_log("--------RI : " + str(self.pnames))
                 fn.load_model(self.model_file)
                 self.images_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("input:0")
                 self.embeddings = tf.compat.v1.get_default_graph().get_tensor_by_name("embeddings:0")
                 self.phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
                 self.embedding_size = self.embeddings.get_shape()[1]
-                self.classifier_file_exp = os.path.expanduser(self.classifier_file)
-                with open(self.classifier_file_exp, 'rb') as infile:
-                    (self.model, class_names) = pickle.load(infile)
-                add_info_log("--------RI : Classifier loaded! <- " + getFileName(self.classifier_file))
+                if self.use_gallery:
+                    if os.path.isfile(self.gallery_file):
+                        self.gallery = EmbeddingGallery.load(self.gallery_file)
+                        add_info_log("--------RI : Gallery loaded! <- " + getFileName(self.gallery_file))
+                    else:
+                        self.gallery = EmbeddingGallery()
+                        add_warning_log("--------RI : No gallery yet, starting empty -> " + 
+                                        str(self.gallery_file))
+                    self.pnames = self.gallery.getNames()
+                else:
+                    self.classifier_file_exp = os.path.expanduser(self.classifier_file)
+                    with open(self.classifier_file_exp, 'rb') as infile:
+                        (self.model, class_names) = pickle.load(infile)
+                    add_info_log("--------RI : Classifier loaded! <- " + getFileName(self.classifier_file))
+        self.classes_version += 1
+
+    def __embed__(self, scaled_reshape_imgs):
+        feed_dict = {self.images_placeholder: scaled_reshape_imgs, self.phase_train_placeholder: False}
+        emb_array = np.zeros((scaled_reshape_imgs.shape[0], self.embedding_size))
+        emb_array[:, :] = self.sess.run(self.embeddings, feed_dict=feed_dict)
+        return emb_array
+
+    def __classify__(self, emb_array):
+        # Gallery -> cosine similarity to each identity, used as the probability
+        if self.use_gallery:
+            return np.maximum(self.gallery.scores(emb_array), 0.)
+        return self.model.predict_proba(emb_array)
 
     def predict(self, scaled_reshape_img):
         """
         :meta private:
         """
-        best_class = -1
-        best_proba = -1
-        feed_dict = {self.images_placeholder: scaled_reshape_img, self.phase_train_placeholder: False}
-        emb_array = np.zeros((1, self.embedding_size))
-        emb_array[0, :] = self.sess.run(self.embeddings, feed_dict=feed_dict)
-        predictions = self.model.predict_proba(emb_array)
+        best_classes, best_probas, predictions = self.predict_batch(scaled_reshape_img)
+        return best_classes[0], best_probas[0], predictions[0]
+
+    def predict_batch(self, scaled_reshape_imgs):
+        """
+        :meta private:
+        """
+        predictions = self.__classify__(self.__embed__(scaled_reshape_imgs))
+        if predictions.shape[1] == 0:
+            return [-1] * len(predictions), [-1] * len(predictions), predictions
         best_class_indices = np.argmax(predictions, axis=1)
         best_class_probabilities = predictions[np.arange(len(best_class_indices)), best_class_indices]
-        best_class = best_class_indices[0]
-        best_proba = float(best_class_probabilities*100)
-        return best_class, best_proba
+        best_probas = [float(p*100) for p in best_class_probabilities]
+        return best_class_indices, best_probas, predictions
+
+    def __decide__(self, best_class, best_proba):
+        result = ""
+        conf = 100.0
+        if best_class != -1 and best_proba != -1:
+            if best_proba < self.min_confidence:
+                result = self.unk
+                # add_info_log("--------RI : Result is below required confidence! -> Return " + str(self.unk))
+            else:
+                result = self.pnames[best_class]
+                conf = best_proba
+                # add_info_log('-----RI : Result -> "%s"' % result)
+        return result, conf
+
+    def getClassNames(self):
+        """Get the class names of the loaded classifier.
+
+        Returns
+        -------
+        list[str, ...]
+            A list of class names, where the index of a class name is the index of its 
+            probability in the probability vector returned by :meth:`recognize()`.
+        """
+        return self.pnames
+
+    def __checkGallery__(self, caller):
+        if not self.use_gallery:
+            msg = ("MyFaceNet : " + caller + "() -> Only supported with 'classifier: Gallery', " + 
+                   "retrain the classifier with train_classifier() instead.")
+            add_error_log(msg)
+            raise ValueError(msg)
+
+    def enroll(self, name, imgs, is_bgr=True, save=True):
+        """Enroll a new identity, or add more images to a known identity, in the embedding 
+        gallery without any retraining. The faces are localized like :meth:`recognize_batch()`, 
+        the images without face are skipped. Only supported with 
+        :code:`classifier: Gallery`.
+
+        Parameters
+        ----------
+        name : str
+            The class name of the identity.
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images of the identity, normally the head regions.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`imgs` is BGR.
+        save : bool, default=True
+            An indication of whether to save the gallery after the update.
+
+        Returns
+        -------
+        int
+            The number of enrolled embeddings.
+        """
+        self.__checkGallery__("enroll")
+        _, face_imgs, _ = self.__findFaces__(imgs, is_bgr=is_bgr, bulk=self.bulk_mtcnn)
+        if len(face_imgs) == 0: return 0
+        self.classes_version += 1
+        self.gallery.enroll(name, self.__embed__(np.concatenate(face_imgs, axis=0)))
+        if save: self.gallery.save(self.gallery_file)
+        return len(face_imgs)
+
+    def remove(self, name, save=True):
+        """Remove an identity from the embedding gallery. Only supported with 
+        :code:`classifier: Gallery`.
+
+        Parameters
+        ----------
+        name : str
+            The class name of the identity.
+        save : bool, default=True
+            An indication of whether to save the gallery after the update.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the identity was in the gallery.
+        """
+        self.__checkGallery__("remove")
+        removed = self.gallery.remove(name)
+        if removed: self.classes_version += 1
+        if removed and save: self.gallery.save(self.gallery_file)
+        return removed
 
-    def recognize(self, img, is_bgr=True):
+    def recognize(self, img, is_bgr=True, return_proba=False):
         """Recognize or re-identify a person in the given :obj:`img`.
 
         Parameters
@@ -123,6 +250,8 @@ class MyFaceNet(object):
             A cv :obj:`Mat` image.
         is_bgr : bool, default=True
             An indication of whether the color channel of given :obj:`img` is BGR.
+        return_proba : bool, default=False
+            An indication of whether to also return the full class-probability vector.
 
         Returns
         -------
@@ -130,27 +259,166 @@ class MyFaceNet(object):
             A class name.
         float 
             Confidence of the result.
+        ndarray or None
+            The class-probability vector, :code:`shape=(number of classes,)`, or :code:`None` 
+            if no face is found, only returned if :code:`return_proba=True`.
         """
         result = ""
         conf = 100.0
+        proba = None
         img = self.prepare_image(img, is_bgr=is_bgr)
         bboxes, _ = df.detect_face(img, self.minsize, self.pnet, self.rnet, self.onet, self.threshold, self.factor)
         if bboxes.shape[0] > 0:
             scaled_reshape_img = self.make_facenet_image(bboxes, img)
-            best_class, best_proba = self.predict(scaled_reshape_img)
-            if best_class != -1 and best_proba != -1:
-                if best_proba < self.min_confidence:
-                    result = self.unk
-                    # add_info_log("--------RI : Result is below required confidence! -> Return " + str(self.unk))
-                else:
-                    result = self.pnames[best_class]
-                    conf = best_proba
-                    # add_info_log('-----RI : Result -> "%s"' % result)
+            best_class, best_proba, proba = self.predict(scaled_reshape_img)
+            result, conf = self.__decide__(best_class, best_proba)
         else:
             # add_warning_log("--------RI : Can't find any face! -> Return " + str(self.err))
             result = self.err
+        if return_proba: return result, conf, proba
         return result, conf
 
+    def __findFaces__(self, imgs, is_bgr=True, bulk=False):
+        # Localize the faces of all images -> (indices, facenet images, failed indices)
+        if not bulk: return self.__findEachFace__(imgs, is_bgr=is_bgr)
+        valid_indices = []
+        valid_imgs = []
+        failed_indices = []
+        for i, img in enumerate(imgs):
+            try:
+                img = self.prepare_image(img, is_bgr=is_bgr)
+                if img.size == 0 or img.ndim != 3:
+                    raise ValueError("The image " + str(i) + " is empty.")
+                valid_imgs.append(img)
+                valid_indices.append(i)
+            except Exception as e:
+                failed_indices.append(i)
+                add_warning_log("--------RI : __findFaces__() -> " + str(e))
+        face_indices = []
+        face_imgs = []
+        if len(valid_imgs) > 0:
+            # Pad to a common size so each pyramid scale is a single P-Net batch, the scales 
+            # start from the expected face size in the crops instead of only from minsize
+            h = max([img.shape[0] for img in valid_imgs])
+            w = max([img.shape[1] for img in valid_imgs])
+            padded_imgs = [cv2.copyMakeBorder(img, 0, h - img.shape[0], 0, w - img.shape[1], 
+                                              cv2.BORDER_CONSTANT, value=0) 
+                           if img.shape[:2] != (h, w) else img for img in valid_imgs]
+            ratio = max(self.minsize, self.face_ratio * min(h, w)) / min(h, w)
+            faces = df.bulk_detect_face(padded_imgs, ratio, self.pnet, self.rnet, self.onet, 
+                                        self.threshold, self.factor)
+            for i, img, face in zip(valid_indices, valid_imgs, faces):
+                if face is not None and face[0].shape[0] > 0:
+                    face_imgs.append(self.make_facenet_image(face[0], img))
+                    face_indices.append(i)
+        return face_indices, face_imgs, failed_indices
+
+    def __findEachFace__(self, imgs, is_bgr=True):
+        # Localize the face of each image like recognize() -> The same faces as recognize()
+        face_indices = []
+        face_imgs = []
+        failed_indices = []
+        for i, img in enumerate(imgs):
+            try:
+                img = self.prepare_image(img, is_bgr=is_bgr)
+                bboxes, _ = df.detect_face(img, self.minsize, self.pnet, self.rnet, self.onet, 
+                                           self.threshold, self.factor)
+                if bboxes.shape[0] > 0:
+                    face_imgs.append(self.make_facenet_image(bboxes, img))
+                    face_indices.append(i)
+            except Exception as e:
+                failed_indices.append(i)
+                add_warning_log("--------RI : __findEachFace__() -> " + str(e))
+        return face_indices, face_imgs, failed_indices
+
+    def recognize_batch(self, imgs, is_bgr=True, return_proba=False, bulk_mtcnn=None):
+        """Recognize or re-identify multiple people at once. The face of each image is 
+        localized like :meth:`recognize()`, then all the found faces are embedded by a single 
+        :code:`sess.run` and classified by a single classifier call, so the results are the 
+        same as calling :meth:`recognize()` on each image.
+
+        With :obj:`bulk_mtcnn`, the faces of all images are localized together by the bulk 
+        MTCNN instead, where the images are padded to the same size so each scale of the image 
+        pyramid is a single P-Net call, and the R-Net and O-Net stages are single calls for all 
+        candidates. The pyramid starts from the expected face size in the images, so a face 
+        may be localized slightly differently than by :meth:`recognize()`.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images, normally the head regions of people.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`imgs` is BGR.
+        return_proba : bool, default=False
+            An indication of whether to also return the class-probability vectors.
+        bulk_mtcnn : bool, default=None
+            An indication of whether to localize the faces by the bulk MTCNN, set 
+            :code:`bulk_mtcnn=None` to use :code:`bulk_mtcnn` of the configurations.
+
+        Returns
+        -------
+        list[tuple(str, float) or None, ...]
+            A list of (class name, confidence) in the same order as :obj:`imgs`. An element 
+            is :code:`None` if its image can't be processed.
+        list[ndarray or None, ...]
+            A list of class-probability vectors in the same order as :obj:`imgs`, where an 
+            element is :code:`None` if no face is found, only returned if :code:`return_proba=True`.
+        """
+        results = [(self.err, 100.0)] * len(imgs)
+        probas = [None] * len(imgs)
+        if bulk_mtcnn is None: bulk_mtcnn = self.bulk_mtcnn
+        face_indices, face_imgs, failed_indices = self.__findFaces__(imgs, is_bgr=is_bgr, 
+                                                                     bulk=bulk_mtcnn)
+        for i in failed_indices:
+            results[i] = None
+        if len(face_imgs) > 0:
+            best_classes, best_probas, predictions = self.predict_batch(np.concatenate(face_imgs, axis=0))
+            for i, best_class, best_proba, proba in zip(face_indices, best_classes, best_probas, predictions):
+                results[i] = self.__decide__(best_class, best_proba)
+                probas[i] = proba
+        if return_proba: return results, probas
+        return results
+
+    def recognize_faces(self, faces, is_bgr=True, return_proba=False):
+        """Recognize or re-identify multiple people from their aligned face crops, for example 
+        the crops of :meth:`pyppbox.utils.croptools.FrameCropper.getKeypointFace()` of size 
+        :attr:`image_size`. MTCNN is skipped, and all the faces are embedded by a single 
+        :code:`sess.run` and classified by a single classifier call.
+
+        Parameters
+        ----------
+        faces : list[Mat, ...]
+            A list of cv :obj:`Mat` aligned face crops.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`faces` is BGR.
+        return_proba : bool, default=False
+            An indication of whether to also return the class-probability vectors.
+
+        Returns
+        -------
+        list[tuple(str, float), ...]
+            A list of (class name, confidence) in the same order as :obj:`faces`.
+        list[ndarray, ...]
+            A list of class-probability vectors in the same order as :obj:`faces`, only 
+            returned if :code:`return_proba=True`.
+        """
+        results = []
+        probas = []
+        if len(faces) > 0:
+            face_imgs = []
+            for face in faces:
+                face = self.prepare_image(face, is_bgr=is_bgr)
+                if face.shape[:2] != (self.image_size, self.image_size):
+                    face = cv2.resize(face, (self.image_size, self.image_size), 
+                                      interpolation=cv2.INTER_AREA)
+                face_imgs.append(self.make_facenet_face(face))
+            best_classes, best_probas, predictions = self.predict_batch(np.concatenate(face_imgs, axis=0))
+            for best_class, best_proba in zip(best_classes, best_probas):
+                results.append(self.__decide__(best_class, best_proba))
+            probas = [proba for proba in predictions]
+        if return_proba: return results, probas
+        return results
+
     def recognize_file(self, img_path):
         """
         :meta private:
@@ -183,14 +451,30 @@ class MyFaceNet(object):
         cropped_img = img[bb[0][1]:bb[0][3], bb[0][0]:bb[0][2], :]
         scaled_img = skimage.transform.resize(cropped_img, (self.image_size, self.image_size), 
                                               anti_aliasing=True)
-        scaled_img = cv2.resize(scaled_img, (self.input_image_size, self.input_image_size), 
+        return self.make_facenet_face(scaled_img)
+
+    def make_facenet_face(self, face):
+        """
+        :meta private:
+        """
+        if face.dtype == np.uint8:
+            # An aligned face crop of image_size, like skimage's resize output
+            face = face.astype(np.float64) / 255.
+        scaled_img = cv2.resize(face, (self.input_image_size, self.input_image_size), 
                                 interpolation=cv2.INTER_CUBIC)
         scaled_img = fn.prewhiten(scaled_img)
         scaled_reshape_img = scaled_img.reshape(-1, self.input_image_size, self.input_image_size, 3)
         return scaled_reshape_img
 
-    def train_classifier(self, C=1.0, kernel='rbf', probability=True, decision_function_shape='ovr'):
-        """Train a classifier and dump into pickle .pkl file.
+    def train_classifier(self, C=1.0, kernel='rbf', probability=True, decision_function_shape='ovr', 
+                         use_cache=True, workers=4):
+        """Train a classifier and dump into pickle .pkl file. With :code:`classifier: Gallery`, 
+        build the embedding gallery of the training data and save it to the :code:`.npz` file 
+        named after :attr:`classifier_file` instead, the SVC parameters are then ignored. The 
+        embeddings of the training images are kept in a :class:`FeatureStore` file named 
+        :code:`{classifier_file name}_features.npz`, so the next training only embeds the new or 
+        changed images. The images are embedded in batches of the configured :obj:`batch_size`, 
+        while the next batch is loaded by :obj:`workers` threads.
 
         Parameters
         ----------
@@ -205,8 +489,12 @@ class MyFaceNet(object):
         decision_function_shape : str, default='ovr'
             Choice of function: :code:`'ovo'` or :code:`'ovr'`, passed to sklearn's 
             :code:`SVC(decision_function_shape=decision_function_shape, ...)`.
+        use_cache : bool, default=True
+            An indication of whether to reuse and update the stored embeddings, set 
+            :code:`use_cache=False` to embed all images without touching the store.
+        workers : int, default=4
+            The number of threads loading the images.
         """
-        import math
         from sklearn.svm import SVC
         with tf.Graph().as_default():
 
@@ -233,28 +521,47 @@ class MyFaceNet(object):
                 add_info_log('-----RI : Calculating features ... ')
                 batch_size = self.batch_size
                 image_size = 160
-                nrof_images = len(paths)
-                nrof_batches_per_epoch = int(math.ceil(1.0 * nrof_images / batch_size))
-                emb_array = np.zeros((nrof_images, embedding_size))
-                for i in range(nrof_batches_per_epoch):
-                    start_index = i * batch_size
-                    end_index = min((i + 1) * batch_size, nrof_images)
-                    paths_batch = paths[start_index:end_index]
-                    images = fn.load_data(paths_batch, False, False, image_size)
-                    feed_dict = {images_placeholder: images, phase_train_placeholder: False}
-                    emb_array[start_index:end_index, :] = sess.run(embeddings, feed_dict=feed_dict)
-
-                # Train classifier
-                add_info_log('-----RI : Training classifier ... ')
-                model = SVC(C=C, kernel=kernel, probability=probability, 
-                            decision_function_shape=decision_function_shape)
-                model.fit(emb_array, labels)
-
-                # Create a list of class names & save classifier model
+
+                def load(path):
+                    # Called from the loading threads -> Decode, prewhiten, and crop
+                    return fn.load_data([path], False, False, image_size)[0]
+
+                def extract(paths):
+                    emb_array = np.zeros((len(paths), embedding_size))
+                    loader = ImageBatchLoader(paths, load, batch_size=batch_size, workers=workers)
+                    for start_index, images in loader:
+                        feed_dict = {images_placeholder: np.stack(images), phase_train_placeholder: False}
+                        emb_array[start_index:start_index + len(images), :] = sess.run(embeddings, 
+                                                                                       feed_dict=feed_dict)
+                        add_info_log('-----RI : Embedded ' + loader.report(len(images)))
+                    return emb_array
+
+                if use_cache:
+                    feature_file = os.path.splitext(classifier_filename_exp)[0] + "_features.npz"
+                    store = FeatureStore(feature_file, FeatureStore.getModelKey(modeldir, image_size))
+                    emb_array = store.getFeatures(paths, extract)
+                    store.save()
+                    add_info_log('-----RI : (reused, extracted) = ' + str((store.reused, store.extracted)))
+                else:
+                    emb_array = extract(paths)
+
                 class_names = [cls.name.replace('_', ' ') for cls in dataset]
-                with open(classifier_filename_exp, 'wb') as outfile:
-                    pickle.dump((model, class_names), outfile)
-                add_info_log('-----RI : Classifier file saved! -> %s' % classifier_filename_exp)
+                if self.use_gallery:
+                    # Build & save the embedding gallery
+                    gallery_file = os.path.splitext(classifier_filename_exp)[0] + ".npz"
+                    EmbeddingGallery.fromLabels(emb_array, labels, class_names).save(gallery_file)
+                    add_info_log('-----RI : Gallery file saved! -> %s' % gallery_file)
+                else:
+                    # Train classifier
+                    add_info_log('-----RI : Training classifier ... ')
+                    model = SVC(C=C, kernel=kernel, probability=probability, 
+                                decision_function_shape=decision_function_shape)
+                    model.fit(emb_array, labels)
+
+                    # Save classifier model
+                    with open(classifier_filename_exp, 'wb') as outfile:
+                        pickle.dump((model, class_names), outfile)
+                    add_info_log('-----RI : Classifier file saved! -> %s' % classifier_filename_exp)
                 classes_txt = classifier_filename_exp[:-3] + "txt"
                 with open(classes_txt, 'w') as classes_file:
                     classes_file.writelines([str(c) + "\n" for c in class_names])
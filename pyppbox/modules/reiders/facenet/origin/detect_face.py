@@ -536,6 +536,9 @@ def bulk_detect_face(images, detection_window_size_ratio, pnet, rnet, onet, thre
         if 'rnet_input' in image_obj:
             bulk_rnet_input = np.append(bulk_rnet_input, image_obj['rnet_input'], axis=0)
 
+    if bulk_rnet_input.shape[0] == 0:
+        return [None] * len(images)
+
     out = rnet(bulk_rnet_input)
     out0 = np.transpose(out[0])
     out1 = np.transpose(out[1])
@@ -592,6 +595,9 @@ def bulk_detect_face(images, detection_window_size_ratio, pnet, rnet, onet, thre
         if 'onet_input' in image_obj:
             bulk_onet_input = np.append(bulk_onet_input, image_obj['onet_input'], axis=0)
 
+    if bulk_onet_input.shape[0] == 0:
+        return [None] * len(images)
+
     out = onet(bulk_onet_input)
 
     out0 = np.transpose(out[0])
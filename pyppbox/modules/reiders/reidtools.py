@@ -0,0 +1,765 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+import os
+import cv2
+import time
+import numpy as np
+from itertools import islice
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from scipy.optimize import linear_sum_assignment
+
+from pyppbox.utils.logtools import add_info_log, add_warning_log, add_error_log
+from pyppbox.utils.statetools import saveState, loadState
+
+
+def assignUniqueIDs(proba, min_confidence, excluded_classes=[]):
+    """Assign one class to at most one person by solving a linear assignment over the
+    probability matrix of the people in a frame. Each person also has its own "unknown"
+    slack column costing :obj:`min_confidence`, so a person is only given a class if
+    its probability for that class is at least :obj:`min_confidence`; otherwise the
+    person is left unknown.
+
+    Parameters
+    ----------
+    proba : ndarray
+        The probability matrix, :code:`shape=(number of people, number of classes)`,
+        where each row is the class-probability vector of a person given by a reider.
+    min_confidence : float
+        The minimum probability, between 0 and 1, for a class to be assigned.
+    excluded_classes : list[int, ...], default=[]
+        The indices of the classes that can't be assigned, for example the classes
+        already held by other people in the same frame.
+
+    Returns
+    -------
+    list[tuple(int, float), ...]
+        A list of (class index, probability) in the same order as the rows of :obj:`proba`.
+        The class index is :code:`-1` for a person left unknown.
+    """
+    proba = np.asarray(proba, dtype=np.float64)
+    if proba.ndim != 2 or proba.shape[0] == 0:
+        return []
+    (n, c) = proba.shape
+    infeasible = float(n + 1)
+    cost = np.full((n, c + n), infeasible)
+    cost[:, :c] = -proba
+    if len(excluded_classes) > 0:
+        cost[:, list(excluded_classes)] = infeasible
+    cost[np.arange(n), c + np.arange(n)] = -float(min_confidence)
+    rows, cols = linear_sum_assignment(cost)
+    assigned = [(-1, 0.0)] * n
+    for r, k in zip(rows, cols):
+        if k < c and cost[r, k] < infeasible and proba[r, k] >= min_confidence:
+            assigned[r] = (int(k), float(proba[r, k]))
+    return assigned
+
+
+class ReIDCache(object):
+
+    """A cache of the ReID results keyed by the tracker :attr:`cid`. A track only needs to be 
+    re-identified again when it is new, when its cached result is older than :attr:`ttl` frames 
+    (:attr:`unknown_ttl` for an unknown result), when its cached confidence has decayed below 
+    :attr:`min_confidence`, or when the appearance signature (a hue-saturation histogram of its 
+    crop) has drifted beyond :attr:`drift_threshold`, for example after an ID switch of the 
+    tracker. The least recently seen tracks are evicted once there are more than 
+    :attr:`max_size` entries.
+
+    Attributes
+    ----------
+    ttl : int
+        Maximum age in frames of a known result.
+    unknown_ttl : int
+        Maximum age in frames of an unknown result.
+    decay : float
+        Confidence decay factor per frame.
+    min_confidence : float
+        Minimum decayed confidence (0 to 100) of a known result.
+    max_size : int
+        Maximum number of cached tracks.
+    drift_threshold : float
+        Maximum Bhattacharyya distance (0 to 1) between the cached and the current signature.
+    """
+
+    def __init__(self, 
+                 ttl=30, 
+                 unknown_ttl=5, 
+                 decay=0.99, 
+                 min_confidence=35.0, 
+                 max_size=512, 
+                 drift_threshold=0.4):
+        """Initialize the cache.
+
+        Parameters
+        ----------
+        ttl : int, default=30
+            Maximum age in frames of a known result.
+        unknown_ttl : int, default=5
+            Maximum age in frames of an unknown result, so an unknown track is retried every 
+            :obj:`unknown_ttl` frames instead of every frame.
+        decay : float, default=0.99
+            Confidence decay factor per frame.
+        min_confidence : float, default=35.0
+            Minimum decayed confidence (0 to 100) of a known result.
+        max_size : int, default=512
+            Maximum number of cached tracks.
+        drift_threshold : float, default=0.4
+            Maximum Bhattacharyya distance (0 to 1) between the cached and the current signature.
+        """
+        self.ttl = ttl
+        self.unknown_ttl = unknown_ttl
+        self.decay = decay
+        self.min_confidence = min_confidence
+        self.max_size = max_size
+        self.drift_threshold = drift_threshold
+        self.frame = 0
+        self.__entries__ = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries__)
+
+    def clear(self):
+        """Remove all the cached results."""
+        self.__entries__ = OrderedDict()
+        self.frame = 0
+
+    def nextFrame(self):
+        """Move to the next frame, must be called once per frame before :meth:`lookup()`."""
+        self.frame += 1
+
+    @staticmethod
+    def computeSignature(crop):
+        """Compute the appearance signature of a crop.
+
+        Parameters
+        ----------
+        crop : Mat
+            A cv :obj:`Mat` BGR image, normally a small body crop.
+
+        Returns
+        -------
+        ndarray
+            A normalized 16x8 hue-saturation histogram.
+        """
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+        return cv2.normalize(hist, hist, alpha=1.0, norm_type=cv2.NORM_L1)
+
+    def lookup(self, cid, signature=None):
+        """Look up the cached result of a track.
+
+        Parameters
+        ----------
+        cid : int
+            The tracker :attr:`cid`.
+        signature : ndarray, default=None
+            The current appearance signature given by :meth:`computeSignature()`. Set 
+            :code:`signature=None` to skip the drift check.
+
+        Returns
+        -------
+        tuple(str, float) or None
+            The cached (ID, decayed confidence), or :code:`None` if the track needs to be 
+            re-identified.
+        """
+        entry = self.__entries__.get(cid)
+        if entry is None: return None
+        self.__entries__.move_to_end(cid)
+        age = self.frame - entry['frame']
+        if entry['unknown']:
+            if age >= self.unknown_ttl: return None
+            conf = entry['conf']
+        else:
+            if age >= self.ttl: return None
+            conf = entry['conf'] * (self.decay ** age)
+            if conf < self.min_confidence: return None
+        if signature is not None and entry['signature'] is not None:
+            drift = cv2.compareHist(entry['signature'], signature, cv2.HISTCMP_BHATTACHARYYA)
+            if drift > self.drift_threshold: return None
+        return entry['id'], conf
+
+    def store(self, cid, rid, conf, unknown, signature=None, refreshed=True):
+        """Store the result of a track.
+
+        Parameters
+        ----------
+        cid : int
+            The tracker :attr:`cid`.
+        rid : str
+            The face ID or deep ID.
+        conf : float
+            The confidence of :obj:`rid`.
+        unknown : bool
+            An indication of whether :obj:`rid` is unknown.
+        signature : ndarray, default=None
+            The appearance signature of the crop used for the re-identification.
+        refreshed : bool, default=True
+            Set :code:`refreshed=True` if :obj:`rid` comes from a new re-identification in 
+            the current frame; otherwise, only the ID of an existing entry is updated and its 
+            age, confidence and signature are kept.
+        """
+        entry = self.__entries__.get(cid)
+        if refreshed:
+            self.__entries__[cid] = {'id': rid, 
+                                     'conf': float(conf), 
+                                     'unknown': unknown, 
+                                     'signature': signature, 
+                                     'frame': self.frame}
+        elif entry is None:
+            return
+        elif entry['id'] != rid:
+            entry['id'] = rid
+            entry['unknown'] = unknown
+            if unknown: entry['conf'] = float(conf)
+        self.__entries__.move_to_end(cid)
+        while len(self.__entries__) > self.max_size:
+            self.__entries__.popitem(last=False)
+
+    def getState(self):
+        """Get a copy of the cached results as a dictionary of numpy arrays, from the least to
+        the most recently seen track.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The arrays of the cached results and the current frame.
+        """
+        entries = list(self.__entries__.items())
+        signatures = np.zeros((len(entries), 16, 8), dtype=np.float32)
+        has_signature = np.zeros(len(entries), dtype=bool)
+        for i, (_, entry) in enumerate(entries):
+            if entry['signature'] is not None:
+                signatures[i] = entry['signature']
+                has_signature[i] = True
+        return {'frame': np.array(self.frame),
+                'cids': np.array([cid for (cid, _) in entries], dtype=int),
+                'ids': np.array([entry['id'] for (_, entry) in entries], dtype=str),
+                'confs': np.array([entry['conf'] for (_, entry) in entries], dtype=np.float64),
+                'unknown': np.array([entry['unknown'] for (_, entry) in entries], dtype=bool),
+                'frames': np.array([entry['frame'] for (_, entry) in entries], dtype=int),
+                'signatures': signatures,
+                'has_signature': has_signature}
+
+    def setState(self, state):
+        """Restore the cached results given by :meth:`getState()`.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A state given by :meth:`getState()`.
+        """
+        self.clear()
+        self.frame = int(state['frame'])
+        for i, cid in enumerate(state['cids'].tolist()):
+            signature = state['signatures'][i].copy() if state['has_signature'][i] else None
+            self.__entries__[cid] = {'id': str(state['ids'][i]),
+                                     'conf': float(state['confs'][i]),
+                                     'unknown': bool(state['unknown'][i]),
+                                     'signature': signature,
+                                     'frame': int(state['frames'][i])}
+
+
+class EmbeddingGallery(object):
+
+    """A gallery of L2-normalized embeddings of known identities, an alternative to the SVC 
+    classifier of the reiders. The embeddings are kept in one contiguous float32 matrix where 
+    the embeddings of each identity are adjacent, so the cosine similarities of a batch of 
+    query embeddings to all identities take one matrix multiply followed by a max-reduction 
+    over the embeddings of each identity. An identity can be enrolled or removed without 
+    retraining anything, and the gallery is saved as a memory-mappable :code:`.npy` matrix 
+    with a small :code:`.npz` index instead of a pickle.
+
+    Attributes
+    ----------
+    embeddings : ndarray
+        The L2-normalized embeddings of all identities, :code:`shape=(N, dimension)`, 
+        :code:`dtype=float32`.
+    names : list[str, ...]
+        The names of the identities, where the index of a name is the index of its score in 
+        :meth:`scores()`.
+    offsets : ndarray
+        The embeddings of the identity :code:`names[k]` are 
+        :code:`embeddings[offsets[k]:offsets[k + 1]]`, :code:`shape=(len(names) + 1,)`.
+    """
+
+    def __init__(self):
+        """Initialize an empty gallery."""
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.names = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.__index__ = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def normalize(features):
+        """L2-normalize embeddings.
+
+        Parameters
+        ----------
+        features : ndarray
+            The embeddings, :code:`shape=(number of embeddings, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            The normalized float32 embeddings.
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if features.size == 0:
+            return np.zeros((len(features), features.shape[-1] if features.ndim > 1 else 0), 
+                            dtype=np.float32)
+        features = features.reshape(len(features), -1)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def fromLabels(embeddings, labels, names):
+        """Build a gallery from labeled embeddings at once, e.g. the embeddings of a training 
+        dataset.
+
+        Parameters
+        ----------
+        embeddings : ndarray
+            The embeddings, :code:`shape=(number of embeddings, dimension)`.
+        labels : list[int, ...]
+            The index into :obj:`names` of every embedding.
+        names : list[str, ...]
+            The names of the identities, the identities without embedding are skipped.
+
+        Returns
+        -------
+        EmbeddingGallery
+            The gallery.
+        """
+        gallery = EmbeddingGallery()
+        labels = np.asarray(labels, dtype=int).reshape(-1)
+        if len(labels) == 0: return gallery
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=len(names))
+        kept = np.flatnonzero(counts > 0)
+        gallery.embeddings = EmbeddingGallery.normalize(embeddings)[order]
+        gallery.names = [str(names[k]) for k in kept]
+        gallery.offsets = np.concatenate(([0], np.cumsum(counts[kept]))).astype(np.int64)
+        gallery.__index__ = {name: k for k, name in enumerate(gallery.names)}
+        return gallery
+
+    def getNames(self):
+        """Get the names of the identities.
+
+        Returns
+        -------
+        list[str, ...]
+            The names, the same list object as :attr:`names`.
+        """
+        return self.names
+
+    def enroll(self, name, embeddings):
+        """Enroll a new identity, or add more embeddings to a known identity.
+
+        Parameters
+        ----------
+        name : str
+            The name of the identity.
+        embeddings : ndarray
+            The embeddings of the identity, :code:`shape=(number of embeddings, dimension)`.
+        """
+        embeddings = self.normalize(embeddings)
+        if len(embeddings) == 0: return
+        if len(self.embeddings) == 0:
+            self.embeddings = np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+        elif embeddings.shape[1] != self.embeddings.shape[1]:
+            msg = ("EmbeddingGallery : enroll() -> The embeddings of '" + str(name) + 
+                   "' have a dimension of " + str(embeddings.shape[1]) + " instead of " + 
+                   str(self.embeddings.shape[1]) + ".")
+            add_error_log(msg)
+            raise ValueError(msg)
+        k = self.__index__.get(name)
+        if k is None:
+            self.embeddings = np.concatenate((self.embeddings, embeddings))
+            self.offsets = np.append(self.offsets, self.offsets[-1] + len(embeddings))
+            self.__index__[name] = len(self.names)
+            self.names.append(name)
+        else:
+            end = self.offsets[k + 1]
+            self.embeddings = np.concatenate((self.embeddings[:end], embeddings, 
+                                              self.embeddings[end:]))
+            self.offsets[k + 1:] += len(embeddings)
+
+    def remove(self, name):
+        """Remove an identity and all its embeddings.
+
+        Parameters
+        ----------
+        name : str
+            The name of the identity.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the identity was in the gallery.
+        """
+        k = self.__index__.get(name)
+        if k is None: return False
+        (start, end) = (self.offsets[k], self.offsets[k + 1])
+        self.embeddings = np.concatenate((self.embeddings[:start], self.embeddings[end:]))
+        self.offsets = np.concatenate((self.offsets[:k + 1], self.offsets[k + 2:] - (end - start)))
+        del self.names[k]
+        self.__index__ = {n: i for i, n in enumerate(self.names)}
+        return True
+
+    def scores(self, features):
+        """Compute the cosine similarity of each embedding to each identity, which is the 
+        highest similarity to any embedding of the identity.
+
+        Parameters
+        ----------
+        features : ndarray
+            The query embeddings, :code:`shape=(number of queries, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            The similarities, :code:`shape=(number of queries, len(names))`.
+        """
+        features = self.normalize(features)
+        if len(features) == 0 or len(self.names) == 0:
+            return np.zeros((len(features), len(self.names)), dtype=np.float32)
+        similarities = np.dot(features, self.embeddings.T)
+        return np.maximum.reduceat(similarities, self.offsets[:-1], axis=1)
+
+    def search(self, features, k=1):
+        """Find the :obj:`k` most similar identities of each embedding.
+
+        Parameters
+        ----------
+        features : ndarray
+            The query embeddings, :code:`shape=(number of queries, dimension)`.
+        k : int, default=1
+            The number of identities to return per query, at most :code:`len(names)`.
+
+        Returns
+        -------
+        ndarray
+            The indices into :attr:`names`, :code:`shape=(number of queries, k)`, from the 
+            most similar.
+        ndarray
+            The cosine similarities, :code:`shape=(number of queries, k)`.
+        """
+        scores = self.scores(features)
+        k = min(int(k), scores.shape[1])
+        if k <= 0:
+            return np.zeros((len(scores), 0), dtype=int), np.zeros((len(scores), 0), dtype=np.float32)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    @staticmethod
+    def getMatrixFile(gallery_file):
+        """Get the :code:`.npy` file of the embedding matrix of a gallery file.
+
+        Parameters
+        ----------
+        gallery_file : str
+            The :code:`.npz` index file of a gallery.
+
+        Returns
+        -------
+        str
+            The :code:`.npy` file next to :obj:`gallery_file`.
+        """
+        return os.path.splitext(gallery_file)[0] + ".npy"
+
+    def save(self, gallery_file):
+        """Save the gallery as a :code:`.npz` index of the names and offsets, and a 
+        :code:`.npy` embedding matrix next to it, see :meth:`getMatrixFile()`. Both files are 
+        written next to their paths first and then renamed.
+
+        Parameters
+        ----------
+        gallery_file : str
+            The path of the :code:`.npz` index file.
+        """
+        matrix_file = self.getMatrixFile(gallery_file)
+        with open(matrix_file + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        os.replace(matrix_file + ".tmp", matrix_file)
+        saveState({'names': np.array(self.names, dtype=str), 'offsets': self.offsets}, 
+                  gallery_file)
+
+    @staticmethod
+    def load(gallery_file, mmap=True):
+        """Load a gallery saved by :meth:`save()`.
+
+        Parameters
+        ----------
+        gallery_file : str
+            The path of the :code:`.npz` index file.
+        mmap : bool, default=True
+            Memory-map the embedding matrix read-only instead of reading it, so a large 
+            gallery is loaded instantly and shared between processes. Enrolling or removing an 
+            identity makes an in-memory copy.
+
+        Returns
+        -------
+        EmbeddingGallery
+            The gallery.
+        """
+        index = loadState(gallery_file)
+        gallery = EmbeddingGallery()
+        gallery.embeddings = np.load(EmbeddingGallery.getMatrixFile(gallery_file), 
+                                     mmap_mode="r" if mmap else None, allow_pickle=False)
+        gallery.names = [str(name) for name in index['names']]
+        gallery.offsets = np.asarray(index['offsets'], dtype=np.int64)
+        gallery.__index__ = {name: k for k, name in enumerate(gallery.names)}
+        return gallery
+
+
+class FeatureStore(object):
+
+    """An on-disk store of the embeddings of image files, used by the reiders to train their 
+    classifier without embedding the unchanged images again. An embedding is keyed by the 
+    absolute path, the size, and the modification time of its image, and the whole store is 
+    keyed by the identity of the model given by :meth:`getModelKey()`, so only the new or 
+    changed images are embedded, and all images are embedded again once the model changes. The 
+    store is a single :code:`.npz` file of the paths, keys, and the float32 embedding matrix.
+
+    Attributes
+    ----------
+    store_file : str
+        The path of the :code:`.npz` store file.
+    model_key : str
+        The identity of the model which produced the embeddings.
+    reused : int
+        The number of embeddings reused by the last :meth:`getFeatures()`.
+    extracted : int
+        The number of embeddings extracted by the last :meth:`getFeatures()`.
+    """
+
+    def __init__(self, store_file, model_key):
+        """Initialize the store, and load the embeddings of :obj:`store_file` if it exists and 
+        has the same :obj:`model_key`.
+
+        Parameters
+        ----------
+        store_file : str
+            The path of the :code:`.npz` store file.
+        model_key : str
+            The identity of the model, see :meth:`getModelKey()`.
+        """
+        self.store_file = store_file
+        self.model_key = str(model_key)
+        self.reused = 0
+        self.extracted = 0
+        self.__entries__ = {}
+        if os.path.isfile(self.store_file):
+            self.__load__()
+
+    def __len__(self):
+        return len(self.__entries__)
+
+    def __load__(self):
+        try:
+            state = loadState(self.store_file)
+        except Exception as e:
+            add_warning_log("FeatureStore : Can't load '" + str(self.store_file) + "' -> " + str(e))
+            return
+        if str(state['model_key']) != self.model_key:
+            add_info_log("FeatureStore : The model has changed, all images will be embedded again.")
+            return
+        for path, size, mtime, feature in zip(state['paths'].tolist(), state['sizes'].tolist(), 
+                                              state['mtimes'].tolist(), state['features']):
+            self.__entries__[path] = (size, mtime, feature)
+
+    @staticmethod
+    def getModelKey(*parts):
+        """Make the identity of a model from its parts, e.g. its name and its weight file. The 
+        size and the modification time of each part which is an existing file are included, so 
+        the key changes once the weights are replaced.
+
+        Parameters
+        ----------
+        *parts : any
+            The parts of the identity.
+
+        Returns
+        -------
+        str
+            The model key.
+        """
+        keys = []
+        for part in parts:
+            key = str(part)
+            if isinstance(part, str) and os.path.isfile(part):
+                stat = os.stat(part)
+                key = os.path.abspath(part) + ":" + str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+            keys.append(key)
+        return "|".join(keys)
+
+    def getFeatures(self, paths, extract):
+        """Get the embeddings of image files, only the images which are not in the store, or 
+        which have changed since they were stored, are embedded by :obj:`extract`.
+
+        Parameters
+        ----------
+        paths : list[str, ...]
+            The paths of the images.
+        extract : callable
+            A function which takes a list of image paths and returns their embeddings, 
+            :code:`shape=(number of paths, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            The float32 embeddings in the same order as :obj:`paths`, 
+            :code:`shape=(len(paths), dimension)`.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        keys = []
+        for path in paths:
+            stat = os.stat(path)
+            keys.append((stat.st_size, stat.st_mtime_ns))
+        missing = [i for i, (path, key) in enumerate(zip(paths, keys)) 
+                   if self.__entries__.get(path, (None, None))[:2] != key]
+        if len(missing) > 0:
+            features = np.asarray(extract([paths[i] for i in missing]), dtype=np.float32)
+            features = features.reshape(len(missing), -1)
+            for i, feature in zip(missing, features):
+                self.__entries__[paths[i]] = keys[i] + (feature,)
+        self.extracted = len(missing)
+        self.reused = len(paths) - len(missing)
+        if len(paths) == 0: return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self.__entries__[path][2] for path in paths])
+
+    def save(self):
+        """Save the store, the embeddings of the images which no longer exist are dropped."""
+        paths = [path for path in self.__entries__ if os.path.isfile(path)]
+        entries = [self.__entries__[path] for path in paths]
+        state = {'model_key': np.array(self.model_key), 
+                 'paths': np.array(paths, dtype=str), 
+                 'sizes': np.array([entry[0] for entry in entries], dtype=np.int64), 
+                 'mtimes': np.array([entry[1] for entry in entries], dtype=np.int64)}
+        if len(entries) > 0:
+            state['features'] = np.stack([entry[2] for entry in entries]).astype(np.float32)
+        else:
+            state['features'] = np.zeros((0, 0), dtype=np.float32)
+        saveState(state, self.store_file)
+
+
+class ImageBatchLoader(object):
+
+    """A streaming loader of image files in batches, used by the reiders to embed a training 
+    dataset with bounded memory. The images are loaded by a pool of threads, and the next 
+    :obj:`prefetch` batches are loaded while the current batch is embedded. A further batch 
+    is only submitted when the caller asks for the next one, so at most :code:`prefetch + 1` 
+    batches are in memory while the caller processes a batch.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        loader = ImageBatchLoader(paths, load, batch_size=256)
+        for start, imgs in loader:
+            features[start:start + len(imgs)] = embed(imgs)
+            add_info_log("Embedded " + loader.report(len(imgs)))
+
+    Attributes
+    ----------
+    paths : list[str, ...]
+        The paths of the images.
+    batch_size : int
+        The number of images per batch.
+    workers : int
+        The number of loading threads.
+    prefetch : int
+        The number of batches loaded ahead of the current batch.
+    """
+
+    def __init__(self, paths, load, batch_size=256, workers=4, prefetch=1):
+        """Initialize the loader.
+
+        Parameters
+        ----------
+        paths : list[str, ...]
+            The paths of the images.
+        load : callable
+            A function which takes the path of an image and returns the loaded image, it is 
+            called from the loading threads.
+        batch_size : int, default=256
+            The number of images per batch.
+        workers : int, default=4
+            The number of loading threads.
+        prefetch : int, default=1
+            The number of batches loaded ahead of the current batch.
+        """
+        self.paths = list(paths)
+        self.load = load
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+        self.prefetch = max(0, int(prefetch))
+        self.__done__ = 0
+        self.__start_time__ = None
+
+    def __len__(self):
+        return (len(self.paths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        """Yield :code:`(start, images)` for each batch in order, where :code:`start` is the 
+        index of the first image of the batch in :attr:`paths`."""
+        self.__done__ = 0
+        self.__start_time__ = time.time()
+        starts = iter(range(0, len(self.paths), self.batch_size))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+
+            def submit(start):
+                return start, [pool.submit(self.load, path) 
+                               for path in self.paths[start:start + self.batch_size]]
+
+            pending = deque(submit(start) for start in islice(starts, self.prefetch + 1))
+            while len(pending) > 0:
+                (start, futures) = pending.popleft()
+                yield start, [future.result() for future in futures]
+                # Submit after the caller resumes, so the yielded batch is not kept alive 
+                # together with prefetch + 1 loading batches
+                following = next(starts, None)
+                if following is not None: pending.append(submit(following))
+
+    def report(self, count):
+        """Count the processed images of the current batch and describe the progress.
+
+        Parameters
+        ----------
+        count : int
+            The number of processed images.
+
+        Returns
+        -------
+        str
+            The progress, e.g. :code:`"512/2048 images, 180.3 images/s"`.
+        """
+        self.__done__ += count
+        elapsed = time.time() - (self.__start_time__ or time.time())
+        rate = self.__done__ / elapsed if elapsed > 0 else 0.
+        return (str(self.__done__) + "/" + str(len(self.paths)) + " images, " + 
+                "%.1f" % rate + " images/s")
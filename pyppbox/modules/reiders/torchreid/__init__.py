@@ -19,13 +19,15 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 
+import os
 import cv2
 import pickle
 import numpy as np
 from sklearn.svm import SVC
 
 from pyppbox.utils.commontools import getFileName
-from pyppbox.utils.logtools import add_info_log
+from pyppbox.utils.logtools import add_info_log, add_warning_log, add_error_log
+from pyppbox.modules.reiders.reidtools import EmbeddingGallery, FeatureStore, ImageBatchLoader
 
 from .utils import deepreid_extractor, get_dataset, get_image_paths_and_labels
 
@@ -46,40 +48,164 @@ class MyTorchreid(object):
         self.err = cfg.unified_strings.err_did
         self.mdir = cfg.base_model_path
         self.classifier_pkl = cfg.classifier_pkl
+        self.use_gallery = str(cfg.classifier).lower() == "gallery"
+        self.gallery_file = os.path.splitext(self.classifier_pkl)[0] + ".npz"
+        self.feature_file = os.path.splitext(self.classifier_pkl)[0] + "_features.npz"
         self.train_data = cfg.train_data
         self.model_name = cfg.model_name
         self.model_path = cfg.model_path
+        self.model_wh = tuple(cfg.model_wh)
         self.device = cfg.device
-        self.min_confidence = int(100 * cfg.min_confidence)
+        # The gallery similarities are thresholded by min_similarity instead of min_confidence
+        self.min_confidence = int(100 * (cfg.min_similarity if self.use_gallery 
+                                         else cfg.min_confidence))
         # add_info_log("--------RI : Initializing ReID model ...")
         self.extractor = deepreid_extractor(self.model_name, self.mdir, 
                                             self.model_path, device=self.device)
+        # Increased whenever the classes change, so the users of a shared reider can drop 
+        # their outdated probability vectors
+        self.classes_version = 0
         self.auto_load = auto_load
         if self.auto_load:
             self.load_classifier()
 
     def load_classifier(self):
-        """Load the classifier model from the configurations.
+        """Load the classifier model from the configurations. With :code:`classifier: Gallery`, 
+        the embedding gallery is memory-mapped from the :code:`.npz` file named after 
+        :attr:`classifier_pkl`, or started empty if there is no such file yet.
         """
-        with open(self.classifier_pkl, 'rb') as classifier_file:
-            (self.model, self.class_names) = pickle.load(classifier_file)
-        add_info_log("--------RI : Classifier loaded! <- " + getFileName(self.classifier_pkl))
+        if self.use_gallery:
+            if os.path.isfile(self.gallery_file):
+                self.gallery = EmbeddingGallery.load(self.gallery_file)
+                add_info_log("--------RI : Gallery loaded! <- " + getFileName(self.gallery_file))
+            else:
+                self.gallery = EmbeddingGallery()
+                add_warning_log("--------RI : No gallery yet, starting empty -> " + 
+                                str(self.gallery_file))
+            self.class_names = self.gallery.getNames()
+        else:
+            with open(self.classifier_pkl, 'rb') as classifier_file:
+                (self.model, self.class_names) = pickle.load(classifier_file)
+            add_info_log("--------RI : Classifier loaded! <- " + getFileName(self.classifier_pkl))
+        self.classes_version += 1
+
+    def __classify__(self, emb_array):
+        # Gallery -> cosine similarity to each identity, used as the probability
+        if self.use_gallery:
+            return np.maximum(self.gallery.scores(emb_array), 0.)
+        return self.model.predict_proba(emb_array)
 
     def predict(self, img):
         """
         :meta private:
         """
-        best_class = -1
-        best_proba = -1
         emb_array = self.extractor(img).cpu().numpy()
-        predictions = self.model.predict_proba(emb_array)
+        best_classes, best_probas, predictions = self.predict_features(emb_array)
+        return best_classes[0], best_probas[0], predictions[0]
+
+    def predict_batch(self, imgs):
+        """
+        :meta private:
+        """
+        return self.predict_features(self.extractor(list(imgs)).cpu().numpy())
+
+    def predict_features(self, emb_array):
+        """
+        :meta private:
+        """
+        predictions = self.__classify__(emb_array)
+        if predictions.shape[1] == 0:
+            return [-1] * len(predictions), [-1] * len(predictions), predictions
         best_class_indices = np.argmax(predictions, axis=1)
         best_class_probabilities = predictions[np.arange(len(best_class_indices)), best_class_indices]
-        best_class = best_class_indices[0]
-        best_proba = float(best_class_probabilities*100)
-        return best_class, best_proba
+        best_probas = [float(p*100) for p in best_class_probabilities]
+        return best_class_indices, best_probas, predictions
+
+    def __decide__(self, best_class, best_proba):
+        result = ""
+        conf = 100.0
+        if best_class != -1 and best_proba != -1:
+            if best_proba < self.min_confidence:
+                result = self.unk
+                # add_info_log("--------RI : Result is below required confidence! -> Return " + str(self.unk))
+            else:
+                result = self.class_names[best_class]
+                conf = best_proba
+                # add_info_log('-----RI : Result = "%s"' % result)
+        else:
+            # add_warning_log("--------RI : The input can't be processed -> Return " + str(self.err))
+            result = self.err
+        return result, conf
+
+    def getClassNames(self):
+        """Get the class names of the loaded classifier.
+
+        Returns
+        -------
+        list[str, ...]
+            A list of class names, where the index of a class name is the index of its 
+            probability in the probability vector returned by :meth:`recognize()`.
+        """
+        return self.class_names
+
+    def __checkGallery__(self, caller):
+        if not self.use_gallery:
+            msg = ("MyTorchreid : " + caller + "() -> Only supported with 'classifier: Gallery', " + 
+                   "retrain the classifier with train_classifier() instead.")
+            add_error_log(msg)
+            raise ValueError(msg)
+
+    def enroll(self, name, imgs, is_bgr=True, save=True):
+        """Enroll a new identity, or add more images to a known identity, in the embedding 
+        gallery without any retraining. Only supported with :code:`classifier: Gallery`.
+
+        Parameters
+        ----------
+        name : str
+            The class name of the identity.
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images of the identity, normally resized to the same 
+            :obj:`model_wh`.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`imgs` is BGR.
+        save : bool, default=True
+            An indication of whether to save the gallery after the update.
+
+        Returns
+        -------
+        int
+            The number of enrolled embeddings.
+        """
+        self.__checkGallery__("enroll")
+        features = self.extract(imgs, is_bgr=is_bgr)
+        self.classes_version += 1
+        self.gallery.enroll(name, features)
+        if save: self.gallery.save(self.gallery_file)
+        return len(features)
+
+    def remove(self, name, save=True):
+        """Remove an identity from the embedding gallery. Only supported with 
+        :code:`classifier: Gallery`.
+
+        Parameters
+        ----------
+        name : str
+            The class name of the identity.
+        save : bool, default=True
+            An indication of whether to save the gallery after the update.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the identity was in the gallery.
+        """
+        self.__checkGallery__("remove")
+        removed = self.gallery.remove(name)
+        if removed: self.classes_version += 1
+        if removed and save: self.gallery.save(self.gallery_file)
+        return removed
 
-    def recognize(self, img, is_bgr=True):
+    def recognize(self, img, is_bgr=True, return_proba=False):
         """Recognize or re-identify a person in the given :obj:`img`.
 
         Parameters
@@ -88,6 +214,8 @@ class MyTorchreid(object):
             A cv :obj:`Mat` image.
         is_bgr : bool, default=True
             An indication of whether the color channel of given :obj:`img` is BGR.
+        return_proba : bool, default=False
+            An indication of whether to also return the full class-probability vector.
 
         Returns
         -------
@@ -95,24 +223,99 @@ class MyTorchreid(object):
             A class name.
         float 
             Confidence of the result.
+        ndarray
+            The class-probability vector, :code:`shape=(number of classes,)`, only returned 
+            if :code:`return_proba=True`.
         """
-        result = ""
-        conf = 100.0
         img = self.prepare_image(img, is_bgr=is_bgr)
-        best_class, best_proba = self.predict(img)
-        if best_class != -1 and best_proba != -1:
-            if best_proba < self.min_confidence:
-                result = self.unk
-                # add_info_log("--------RI : Result is below required confidence! -> Return " + str(self.unk))
-            else:
-                result = self.class_names[best_class]
-                conf = best_proba
-                # add_info_log('-----RI : Result = "%s"' % result)
-        else:
-            # add_warning_log("--------RI : The input can't be processed -> Return " + str(self.err))
-            result = self.err
+        best_class, best_proba, proba = self.predict(img)
+        result, conf = self.__decide__(best_class, best_proba)
+        if return_proba: return result, conf, proba
         return result, conf
 
+    def recognize_batch(self, imgs, is_bgr=True, return_proba=False):
+        """Recognize or re-identify multiple people at once by running a single forward pass 
+        of the extractor and a single classifier call. The results are the same as calling 
+        :meth:`recognize()` on each image.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images, normally resized to the same :obj:`model_wh`.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`imgs` is BGR.
+        return_proba : bool, default=False
+            An indication of whether to also return the class-probability vectors.
+
+        Returns
+        -------
+        list[tuple(str, float), ...]
+            A list of (class name, confidence) in the same order as :obj:`imgs`.
+        list[ndarray, ...]
+            A list of class-probability vectors in the same order as :obj:`imgs`, only 
+            returned if :code:`return_proba=True`.
+        """
+        results = []
+        probas = []
+        if len(imgs) > 0:
+            imgs = self.prepare_images(imgs, is_bgr=is_bgr)
+            best_classes, best_probas, predictions = self.predict_batch(imgs)
+            for best_class, best_proba in zip(best_classes, best_probas):
+                results.append(self.__decide__(best_class, best_proba))
+            probas = [proba for proba in predictions]
+        if return_proba: return results, probas
+        return results
+
+    def extract(self, imgs, is_bgr=True):
+        """Extract the embeddings of multiple people at once with a single forward pass of 
+        the extractor, for example to be shared with the appearance encoder of DeepSORT.
+
+        Parameters
+        ----------
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` images, normally resized to the same :obj:`model_wh`.
+        is_bgr : bool, default=True
+            An indication of whether the color channel of the given :obj:`imgs` is BGR.
+
+        Returns
+        -------
+        ndarray
+            The embeddings, :code:`shape=(len(imgs), feature dimension)`.
+        """
+        if len(imgs) == 0: return np.empty((0, 0), dtype=np.float32)
+        imgs = self.prepare_images(imgs, is_bgr=is_bgr)
+        return self.extractor(list(imgs)).cpu().numpy()
+
+    def recognize_features(self, features, return_proba=False):
+        """Recognize or re-identify multiple people from their embeddings given by 
+        :meth:`extract()` with a single classifier call. The results are the same as calling 
+        :meth:`recognize_batch()` on the images of the embeddings.
+
+        Parameters
+        ----------
+        features : ndarray
+            The embeddings, :code:`shape=(number of people, feature dimension)`.
+        return_proba : bool, default=False
+            An indication of whether to also return the class-probability vectors.
+
+        Returns
+        -------
+        list[tuple(str, float), ...]
+            A list of (class name, confidence) in the same order as :obj:`features`.
+        list[ndarray, ...]
+            A list of class-probability vectors in the same order as :obj:`features`, only 
+            returned if :code:`return_proba=True`.
+        """
+        results = []
+        probas = []
+        if len(features) > 0:
+            best_classes, best_probas, predictions = self.predict_features(np.asarray(features))
+            for best_class, best_proba in zip(best_classes, best_probas):
+                results.append(self.__decide__(best_class, best_proba))
+            probas = [proba for proba in predictions]
+        if return_proba: return results, probas
+        return results
+
     def recognize_file(self, img_path):
         """
         :meta private:
@@ -128,8 +331,54 @@ class MyTorchreid(object):
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         return img
 
-    def train_classifier(self, C=1.0, kernel='rbf', probability=True, decision_function_shape='ovr'):
-        """Train a classifier and dump into pickle .pkl file.
+    def prepare_images(self, imgs, is_bgr=True):
+        """
+        :meta private:
+        """
+        if is_bgr:
+            shapes = set([img.shape for img in imgs])
+            if len(shapes) == 1 and imgs[0].ndim == 3 and imgs[0].size != 0:
+                # Same size crops -> Convert them all in one cvtColor call
+                (h, w, c) = imgs[0].shape
+                stack = np.stack(imgs).reshape(-1, w, c)
+                stack = cv2.cvtColor(stack, cv2.COLOR_BGR2RGB).reshape(-1, h, w, c)
+                imgs = [img for img in stack]
+            else:
+                imgs = [self.prepare_image(img, is_bgr=is_bgr) for img in imgs]
+        return imgs
+
+    def __loadImage__(self, path):
+        # Called from the loading threads -> Decode, resize, and convert to RGB
+        img = cv2.imread(path)
+        if img is None:
+            msg = "MyTorchreid : train_classifier() -> Can't read the image '" + str(path) + "'."
+            add_error_log(msg)
+            raise ValueError(msg)
+        if min(self.model_wh) > 0 and (img.shape[1], img.shape[0]) != self.model_wh:
+            img = cv2.resize(img, self.model_wh, interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def __extractFiles__(self, paths, batch_size=256, workers=4):
+        # Stream the images in batches, the next batch is loaded while the current is embedded
+        emb_array = np.zeros((0, 0), dtype=np.float32)
+        loader = ImageBatchLoader(paths, self.__loadImage__, batch_size=batch_size, workers=workers)
+        for start, imgs in loader:
+            features = self.extractor(imgs).cpu().numpy()
+            if start == 0:
+                emb_array = np.zeros((len(paths), features.shape[1]), dtype=features.dtype)
+            emb_array[start:start + len(imgs)] = features
+            add_info_log("--------RI : Embedded " + loader.report(len(imgs)))
+        return emb_array
+
+    def train_classifier(self, C=1.0, kernel='rbf', probability=True, decision_function_shape='ovr', 
+                         use_cache=True, batch_size=256, workers=4):
+        """Train a classifier and dump into pickle .pkl file. With :code:`classifier: Gallery`, 
+        build the embedding gallery of the training data and save it to the :code:`.npz` file 
+        named after :attr:`classifier_pkl` instead, the SVC parameters are then ignored. The 
+        embeddings of the training images are kept in a :class:`FeatureStore` file named 
+        :code:`{classifier_pkl name}_features.npz`, so the next training only embeds the new or 
+        changed images. The images are embedded in batches of :obj:`batch_size`, while the next 
+        batch is loaded by :obj:`workers` threads.
 
         Parameters
         ----------
@@ -144,21 +393,45 @@ class MyTorchreid(object):
         decision_function_shape : str, default='ovr'
             Choice of function: :code:`'ovo'` or :code:`'ovr'`, passed to sklearn's 
             :code:`SVC(decision_function_shape=decision_function_shape, ...)`.
+        use_cache : bool, default=True
+            An indication of whether to reuse and update the stored embeddings, set 
+            :code:`use_cache=False` to embed all images without touching the store.
+        batch_size : int, default=256
+            The number of images embedded at once, which bounds the memory usage.
+        workers : int, default=4
+            The number of threads loading the images.
         """
         dataset = get_dataset(self.train_data)
         paths, labels = get_image_paths_and_labels(dataset)
         add_info_log("--------RI : Extracting features ...")
-        emb_array = self.extractor(paths).cpu().numpy()
+        if use_cache:
+            # The preprocessing of __loadImage__() is part of the key, so the features of 
+            # another preprocessing are not mixed with the new ones
+            preprocessing = "cv2_resize_" + "x".join(str(v) for v in self.model_wh)
+            store = FeatureStore(self.feature_file, 
+                                 FeatureStore.getModelKey(self.model_name, self.model_path, 
+                                                          preprocessing))
+            emb_array = store.getFeatures(
+                paths, lambda batch: self.__extractFiles__(batch, batch_size, workers)
+            )
+            store.save()
+            add_info_log("--------RI : (reused, extracted) = " + str((store.reused, store.extracted)))
+        else:
+            emb_array = self.__extractFiles__(paths, batch_size, workers)
         add_info_log("--------RI : (total_images, features) = " + str(emb_array.shape))
-        add_info_log("--------RI : Training classifier ... ")
-        _model = SVC(C=C, kernel=kernel, probability=probability, 
-                     decision_function_shape=decision_function_shape)
-        _model.fit(emb_array, labels)
         _class_names = [cls.name.replace('_', ' ') for cls in dataset]
         add_info_log("--------RI : class_name = " + str(_class_names))
-        with open(self.classifier_pkl, 'wb') as classifier_file:
-            pickle.dump((_model, _class_names), classifier_file)
-        add_info_log("--------RI : Classifier file saved! -> " + str(self.classifier_pkl))
+        if self.use_gallery:
+            EmbeddingGallery.fromLabels(emb_array, labels, _class_names).save(self.gallery_file)
+            add_info_log("--------RI : Gallery file saved! -> " + str(self.gallery_file))
+        else:
+            add_info_log("--------RI : Training classifier ... ")
+            _model = SVC(C=C, kernel=kernel, probability=probability, 
+                         decision_function_shape=decision_function_shape)
+            _model.fit(emb_array, labels)
+            with open(self.classifier_pkl, 'wb') as classifier_file:
+                pickle.dump((_model, _class_names), classifier_file)
+            add_info_log("--------RI : Classifier file saved! -> " + str(self.classifier_pkl))
         classes_txt = self.classifier_pkl[:-3] + "txt"
         with open(classes_txt, 'w') as classes_file:
             classes_file.writelines([str(c) + "\n" for c in _class_names])
@@ -0,0 +1,220 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+"""
+Linear assignment shared by the trackers. A cost matrix is gated into the pairs whose cost is 
+below :obj:`cost_limit`, the pairs are split into the independent connected components of the 
+bipartite graph, and each component is solved on its own by the selected solver. The result 
+is the same as the global problem: the sum of :code:`cost_limit - cost` over the matched pairs 
+is maximized, like :code:`lap.lapjv(cost, extend_cost=True, cost_limit=cost_limit)`.
+"""
+
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from pyppbox.utils.logtools import add_error_log
+
+try:
+    import lap
+except ImportError:
+    lap = None
+
+
+SOLVERS = ["auto", "lapjv", "scipy", "greedy"]
+
+# Components up to this many cells are solved as one dense problem without the split
+__small_cells__ = 4096
+# Components up to this many cells are solved by SciPy when solver="auto"
+__scipy_cells__ = 1024
+# Components beyond this many cells are solved greedily when solver="auto"
+__max_dense_cells__ = 4194304
+
+
+def __checkSolver__(solver):
+    msg = ""
+    if solver not in SOLVERS:
+        msg = "assignment : solver='" + str(solver) + "' is not valid."
+    elif solver == "lapjv" and lap is None:
+        msg = "assignment : solver='lapjv' requires 'lapx' to be installed."
+    if msg:
+        add_error_log(msg)
+        raise ValueError(msg)
+
+
+def __solveGreedy__(rows, cols, costs):
+    # Take the cheapest pairs first, ties broken by row then column
+    matched_rows = []
+    matched_cols = []
+    used_rows = set()
+    used_cols = set()
+    for k in np.lexsort((cols, rows, costs)).tolist():
+        (r, c) = (int(rows[k]), int(cols[k]))
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+            matched_rows.append(r)
+            matched_cols.append(c)
+    return np.array(matched_rows, dtype=int), np.array(matched_cols, dtype=int)
+
+
+def __solveDense__(rows, cols, costs, cost_limit, solver):
+    unique_rows, ri = np.unique(rows, return_inverse=True)
+    unique_cols, ci = np.unique(cols, return_inverse=True)
+    cells = len(unique_rows) * len(unique_cols)
+    if solver == "auto":
+        if cells > __max_dense_cells__: solver = "greedy"
+        elif cells > __scipy_cells__ and lap is not None: solver = "lapjv"
+        else: solver = "scipy"
+    if solver == "greedy":
+        return __solveGreedy__(rows, cols, costs)
+    # A pair at cost_limit is no better than leaving both unmatched
+    cost = np.full((len(unique_rows), len(unique_cols)), cost_limit, dtype=np.float64)
+    cost[ri, ci] = costs
+    if solver == "lapjv":
+        _, x, _ = lap.lapjv(cost, extend_cost=True, cost_limit=cost_limit)
+        r = np.flatnonzero(x >= 0)
+        c = x[r]
+    else:
+        r, c = linear_sum_assignment(cost)
+    ok = cost[r, c] < cost_limit
+    return unique_rows[r[ok]], unique_cols[c[ok]]
+
+
+def sparseAssignment(n, m, rows, cols, costs, cost_limit=None, solver="auto"):
+    """Solve a linear assignment over the candidate pairs of a sparse cost matrix.
+
+    Parameters
+    ----------
+    n : int
+        The number of rows.
+    m : int
+        The number of columns.
+    rows : ndarray
+        The rows of the candidate pairs.
+    cols : ndarray
+        The columns of the candidate pairs.
+    costs : ndarray
+        The costs of the candidate pairs.
+    cost_limit : float, default=None
+        Only the pairs whose cost is below :obj:`cost_limit` can be matched. Set 
+        :code:`cost_limit=None` to match as many pairs as possible first, then by the lowest 
+        total cost.
+    solver : str, default="auto"
+        Set :code:`"lapjv"`, :code:`"scipy"`, or :code:`"greedy"` to solve all components by 
+        the same solver. Set :code:`"auto"` to pick by the size of each component: SciPy for 
+        the small ones, LAPJV of :code:`lap` for the larger ones, and greedy once a dense 
+        component would be too large to allocate.
+
+    Returns
+    -------
+    tuple(ndarray, ndarray)
+        The rows and the columns of the matched pairs, in ascending order of the rows.
+    """
+    __checkSolver__(solver)
+    rows = np.asarray(rows, dtype=int).reshape(-1)
+    cols = np.asarray(cols, dtype=int).reshape(-1)
+    costs = np.asarray(costs, dtype=np.float64).reshape(-1)
+    if cost_limit is None:
+        if len(costs) == 0: return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        # Any extra match outweighs the total cost of all the pairs
+        cost_limit = float(costs.max() + (costs - costs.min()).sum() + 1.0)
+    else:
+        gated = costs < cost_limit
+        rows, cols, costs = rows[gated], cols[gated], costs[gated]
+    if len(costs) == 0: return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    if solver == "greedy":
+        matched_rows, matched_cols = __solveGreedy__(rows, cols, costs)
+        order = np.argsort(matched_rows, kind="stable")
+        return matched_rows[order], matched_cols[order]
+
+    # A pair whose row and column have no other candidates is matched directly
+    isolated = ((np.bincount(rows, minlength=n)[rows] == 1) & 
+                (np.bincount(cols, minlength=m)[cols] == 1))
+    matched_rows = [rows[isolated]]
+    matched_cols = [cols[isolated]]
+    if not isolated.all():
+        (rows, cols, costs) = (rows[~isolated], cols[~isolated], costs[~isolated])
+        if len(np.unique(rows)) * len(np.unique(cols)) <= __small_cells__:
+            groups = [np.arange(len(rows))]
+        else:
+            graph = coo_matrix((np.ones(len(rows)), (rows, cols + n)), shape=(n + m, n + m))
+            _, labels = connected_components(graph, directed=False)
+            pair_labels = labels[rows]
+            order = np.argsort(pair_labels, kind="stable")
+            groups = np.split(order, np.flatnonzero(np.diff(pair_labels[order])) + 1)
+        for group in groups:
+            r, c = __solveDense__(rows[group], cols[group], costs[group], cost_limit, solver)
+            matched_rows.append(r)
+            matched_cols.append(c)
+    matched_rows = np.concatenate(matched_rows).astype(int)
+    matched_cols = np.concatenate(matched_cols).astype(int)
+    order = np.argsort(matched_rows, kind="stable")
+    return matched_rows[order], matched_cols[order]
+
+
+def linearAssignment(cost, cost_limit=None, solver="auto"):
+    """Solve a linear assignment over a dense cost matrix, see :func:`sparseAssignment()`. 
+    The infinite costs are never matched. A finite matrix with :code:`cost_limit=None` and 
+    :code:`solver="lapjv"` or :code:`"scipy"` is solved as a whole, the same as calling the 
+    solver directly.
+
+    Parameters
+    ----------
+    cost : ndarray
+        The cost matrix, :code:`shape=(N, M)`.
+    cost_limit : float, default=None
+        Only the pairs whose cost is below :obj:`cost_limit` can be matched. Set 
+        :code:`cost_limit=None` to match as many pairs as possible first, then by the lowest 
+        total cost.
+    solver : str, default="auto"
+        Set :code:`"auto"`, :code:`"lapjv"`, :code:`"scipy"`, or :code:`"greedy"`.
+
+    Returns
+    -------
+    tuple(ndarray, ndarray, ndarray)
+        The matched pairs :code:`[row, column]` in :code:`shape=(K, 2)`, the unmatched rows, 
+        and the unmatched columns.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    (n, m) = cost.shape
+    if cost_limit is None and solver in ["lapjv", "scipy"] and np.isfinite(cost).all():
+        # The full matching of a finite matrix is solved as a whole, like the original trackers
+        __checkSolver__(solver)
+        if solver == "lapjv":
+            _, x, _ = lap.lapjv(cost, extend_cost=True)
+            matched_rows = np.flatnonzero(x >= 0)
+            matched_cols = x[matched_rows]
+        else:
+            matched_rows, matched_cols = linear_sum_assignment(cost)
+        matched_rows = np.asarray(matched_rows, dtype=int)
+        matched_cols = np.asarray(matched_cols, dtype=int)
+    else:
+        if cost_limit is None: rows, cols = np.nonzero(np.isfinite(cost))
+        else: rows, cols = np.nonzero(cost < cost_limit)
+        matched_rows, matched_cols = sparseAssignment(n, m, rows, cols, cost[rows, cols], 
+                                                      cost_limit=cost_limit, solver=solver)
+    unmatched_rows = np.setdiff1d(np.arange(n), matched_rows)
+    unmatched_cols = np.setdiff1d(np.arange(m), matched_cols)
+    return np.stack((matched_rows, matched_cols), axis=1), unmatched_rows, unmatched_cols
@@ -0,0 +1,179 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+import numpy as np
+
+from pyppbox.utils.persontools import Person, PeopleFrame, predictPerson
+from pyppbox.utils.logtools import add_error_log
+from pyppbox.utils.statetools import nestState, getSubState, getPeopleState, getPeopleFromState
+
+from .bytetracker import BYTETracker
+
+
+class MyByteTrack(object):
+
+    """Class used as a custom layer or interface for interacting with tracker ByteTrack, see 
+    :class:`pyppbox.modules.trackers.bytetrack.bytetracker.BYTETracker`. ByteTrack only uses the 
+    bounding boxes and the detection confidences :attr:`det_conf`, so it is as cheap as SORT while 
+    it keeps the people occluded or blurred with low confidences. The detector only gives the 
+    people above its :obj:`conf`, so :class:`pyppbox.standalone.MT` lowers the :obj:`conf` of 
+    the detector to :attr:`low_thresh` while ByteTrack is the main tracker to make use of the 
+    low score association.
+    """
+
+    def __init__(self, cfg, grid_min_pairs=16384):
+        """Initialize according to the given :obj:`cfg`.
+
+        Parameters
+        ----------
+        cfg : TCFGByteTrack
+            A :class:`TCFGByteTrack` object which manages the configurations of tracker ByteTrack.
+        grid_min_pairs : int, default=16384
+            Find the overlapping track-detection pairs by a spatial grid index instead of the 
+            full IoU matrix when the number of tracks times the number of detections is at 
+            least :obj:`grid_min_pairs`, see :mod:`pyppbox.modules.trackers.gridindex`.
+        """
+        self.bt = BYTETracker(track_thresh=cfg.track_thresh, 
+                              low_thresh=cfg.low_thresh, 
+                              new_track_thresh=cfg.new_track_thresh, 
+                              match_thresh=cfg.match_thresh, 
+                              track_buffer=cfg.track_buffer, 
+                              grid_min_pairs=grid_min_pairs)
+        self.previous_list = []
+        self.current_list = []
+
+
+    def __getPreviousByCID__(self):
+        # cid -> first person of the previous list with that cid
+        previous = {}
+        for person in self.previous_list:
+            previous.setdefault(person.cid, person)
+        return previous
+
+
+    def update(self, person_list, img=None):
+        """Update the tracker and return the updated list of :class:`Person`.
+
+        Parameters
+        ----------
+        person_list : list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object or a :class:`PeopleFrame` which stores the detected 
+            people in the given :obj:`img`.
+        img : any, default=None
+            Being consistent with other trackers, will be ignored.
+
+        Returns
+        -------
+        list[Person, ...] or PeopleFrame
+            The updated list of :class:`Person` object of the confirmed tracks, or a 
+            :class:`PeopleFrame` if :obj:`person_list` is a :class:`PeopleFrame`.
+        """
+        self.previous_list = self.current_list
+        self.current_list = []
+
+        if len(person_list) == 0:
+            # Still age the tracks so the missed people become lost
+            self.bt.update(np.zeros((0, 5)))
+        elif isinstance(person_list, PeopleFrame):
+            det_indices, cids = self.bt.update(person_list.getDets())
+            person_list.cids[det_indices] = cids
+            self.current_list = person_list.select(det_indices)
+            self.current_list.copyIDsFrom(self.previous_list)
+        elif isinstance(person_list[0], Person):
+            det_indices, cids = self.bt.update(np.array([p.getDet() for p in person_list]))
+            previous = self.__getPreviousByCID__()
+            for d, cid in zip(det_indices.tolist(), cids.tolist()):
+                person = person_list[d]
+                person.cid = cid
+                pperson = previous.get(cid)
+                if pperson is not None:
+                    person.faceid = pperson.faceid
+                    person.deepid = pperson.deepid
+                    person.faceid_conf = pperson.faceid_conf
+                    person.deepid_conf = pperson.deepid_conf
+                self.current_list.append(person)
+        else:
+            msg = ("MyByteTrack : update() -> The element of input 'person_list' list " + 
+                   "has unsupported type.")
+            add_error_log(msg)
+            raise ValueError(msg)
+
+        return self.current_list
+
+
+    def predict(self, img=None):
+        """Predict the people of the last update on a frame without detection by advancing the 
+        Kalman filters of all tracks. The tracks are neither lost nor deleted by the predicted 
+        frames.
+
+        Parameters
+        ----------
+        img : any, default=None
+            Being consistent with other trackers, will be ignored.
+
+        Returns
+        -------
+        list[Person, ...] or PeopleFrame
+            The list of predicted :class:`Person` object, or a :class:`PeopleFrame` if the last 
+            update was given a :class:`PeopleFrame`, flagged with :code:`predicted=True`.
+        """
+        self.previous_list = self.current_list
+        predicted_boxes = self.bt.coast()
+        if isinstance(self.previous_list, PeopleFrame):
+            cids = self.previous_list.cids.tolist()
+            kept = [i for i, cid in enumerate(cids) if cid in predicted_boxes]
+            self.current_list = self.previous_list.select(kept).predict(
+                [predicted_boxes[cids[i]] for i in kept]
+            )
+        else:
+            self.current_list = [predictPerson(p, predicted_boxes[p.cid]) 
+                                 for p in self.previous_list if p.cid in predicted_boxes]
+        return self.current_list
+
+
+    def getState(self):
+        """Get a snapshot of the tracker, including the Kalman filters of all tracked and lost 
+        tracks and the people of the last update with their IDs, see 
+        :mod:`pyppbox.utils.statetools`.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of the tracker state.
+        """
+        state = nestState(self.bt.getState(), "bytetrack")
+        state.update(nestState(getPeopleState(self.current_list), "people"))
+        return state
+
+
+    def setState(self, state):
+        """Restore a snapshot given by :meth:`getState()`, the tracks are resumed with their 
+        IDs, so they are not confirmed again.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :meth:`getState()`.
+        """
+        self.bt.setState(getSubState(state, "bytetrack"))
+        self.current_list = getPeopleFromState(getSubState(state, "people"))
+        self.previous_list = []
@@ -0,0 +1,441 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+import numpy as np
+
+from pyppbox.modules.trackers.assignment import linearAssignment, sparseAssignment
+from pyppbox.modules.trackers.gridindex import overlapPairs, pairIoU
+
+
+def iouBatch(boxes_a, boxes_b):
+    """Compute the IoU matrix between two sets of bounding boxes.
+
+    Parameters
+    ----------
+    boxes_a : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2]`, :code:`shape=(N, 4)`.
+    boxes_b : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2]`, :code:`shape=(M, 4)`.
+
+    Returns
+    -------
+    ndarray
+        The IoU matrix, :code:`shape=(N, M)`.
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)[None, :, :]
+    w = np.maximum(0., np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]))
+    h = np.maximum(0., np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]))
+    inter = w * h
+    union = ((a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1]) + 
+             (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1]) - inter)
+    return inter / np.maximum(union, 1e-9)
+
+
+def xyxyToXYAH(boxes):
+    """Convert bounding boxes :code:`[x1, y1, x2, y2]` to :code:`[cx, cy, aspect ratio, height]`."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack((boxes[:, 0] + w / 2., boxes[:, 1] + h / 2., w / h, h), axis=1)
+
+
+def xyahToXYXY(xyah):
+    """Convert :code:`[cx, cy, aspect ratio, height]` to bounding boxes :code:`[x1, y1, x2, y2]`."""
+    w = xyah[:, 2] * xyah[:, 3]
+    h = xyah[:, 3]
+    return np.stack((xyah[:, 0] - w / 2., xyah[:, 1] - h / 2., 
+                     xyah[:, 0] + w / 2., xyah[:, 1] + h / 2.), axis=1)
+
+
+class TrackBatch(object):
+
+    """Struct-of-arrays store of all the tracks of :class:`BYTETracker`. Each track has a constant 
+    velocity Kalman filter over :code:`[cx, cy, aspect ratio, height]` and their velocities, the 
+    same model as DeepSORT and ByteTrack, whose predict and update steps run on all tracks at once.
+
+    Attributes
+    ----------
+    mean : ndarray
+        The state means, :code:`shape=(N, 8)`.
+    cov : ndarray
+        The state covariances, :code:`shape=(N, 8, 8)`.
+    ids : ndarray
+        The track IDs.
+    states : ndarray
+        The track states, :attr:`NEW`, :attr:`TRACKED`, or :attr:`LOST`.
+    scores : ndarray
+        The detection confidences of the last updates.
+    start_frames : ndarray
+        The frames of the first detections.
+    end_frames : ndarray
+        The frames of the last updates.
+    """
+
+    NEW = 0
+    TRACKED = 1
+    LOST = 2
+
+    __motion__ = np.eye(8) + np.eye(8, k=4)
+    __std_position__ = 1. / 20
+    __std_velocity__ = 1. / 160
+
+    def __init__(self):
+        """Initialize an empty batch."""
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=int)
+        self.states = np.zeros(0, dtype=int)
+        self.scores = np.zeros(0)
+        self.start_frames = np.zeros(0, dtype=int)
+        self.end_frames = np.zeros(0, dtype=int)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, boxes_xyxy, scores, ids, frame, state):
+        """Add new tracks.
+
+        Parameters
+        ----------
+        boxes_xyxy : ndarray
+            The bounding boxes :code:`[x1, y1, x2, y2]` of the new tracks.
+        scores : ndarray
+            The detection confidences of the new tracks.
+        ids : ndarray
+            The IDs of the new tracks.
+        frame : int
+            The current frame.
+        state : int
+            The state of the new tracks.
+        """
+        n = len(ids)
+        if n == 0: return
+        xyah = xyxyToXYAH(boxes_xyxy)
+        mean = np.zeros((n, 8))
+        mean[:, :4] = xyah
+        h = xyah[:, 3]
+        std = np.stack((2 * self.__std_position__ * h, 2 * self.__std_position__ * h, 
+                        np.full(n, 1e-2), 2 * self.__std_position__ * h, 
+                        10 * self.__std_velocity__ * h, 10 * self.__std_velocity__ * h, 
+                        np.full(n, 1e-5), 10 * self.__std_velocity__ * h), axis=1)
+        cov = np.zeros((n, 8, 8))
+        cov[:, np.arange(8), np.arange(8)] = np.square(std)
+        self.mean = np.concatenate((self.mean, mean))
+        self.cov = np.concatenate((self.cov, cov))
+        self.ids = np.concatenate((self.ids, np.asarray(ids, dtype=int)))
+        self.states = np.concatenate((self.states, np.full(n, state, dtype=int)))
+        self.scores = np.concatenate((self.scores, np.asarray(scores, dtype=np.float64)))
+        self.start_frames = np.concatenate((self.start_frames, np.full(n, frame, dtype=int)))
+        self.end_frames = np.concatenate((self.end_frames, np.full(n, frame, dtype=int)))
+
+    def predict(self):
+        """Advance the Kalman filters of all tracks by one frame. The height velocity of the 
+        lost tracks is reset so their boxes don't keep growing or shrinking."""
+        if len(self) == 0: return
+        self.mean[self.states == self.LOST, 7] = 0.
+        h = self.mean[:, 3]
+        n = len(h)
+        std = np.stack((self.__std_position__ * h, self.__std_position__ * h, 
+                        np.full(n, 1e-2), self.__std_position__ * h, 
+                        self.__std_velocity__ * h, self.__std_velocity__ * h, 
+                        np.full(n, 1e-5), self.__std_velocity__ * h), axis=1)
+        self.mean = self.mean @ self.__motion__.T
+        self.cov = self.__motion__ @ self.cov @ self.__motion__.T
+        self.cov[:, np.arange(8), np.arange(8)] += np.square(std)
+
+    def update(self, indices, boxes_xyxy, scores, frame):
+        """Correct the Kalman filters of the tracks at :obj:`indices` with their detections and 
+        mark them as tracked.
+
+        Parameters
+        ----------
+        indices : ndarray
+            The indices of the tracks.
+        boxes_xyxy : ndarray
+            The bounding boxes :code:`[x1, y1, x2, y2]` of the detections, one per track.
+        scores : ndarray
+            The detection confidences, one per track.
+        frame : int
+            The current frame.
+        """
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0: return
+        mean = self.mean[indices]
+        cov = self.cov[indices]
+        h = mean[:, 3]
+        std = np.stack((self.__std_position__ * h, self.__std_position__ * h, 
+                        np.full(len(h), 1e-1), self.__std_position__ * h), axis=1)
+        S = cov[:, :4, :4].copy()
+        S[:, np.arange(4), np.arange(4)] += np.square(std)
+        # K = P H^T S^-1, solved as S K^T = H P since S is symmetric
+        K = np.linalg.solve(S, cov[:, :4, :]).transpose(0, 2, 1)
+        innovation = xyxyToXYAH(boxes_xyxy) - mean[:, :4]
+        self.mean[indices] = mean + (K @ innovation[:, :, None])[:, :, 0]
+        self.cov[indices] = cov - K @ S @ K.transpose(0, 2, 1)
+        self.states[indices] = self.TRACKED
+        self.scores[indices] = scores
+        self.end_frames[indices] = frame
+
+    def getBoxes(self, indices=slice(None)):
+        """Return the current bounding boxes :code:`[x1, y1, x2, y2]` of the tracks."""
+        return xyahToXYXY(self.mean[indices])
+
+    def compact(self, keep):
+        """Keep only the tracks where the boolean mask :obj:`keep` is :code:`True`."""
+        self.mean = self.mean[keep]
+        self.cov = self.cov[keep]
+        self.ids = self.ids[keep]
+        self.states = self.states[keep]
+        self.scores = self.scores[keep]
+        self.start_frames = self.start_frames[keep]
+        self.end_frames = self.end_frames[keep]
+
+
+class BYTETracker(object):
+
+    """A ByteTrack style multi-object tracker. Every detection is associated, not only the 
+    confident ones: the tracks are first matched to the high score detections by their IoU 
+    weighted by the detection scores, the tracks left are then matched to the low score 
+    detections, usually occluded or blurred people, by their IoU. A high score detection left 
+    starts a new track, which is confirmed once matched again in the next frame. A track not 
+    matched is kept lost for :attr:`track_buffer` frames so it can be recovered with its ID.
+
+    Attributes
+    ----------
+    track_thresh : float
+        Minimum score of a high score detection.
+    low_thresh : float
+        Minimum score of a low score detection.
+    new_track_thresh : float
+        Minimum score of a detection to start a new track.
+    match_thresh : float
+        Maximum cost of the association with the high score detections.
+    track_buffer : int
+        Number of frames a lost track is kept.
+    solver : str
+        The solver of :mod:`pyppbox.modules.trackers.assignment`.
+    grid_min_pairs : int
+        Minimum number of track-detection pairs to find the overlapping pairs by a grid index.
+    frame : int
+        Number of updated frames.
+    """
+
+    def __init__(self, 
+                 track_thresh=0.5, 
+                 low_thresh=0.1, 
+                 new_track_thresh=0.6, 
+                 match_thresh=0.8, 
+                 track_buffer=30, 
+                 solver="auto", 
+                 grid_min_pairs=16384):
+        """Initialize the tracker.
+
+        Parameters
+        ----------
+        track_thresh : float, default=0.5
+            Minimum score of a high score detection.
+        low_thresh : float, default=0.1
+            Minimum score of a low score detection.
+        new_track_thresh : float, default=0.6
+            Minimum score of a detection to start a new track.
+        match_thresh : float, default=0.8
+            Maximum cost, :code:`1 - score * IoU`, of the association with the high score 
+            detections.
+        track_buffer : int, default=30
+            Number of frames a lost track is kept.
+        solver : str, default="auto"
+            The solver of :mod:`pyppbox.modules.trackers.assignment`, :code:`"auto"`, 
+            :code:`"lapjv"`, :code:`"scipy"`, or :code:`"greedy"`.
+        grid_min_pairs : int, default=16384
+            Find the overlapping pairs by :func:`pyppbox.modules.trackers.gridindex.overlapPairs()` 
+            instead of the full IoU matrix when the number of tracks times the number of 
+            detections is at least :obj:`grid_min_pairs`.
+        """
+        self.track_thresh = track_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_thresh = match_thresh
+        self.track_buffer = track_buffer
+        self.solver = solver
+        self.grid_min_pairs = grid_min_pairs
+        self.frame = 0
+        self.next_id = 0
+        self.tracks = TrackBatch()
+
+    def __match__(self, tracks, dets, boxes, scores, thresh, fuse_score):
+        # Returns (matched track indices, matched det indices, unmatched tracks, unmatched dets)
+        if len(tracks) == 0 or len(dets) == 0:
+            empty = np.zeros(0, dtype=int)
+            return empty, empty, tracks, dets
+        if len(tracks) * len(dets) >= self.grid_min_pairs:
+            # Only the overlapping pairs can be below thresh, if thresh <= 1
+            track_boxes = self.tracks.getBoxes(tracks)
+            rows, cols = overlapPairs(track_boxes, boxes[dets])
+            similarity = pairIoU(track_boxes, boxes[dets], rows, cols)
+            if fuse_score: similarity *= scores[dets][cols]
+            rows, cols = sparseAssignment(len(tracks), len(dets), rows, cols, 1. - similarity, 
+                                          cost_limit=thresh, solver=self.solver)
+            return (tracks[rows], dets[cols], 
+                    np.delete(tracks, rows), np.delete(dets, cols))
+        similarity = iouBatch(self.tracks.getBoxes(tracks), boxes[dets])
+        if fuse_score: similarity *= scores[dets][None, :]
+        matches, unmatched_rows, unmatched_cols = linearAssignment(1. - similarity, cost_limit=thresh, 
+                                                                   solver=self.solver)
+        return (tracks[matches[:, 0]], dets[matches[:, 1]], 
+                tracks[unmatched_rows], dets[unmatched_cols])
+
+    def __removeDuplicates__(self):
+        # A tracked and a lost track covering the same person, drop the younger one
+        tracked = np.flatnonzero(self.tracks.states == TrackBatch.TRACKED)
+        lost = np.flatnonzero(self.tracks.states == TrackBatch.LOST)
+        if len(tracked) == 0 or len(lost) == 0: return np.zeros(0, dtype=int)
+        tracked_boxes = self.tracks.getBoxes(tracked)
+        lost_boxes = self.tracks.getBoxes(lost)
+        if len(tracked) * len(lost) >= self.grid_min_pairs:
+            rows, cols = overlapPairs(tracked_boxes, lost_boxes)
+            pairs = np.stack((rows, cols), axis=1)[pairIoU(tracked_boxes, lost_boxes, rows, cols) > 0.85]
+        else:
+            pairs = np.argwhere(iouBatch(tracked_boxes, lost_boxes) > 0.85)
+        if len(pairs) == 0: return np.zeros(0, dtype=int)
+        p, q = tracked[pairs[:, 0]], lost[pairs[:, 1]]
+        age_p = self.tracks.end_frames[p] - self.tracks.start_frames[p]
+        age_q = self.tracks.end_frames[q] - self.tracks.start_frames[q]
+        return np.unique(np.where(age_p > age_q, q, p))
+
+    def update(self, dets):
+        """Update the tracker with the detections of a frame.
+
+        Parameters
+        ----------
+        dets : ndarray
+            The detections :code:`[x1, y1, x2, y2, score]`, :code:`shape=(N, 5)`.
+
+        Returns
+        -------
+        tuple(ndarray, ndarray)
+            The indices of the detections of the confirmed tracks in ascending order, and the 
+            IDs of these tracks.
+        """
+        self.frame += 1
+        dets = np.asarray(dets, dtype=np.float64).reshape(-1, 5)
+        boxes, scores = dets[:, :4], dets[:, 4]
+        high = np.flatnonzero(scores >= self.track_thresh)
+        low = np.flatnonzero((scores > self.low_thresh) & (scores < self.track_thresh))
+        T = self.tracks
+        T.predict()
+        track_of_det = np.full(len(dets), -1, dtype=int)
+
+        # First association, confirmed and lost tracks with the high score detections
+        pool = np.flatnonzero(T.states != TrackBatch.NEW)
+        t, d, pool_left, high_left = self.__match__(pool, high, boxes, scores, 
+                                                    self.match_thresh, True)
+        T.update(t, boxes[d], scores[d], self.frame)
+        track_of_det[d] = t
+
+        # Second association, tracks still tracked with the low score detections
+        tracked_left = pool_left[T.states[pool_left] == TrackBatch.TRACKED]
+        t, d, tracked_left, _ = self.__match__(tracked_left, low, boxes, scores, 0.5, False)
+        T.update(t, boxes[d], scores[d], self.frame)
+        track_of_det[d] = t
+        T.states[tracked_left] = TrackBatch.LOST
+
+        # New tracks of the last frame with the high score detections left
+        unconfirmed = np.flatnonzero(T.states == TrackBatch.NEW)
+        t, d, unconfirmed_left, high_left = self.__match__(unconfirmed, high_left, boxes, scores, 
+                                                           0.7, True)
+        T.update(t, boxes[d], scores[d], self.frame)
+        track_of_det[d] = t
+
+        keep = np.ones(len(T), dtype=bool)
+        keep[unconfirmed_left] = False
+        keep[(T.states == TrackBatch.LOST) & (self.frame - T.end_frames > self.track_buffer)] = False
+        keep[self.__removeDuplicates__()] = False
+
+        # Start new tracks, confirmed at once in the first frame
+        new = high_left[scores[high_left] >= self.new_track_thresh]
+        start = len(T)
+        T.add(boxes[new], scores[new], np.arange(self.next_id, self.next_id + len(new)), self.frame, 
+              TrackBatch.TRACKED if self.frame == 1 else TrackBatch.NEW)
+        self.next_id += len(new)
+        track_of_det[new] = np.arange(start, start + len(new))
+        keep = np.concatenate((keep, np.ones(len(new), dtype=bool)))
+
+        det_indices = np.flatnonzero(track_of_det >= 0)
+        track_indices = track_of_det[det_indices]
+        confirmed = (T.states[track_indices] == TrackBatch.TRACKED) & keep[track_indices]
+        det_indices = det_indices[confirmed]
+        ids = T.ids[track_indices[confirmed]]
+        T.compact(keep)
+        return det_indices, ids
+
+    def coast(self):
+        """Advance all tracks on a frame without detection. The frame count and the track states 
+        are not changed.
+
+        Returns
+        -------
+        dict
+            A dictionary of :code:`{track ID: predicted [x1, y1, x2, y2]}` of the tracked tracks.
+        """
+        self.tracks.predict()
+        tracked = self.tracks.states == TrackBatch.TRACKED
+        return dict(zip(self.tracks.ids[tracked].tolist(), self.tracks.getBoxes(tracked)))
+
+    def getState(self):
+        """Get a copy of the tracker state.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The arrays of all tracks, the frame count, and the next track ID.
+        """
+        T = self.tracks
+        return {'mean': T.mean.copy(), 
+                'cov': T.cov.copy(), 
+                'ids': T.ids.copy(), 
+                'states': T.states.copy(), 
+                'scores': T.scores.copy(), 
+                'start_frames': T.start_frames.copy(), 
+                'end_frames': T.end_frames.copy(), 
+                'frame': np.array(self.frame), 
+                'next_id': np.array(self.next_id)}
+
+    def setState(self, state):
+        """Restore a tracker state given by :meth:`getState()`.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A state given by :meth:`getState()`.
+        """
+        T = TrackBatch()
+        T.mean = np.array(state['mean'], dtype=np.float64).reshape(-1, 8)
+        T.cov = np.array(state['cov'], dtype=np.float64).reshape(-1, 8, 8)
+        T.ids = np.array(state['ids'], dtype=int)
+        T.states = np.array(state['states'], dtype=int)
+        T.scores = np.array(state['scores'], dtype=np.float64)
+        T.start_frames = np.array(state['start_frames'], dtype=int)
+        T.end_frames = np.array(state['end_frames'], dtype=int)
+        self.tracks = T
+        self.frame = int(state['frame'])
+        self.next_id = int(state['next_id'])
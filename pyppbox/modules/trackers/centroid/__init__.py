@@ -19,100 +19,270 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 
-from math import hypot
-from pyppbox.utils.persontools import Person
+import numpy as np
+
+from pyppbox.modules.trackers.assignment import sparseAssignment
+from pyppbox.utils.persontools import Person, PeopleFrame, predictPerson
 from pyppbox.utils.logtools import add_error_log
+from pyppbox.utils.statetools import nestState, getSubState, getPeopleState, getPeopleFromState
 
 
 class MyCentroid(object):
 
-    """Class reprensented a Centroid tracker.
+    """Class reprensented a Centroid tracker. The current and previous people are matched by 
+    the distances between their :attr:`repspoint`, either by an optimal assignment which 
+    minimizes the total distance of the most matches, or greedily from the shortest distance. 
+    Two people farther than :attr:`max_spread` are never matched. In crowded scenes, the 
+    candidate pairs are found with a spatial grid of :attr:`max_spread` sized cells instead 
+    of the full distance matrix.
     """
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, assignment="optimal", grid_min_pairs=4096):
         """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
 
         Parameters
         ----------
         cfg : TCFGCentroid
             A :class:`TCFGCentroid` object which manages the configurations of tracker Centroid.
+        assignment : str, default="optimal"
+            Set :code:`"optimal"` for a global assignment or :code:`"greedy"` for a greedy 
+            assignment by distance.
+        grid_min_pairs : int, default=4096
+            Use the spatial grid index when the number of current people times the number of 
+            previous people is at least :obj:`grid_min_pairs`.
         """
+        if assignment not in ["optimal", "greedy"]:
+            msg = "MyCentroid : __init__() -> assignment='" + str(assignment) + "' is not valid."
+            add_error_log(msg)
+            raise ValueError(msg)
         self.max_spread = cfg.max_spread
+        self.assignment = assignment
+        self.grid_min_pairs = grid_min_pairs
+        self.__max_grid_cells__ = 262144
+        self.next_cid = 0
         self.previous_list = []
         self.current_list = []
+        self.last_points = {}
+        self.last_boxes = {}
+        self.velocities = {}
+        self.predicted_frames = 0
 
     def __generateID__(self):
-        self.used_cids = list(set(self.used_cids))
-        if len(self.used_cids) == 0: aID = 0
-        else: aID = max(self.used_cids) + 1
-        self.used_cids.append(aID)
+        aID = self.next_cid
+        self.next_cid += 1
         return aID
-    
-    def __findPID__(self, point):
-        pindex = -1
-        min_dist = 8192
-        i = 0
-        for p in self.previous_list:
-            dist = hypot(p.repspoint[0] - point[0], 
-                         p.repspoint[1] - point[1])
-            if dist < min_dist:
-                min_dist = dist
-                pindex = i
-            i += 1
-        if min_dist > self.max_spread: pindex = -1
-        return pindex
+
+    def __getArrays__(self, people):
+        if isinstance(people, PeopleFrame):
+            return people.cids.tolist(), people.repspoints.astype(np.float64), people.boxes_xyxy
+        cids = [p.cid for p in people]
+        points = np.array([p.repspoint for p in people], dtype=np.float64).reshape(-1, 2)
+        boxes = np.array([p.box_xyxy for p in people]).reshape(-1, 4)
+        return cids, points, boxes
+
+    def __getDensePairs__(self, points, prev_points):
+        dists = np.hypot(points[:, None, 0] - prev_points[None, :, 0], 
+                         points[:, None, 1] - prev_points[None, :, 1])
+        rows, cols = np.nonzero(dists <= self.max_spread)
+        return rows, cols, dists[rows, cols]
+
+    def __getGridPairs__(self, points, prev_points):
+        # Every pair within max_spread is in the 3x3 neighbor cells of max_spread sized cells
+        cell = max(float(self.max_spread), 1.0)
+        cells = np.floor(points / cell).astype(np.int64)
+        prev_cells = np.floor(prev_points / cell).astype(np.int64)
+        origin = np.minimum(cells.min(axis=0), prev_cells.min(axis=0)) - 1
+        extent = np.maximum(cells.max(axis=0), prev_cells.max(axis=0)) - origin + 2
+        prev_keys = (prev_cells[:, 0] - origin[0]) * extent[1] + (prev_cells[:, 1] - origin[1])
+        order = np.argsort(prev_keys, kind="stable")
+        offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        keys = (((cells[None, :, 0] + offsets[:, None, 0] - origin[0]) * extent[1] + 
+                 (cells[None, :, 1] + offsets[:, None, 1] - origin[1]))).reshape(-1)
+        if extent[0] * extent[1] <= self.__max_grid_cells__:
+            # Bucket table of the cells
+            starts = np.zeros(extent[0] * extent[1] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(prev_keys, minlength=extent[0] * extent[1]), out=starts[1:])
+            lo = starts[keys]
+            counts = starts[keys + 1] - lo
+        else:
+            sorted_keys = prev_keys[order]
+            lo = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - lo
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.repeat(np.tile(np.arange(len(points)), len(offsets)), counts)
+        cols = order[np.repeat(lo, counts) + within]
+        dists = np.hypot(points[rows, 0] - prev_points[cols, 0], 
+                         points[rows, 1] - prev_points[cols, 1])
+        keep = dists <= self.max_spread
+        return rows[keep], cols[keep], dists[keep]
+
+    def __match__(self, points, prev_points):
+        (n, m) = (len(points), len(prev_points))
+        if n == 0 or m == 0: return []
+        if n * m < self.grid_min_pairs:
+            rows, cols, dists = self.__getDensePairs__(points, prev_points)
+        else:
+            rows, cols, dists = self.__getGridPairs__(points, prev_points)
+        if len(rows) == 0: return []
+        # Prefer more matches over shorter distances
+        matched_rows, matched_cols = sparseAssignment(
+            n, m, rows, cols, dists, solver="greedy" if self.assignment == "greedy" else "auto"
+        )
+        return list(zip(matched_rows.tolist(), matched_cols.tolist()))
 
     def update(self, person_list, img=None):
         """Update the tracker and return the updated list of :class:`Person`.
 
         Parameters
         ----------
-        person_list : list[Person, ...]
-            A list of :class:`Person` object which stores the detected people in the given :obj:`img`.
+        person_list : list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object or a :class:`PeopleFrame` which stores the detected 
+            people in the given :obj:`img`.
         img : any, default=None
             Being consistent with other trackers, will be ignored.
 
         Returns
         -------
-        list[Person, ...]
-            The updated list of :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            The updated list of :class:`Person` object, or a :class:`PeopleFrame` if 
+            :obj:`person_list` is a :class:`PeopleFrame`.
         """
         self.previous_list = self.current_list
         self.current_list = []
-        self.used_cids = []
 
         if len(person_list) > 0:
-            if isinstance(person_list[0], Person):
+            is_frame = isinstance(person_list, PeopleFrame)
+            if is_frame or isinstance(person_list[0], Person):
                 self.current_list = person_list
-                hang_indexes_in_clist = []
-                len_clist = len(self.current_list)
-                if len_clist > 0:
-                    for i in range(0, len_clist):
-                        pindex = self.__findPID__(self.current_list[i].repspoint)
-                        if pindex >= 0:
-                            prev_cid = self.previous_list[pindex].cid
-                            if prev_cid in self.used_cids:
-                                hang_indexes_in_clist.append(i)
-                            else:
-                                self.current_list[i].updateIDs(
-                                    prev_cid, 
-                                    self.previous_list[pindex].faceid, 
-                                    self.previous_list[pindex].deepid,
-                                    self.previous_list[pindex].faceid_conf,
-                                    self.previous_list[pindex].deepid_conf
-                                )
-                                self.used_cids.append(prev_cid)
-                                # self.previous_list.pop(pindex)
-                        else:
-                            hang_indexes_in_clist.append(i)
-                    len_hlist = len(hang_indexes_in_clist)
-                    if len_hlist > 0:
-                        for index in hang_indexes_in_clist:
-                            self.current_list[index].cid = self.__generateID__()
+                _, points, _ = self.__getArrays__(self.current_list)
+                prev_cids, prev_points, _ = self.__getArrays__(self.previous_list)
+                matches = sorted(self.__match__(points, prev_points))
+                if is_frame:
+                    rows = np.array([i for (i, _) in matches], dtype=int)
+                    matched = np.zeros(len(self.current_list), dtype=bool)
+                    matched[rows] = True
+                    self.current_list.cids[rows] = [prev_cids[j] for (_, j) in matches]
+                    self.current_list.copyIDsFrom(self.previous_list, indices=rows)
+                    hang = np.flatnonzero(~matched)
+                    self.current_list.cids[hang] = np.arange(self.next_cid, self.next_cid + len(hang))
+                    self.next_cid += len(hang)
+                else:
+                    matched = [False] * len(self.current_list)
+                    for (i, j) in matches:
+                        matched[i] = True
+                        self.current_list[i].updateIDs(
+                            prev_cids[j], 
+                            self.previous_list[j].faceid, 
+                            self.previous_list[j].deepid,
+                            self.previous_list[j].faceid_conf,
+                            self.previous_list[j].deepid_conf
+                        )
+                    for i in range(0, len(self.current_list)):
+                        if not matched[i]:
+                            self.current_list[i].cid = self.__generateID__()
+                self.__updateVelocities__(set([prev_cids[j] for (_, j) in matches]))
             else:
                 msg = ("MyCentroid : update() -> The element of input 'person_list' " + 
                        "list has unsupported type.")
                 add_error_log(msg)
                 raise ValueError(msg)
+        else:
+            self.__updateVelocities__(set())
+
+        return self.current_list
 
+    def __updateVelocities__(self, matched_cids):
+        # Constant velocity per cid over the frames since the last update
+        frames = self.predicted_frames + 1
+        last_points = {}
+        last_boxes = {}
+        velocities = {}
+        cids, points, boxes = self.__getArrays__(self.current_list)
+        for cid, (x, y), box in zip(cids, points.tolist(), boxes.tolist()):
+            if cid in matched_cids and cid in self.last_points:
+                (lx, ly) = self.last_points[cid]
+                velocities[cid] = ((x - lx) / frames, (y - ly) / frames)
+            last_points[cid] = (x, y)
+            last_boxes[cid] = box
+        self.last_points = last_points
+        self.last_boxes = last_boxes
+        self.velocities = velocities
+        self.predicted_frames = 0
+
+    def predict(self, img=None):
+        """Predict the people of the last update on a frame without detection by moving each 
+        of them with the constant velocity of its :attr:`cid` measured between the last two 
+        updates. A person whose velocity is not known yet stays still.
+
+        Parameters
+        ----------
+        img : any, default=None
+            Being consistent with other trackers, will be ignored.
+
+        Returns
+        -------
+        list[Person, ...] or PeopleFrame
+            The list of predicted :class:`Person` object, or a :class:`PeopleFrame` if the last 
+            update was given a :class:`PeopleFrame`, flagged with :code:`predicted=True`.
+        """
+        self.previous_list = self.current_list
+        self.current_list = []
+        self.predicted_frames += 1
+        predicted_boxes = []
+        for p in self.previous_list:
+            (vx, vy) = self.velocities.get(p.cid, (0.0, 0.0))
+            # Extrapolate from the last update so that sub-pixel velocities are not rounded away
+            (x1, y1, x2, y2) = self.last_boxes.get(p.cid, p.box_xyxy)
+            dx, dy = vx * self.predicted_frames, vy * self.predicted_frames
+            predicted_boxes.append([x1 + dx, y1 + dy, x2 + dx, y2 + dy])
+        if isinstance(self.previous_list, PeopleFrame):
+            self.current_list = self.previous_list.predict(predicted_boxes)
+        else:
+            self.current_list = [predictPerson(p, box) 
+                                 for p, box in zip(self.previous_list, predicted_boxes)]
         return self.current_list
+
+    def getState(self):
+        """Get a snapshot of the tracker, including the people of the last update with their 
+        IDs and the velocities of their :attr:`cid`, see :mod:`pyppbox.utils.statetools`.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of the tracker state.
+        """
+        last_cids = list(self.last_points.keys())
+        velocity_cids = list(self.velocities.keys())
+        state = nestState(getPeopleState(self.current_list), "people")
+        state['next_cid'] = np.array(self.next_cid)
+        state['predicted_frames'] = np.array(self.predicted_frames)
+        state['last_cids'] = np.array(last_cids, dtype=int)
+        state['last_points'] = np.array([self.last_points[c] for c in last_cids], 
+                                        dtype=np.float64).reshape(-1, 2)
+        state['last_boxes'] = np.array([self.last_boxes[c] for c in last_cids], 
+                                       dtype=np.float64).reshape(-1, 4)
+        state['velocity_cids'] = np.array(velocity_cids, dtype=int)
+        state['velocities'] = np.array([self.velocities[c] for c in velocity_cids], 
+                                       dtype=np.float64).reshape(-1, 2)
+        return state
+
+    def setState(self, state):
+        """Restore a snapshot given by :meth:`getState()`.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :meth:`getState()`.
+        """
+        self.current_list = getPeopleFromState(getSubState(state, "people"))
+        self.previous_list = []
+        self.next_cid = int(state['next_cid'])
+        self.predicted_frames = int(state['predicted_frames'])
+        last_cids = state['last_cids'].tolist()
+        self.last_points = dict(zip(last_cids, [tuple(p) for p in state['last_points'].tolist()]))
+        self.last_boxes = dict(zip(last_cids, state['last_boxes'].tolist()))
+        self.velocities = dict(zip(state['velocity_cids'].tolist(), 
+                                   [tuple(v) for v in state['velocities'].tolist()]))
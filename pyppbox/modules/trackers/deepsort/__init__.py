@@ -21,8 +21,10 @@
 
 import numpy as np
 
-from pyppbox.utils.persontools import Person
+from pyppbox.utils.persontools import Person, PeopleFrame, predictPerson
+from pyppbox.utils.croptools import FrameCropper
 from pyppbox.utils.logtools import add_error_log, ignore_this_logger
+from pyppbox.utils.statetools import nestState, getSubState, getPeopleState, getPeopleFromState
 
 ignore_this_logger("tensorflow")
 ignore_this_logger("preprocessing")
@@ -33,9 +35,9 @@ ignore_this_logger("tracker")
 
 from .origin import preprocessing
 from .origin import nn_matching
-from .origin import generate_detections as gdet
 from .origin.detection import Detection as DSDetection
 from .origin.tracker import Tracker as DSTracker
+from .encoders import DefaultEncoder, TorchreidEncoder
 
 
 class MyDeepSORT(object):
@@ -43,84 +45,130 @@ class MyDeepSORT(object):
     """Class used as a custom layer or interface for interacting with DeepSORT tracker.
     """
 
-    def __init__(self, cfg):
-        """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
+    def __init__(self, cfg, encoder=None, grid_min_pairs=16384):
+        """Initialize according to the given :obj:`cfg` and :obj:`encoder`.
 
         Parameters
         ----------
         cfg : TCFGDeepSORT
             A :class:`TCFGDeepSORT` object which manages the configurations of tracker DeepSORT.
+        encoder : DefaultEncoder or TorchreidEncoder, default=None
+            An appearance encoder which has :code:`encode(img, boxes_xywh, boxes_xyxy, cropper)`. 
+            Set :code:`encoder=None` to create a :class:`DefaultEncoder` of :obj:`model_file`, 
+            unless :obj:`cfg.encoder` is :code:`'Torchreid'`; in that case, a 
+            :class:`TorchreidEncoder` must be set by :meth:`setEncoder()` before :meth:`update()`.
+        grid_min_pairs : int, default=16384
+            Find the overlapping track-detection pairs of the IoU association by a spatial grid 
+            index instead of the full IoU matrix when the number of tracks times the number of 
+            detections is at least :obj:`grid_min_pairs`, see 
+            :mod:`pyppbox.modules.trackers.gridindex`.
         """
         self.previous_list = []
         self.current_list = []
         self.current_frame = 0
         self.nms_max_overlap = cfg.nms_max_overlap
-        self.encoder = gdet.create_box_encoder(cfg.model_file, batch_size=16)
+        self.encoder = encoder
+        if self.encoder is None and not self.usesTorchreid(cfg):
+            self.encoder = DefaultEncoder(cfg.model_file)
+        self.cropper = FrameCropper()
         self.metric = nn_matching.NearestNeighborDistanceMetric("cosine", cfg.max_cosine_distance, 
                                                                 cfg.nn_budget)
-        self.tracker = DSTracker(self.metric)
-
-
-    def __getCurrentIndexByBoxXYXY__(self, box, max_spread=128):
-        index = -1
-        box_list = box.tolist()
-        min_box_spread = 8192
-        i = 0
-        for p in self.current_list:
-            pbbox_list = p.box_xyxy.tolist()
-            max_ss = max([abs(box_list[j] - pbbox_list[j]) for j in range(0, 4)])
-            if max_ss < min_box_spread:
-                min_box_spread = max_ss
-                index = i
-            i += 1
-        if min_box_spread > max_spread: index = -1
-        return index
-
-
-    def __getIndexFromPreviousList__(self, cid):
-        pindex = -1
-        for i in range(0, len(self.previous_list)):
-            if cid == self.previous_list[i].cid:
-                pindex = i
-                break
-        return pindex
-
-
-    def update(self, person_list, img=None, max_spread=128):
+        self.tracker = DSTracker(self.metric, grid_min_pairs=grid_min_pairs)
+
+
+    @staticmethod
+    def usesTorchreid(cfg):
+        """Check whether the given :obj:`cfg` configures the :class:`TorchreidEncoder`.
+
+        Parameters
+        ----------
+        cfg : TCFGDeepSORT
+            A :class:`TCFGDeepSORT` object.
+
+        Returns
+        -------
+        bool
+            :code:`True` if :obj:`cfg.encoder` is :code:`'Torchreid'`.
+        """
+        return str(getattr(cfg, "encoder", "")).lower() == cfg.unified_strings.torchreid.lower()
+
+
+    def setEncoder(self, encoder):
+        """Set the appearance encoder.
+
+        Parameters
+        ----------
+        encoder : DefaultEncoder or TorchreidEncoder
+            An appearance encoder which has :code:`encode(img, boxes_xywh, boxes_xyxy, cropper)`.
+        """
+        self.encoder = encoder
+
+
+    def __getPreviousByCID__(self):
+        # cid -> first person of the previous list with that cid
+        previous = {}
+        for person in self.previous_list:
+            previous.setdefault(person.cid, person)
+        return previous
+
+
+    def __encode__(self, img, boxes_xywh, boxes_xyxy, cropper):
+        if self.encoder is None:
+            msg = "MyDeepSORT : update() -> The encoder is not set, call setEncoder() first."
+            add_error_log(msg)
+            raise ValueError(msg)
+        return self.encoder.encode(img, boxes_xywh, boxes_xyxy, cropper)
+
+
+    def update(self, person_list, img=None, max_spread=128, cropper=None):
         """Update the tracker and return the updated list of :class:`Person`.
 
         Parameters
         ----------
-        person_list : list[Person, ...]
-            A list of :class:`Person` object which stores the detected people in the given :obj:`img`.
+        person_list : list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object or a :class:`PeopleFrame` which stores the detected 
+            people in the given :obj:`img`.
         img : any, default=None
             A cv :obj:`Mat` image.
-        max_spread : int, default=5
-            Max spread or max margin used to decide whether 2 bounding boxes are the same by comparing 
-            the differences between the elements in the bounding box given by the embedded SORT and the 
-            coressponding elements of a person's bounding box in the :obj:`person_list`.
+        max_spread : int, default=128
+            Kept for compatibility, will be ignored. The tracks are mapped back to the people by 
+            the index of the detection each track is associated with.
+        cropper : FrameCropper, default=None
+            A :class:`FrameCropper` object used to crop the encoder patches from the :obj:`img`. 
+            Set :code:`cropper=None` to use the internal one.
 
         Returns
         -------
-        list[Person, ...]
-            The updated list of :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            The updated list of :class:`Person` object, or a :class:`PeopleFrame` if 
+            :obj:`person_list` is a :class:`PeopleFrame`.
         """
         self.previous_list = self.current_list
         self.current_list = []
 
         if len(person_list) > 0:
-            if isinstance(person_list[0], Person):
+            is_frame = isinstance(person_list, PeopleFrame)
+            if is_frame or isinstance(person_list[0], Person):
                 self.current_list = person_list
-                dboxes = []
-                dconfidences = []
-                dclasses = []
+                if is_frame:
+                    dboxes = person_list.boxes_xywh
+                    dboxes_xyxy = person_list.boxes_xyxy
+                    dconfidences = person_list.det_confs.tolist()
+                    dclasses = ['person'] * len(person_list)
+                else:
+                    dboxes = []
+                    dboxes_xyxy = []
+                    dconfidences = []
+                    dclasses = []
 
-                for i in range(0, len(person_list)):
-                    dboxes.append(person_list[i].box_xywh)
-                    dconfidences.append(person_list[i].det_conf)
-                    dclasses.append('person')
+                    for i in range(0, len(person_list)):
+                        dboxes.append(person_list[i].box_xywh)
+                        dboxes_xyxy.append(person_list[i].box_xyxy)
+                        dconfidences.append(person_list[i].det_conf)
+                        dclasses.append('person')
 
-                dfeatures = self.encoder(img, dboxes)
+                dfeatures = self.__encode__(img, dboxes, dboxes_xyxy, 
+                                            cropper if cropper is not None else self.cropper)
                 detections = [DSDetection(dbox, dconfidence, dclass, dfeature) 
                               for dbox, dconfidence, dclass, dfeature in 
                               zip(dboxes, dconfidences, dclasses, dfeatures)]
@@ -133,20 +181,29 @@ class MyDeepSORT(object):
                 self.tracker.predict()
                 self.tracker.update(detections)
 
+                # Map each confirmed track back to the person of its detection
+                matched = []
+                cids = []
                 for track in self.tracker.tracks:
-                    if not track.is_confirmed() or track.time_since_update > 1:
+                    if not track.is_confirmed() or track.detection_index is None:
                         continue
-                    box_xyxy = track.to_tlbr()
-                    new_cid = int(track.track_id)
-                    cindex = self.__getCurrentIndexByBoxXYXY__(box_xyxy, max_spread=max_spread)
-                    if cindex >= 0:
-                        self.current_list[cindex].cid = new_cid
-                        pindex = self.__getIndexFromPreviousList__(new_cid)
-                        if pindex >= 0 and self.current_frame > 3:
-                            self.current_list[cindex].faceid = self.previous_list[pindex].faceid
-                            self.current_list[cindex].deepid = self.previous_list[pindex].deepid
-                            self.current_list[cindex].faceid_conf = self.previous_list[pindex].faceid_conf
-                            self.current_list[cindex].deepid_conf = self.previous_list[pindex].deepid_conf
+                    matched.append(indices[track.detection_index])
+                    cids.append(int(track.track_id))
+                if is_frame:
+                    self.current_list.cids[matched] = cids
+                    if self.current_frame > 3:
+                        self.current_list.copyIDsFrom(self.previous_list, indices=matched)
+                else:
+                    previous = self.__getPreviousByCID__() if self.current_frame > 3 else {}
+                    for cindex, new_cid in zip(matched, cids):
+                        person = self.current_list[cindex]
+                        person.cid = new_cid
+                        pperson = previous.get(new_cid)
+                        if pperson is not None:
+                            person.faceid = pperson.faceid
+                            person.deepid = pperson.deepid
+                            person.faceid_conf = pperson.faceid_conf
+                            person.deepid_conf = pperson.deepid_conf
             else:
                 msg = ("MyDeepSORT : update() -> The element of input 'person_list' " + 
                        "list has unsupported type.")
@@ -155,3 +212,66 @@ class MyDeepSORT(object):
 
         self.current_frame += 1
         return self.current_list
+
+
+    def predict(self, img=None):
+        """Predict the people of the last update on a frame without detection by advancing the 
+        Kalman filters of all tracks. The track ages and states are not changed, so the tracks 
+        are neither confirmed nor deleted by the predicted frames.
+
+        Parameters
+        ----------
+        img : any, default=None
+            Being consistent with other trackers, will be ignored.
+
+        Returns
+        -------
+        list[Person, ...] or PeopleFrame
+            The list of predicted :class:`Person` object, or a :class:`PeopleFrame` if the last 
+            update was given a :class:`PeopleFrame`, flagged with :code:`predicted=True`.
+        """
+        self.previous_list = self.current_list
+        self.tracker.coast()
+        predicted_boxes = {int(track.track_id): track.to_tlbr() for track in self.tracker.tracks 
+                           if track.is_confirmed() and track.time_since_update <= 1}
+        if isinstance(self.previous_list, PeopleFrame):
+            cids = self.previous_list.cids.tolist()
+            kept = [i for i, cid in enumerate(cids) if cid in predicted_boxes]
+            self.current_list = self.previous_list.select(kept).predict(
+                [predicted_boxes[cids[i]] for i in kept]
+            )
+        else:
+            self.current_list = [predictPerson(p, predicted_boxes[p.cid]) 
+                                 for p in self.previous_list if p.cid in predicted_boxes]
+        return self.current_list
+
+
+    def getState(self):
+        """Get a snapshot of the tracker, including the Kalman filters and the pending 
+        features of all tracks, the appearance gallery of the metric, and the people of the 
+        last update with their IDs, see :mod:`pyppbox.utils.statetools`.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of the tracker state.
+        """
+        state = nestState(self.tracker.get_state(), "deepsort")
+        state.update(nestState(getPeopleState(self.current_list), "people"))
+        state['current_frame'] = np.array(self.current_frame)
+        return state
+
+
+    def setState(self, state):
+        """Restore a snapshot given by :meth:`getState()`, the confirmed tracks are resumed 
+        with their IDs and appearance samples, so they are not warmed up again.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :meth:`getState()`.
+        """
+        self.tracker.set_state(getSubState(state, "deepsort"))
+        self.current_list = getPeopleFromState(getSubState(state, "people"))
+        self.previous_list = []
+        self.current_frame = int(state['current_frame'])
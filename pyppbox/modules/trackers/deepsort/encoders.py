@@ -0,0 +1,162 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+import numpy as np
+
+from pyppbox.utils.logtools import add_warning_log
+
+
+class DefaultEncoder(object):
+
+    """Class used as the original appearance encoder of DeepSORT, a frozen TensorFlow graph 
+    such as :code:`mars-small128.pb`. TensorFlow is only imported when this encoder is created.
+    """
+
+    def __init__(self, model_file, batch_size=16):
+        """Initialize according to the given :obj:`model_file`.
+
+        Parameters
+        ----------
+        model_file : str
+            Path of the frozen graph :code:`.pb` file.
+        batch_size : int, default=16
+            Number of patches per forward pass.
+        """
+        from .origin import generate_detections as gdet
+        self.image_encoder = gdet.ImageEncoder(model_file)
+        self.image_shape = self.image_encoder.image_shape
+        self.batch_size = batch_size
+
+    def encode(self, img, boxes_xywh, boxes_xyxy, cropper):
+        """Encode the appearance of people in an image.
+
+        Parameters
+        ----------
+        img : Mat
+            A cv :obj:`Mat` image.
+        boxes_xywh : list[ndarray, ...] or ndarray
+            The bounding boxes :code:`[x, y, width, height]` of the people.
+        boxes_xyxy : list[ndarray, ...] or ndarray
+            The bounding boxes :code:`[x1, y1, x2, y2]` of the same people, ignored.
+        cropper : FrameCropper
+            A :class:`pyppbox.utils.croptools.FrameCropper` object used to crop the patches.
+
+        Returns
+        -------
+        ndarray
+            The features, :code:`shape=(number of people, feature dimension)`.
+        """
+        cropper.setFrame(img)
+        patches = cropper.getPatches(boxes_xywh, self.image_shape[:2])
+        return self.image_encoder(patches, self.batch_size)
+
+
+class TorchreidEncoder(object):
+
+    """Class used as an appearance encoder of DeepSORT which reuses the extractor of a 
+    :class:`pyppbox.modules.reiders.torchreid.MyTorchreid` reider, so no TensorFlow model is 
+    needed. The features of the last encoded frame are kept, so the reider can re-identify the 
+    same people from them by :meth:`getFeatures()` instead of embedding them a second time.
+    """
+
+    def __init__(self, reider, model_wh):
+        """Initialize according to the given :obj:`reider`.
+
+        Parameters
+        ----------
+        reider : MyTorchreid
+            A :class:`MyTorchreid` object, its classifier does not need to be loaded.
+        model_wh : tuple(int, int)
+            The size (width, height) of the body crops, normally :obj:`model_wh` of the 
+            :class:`RCFGTorchreid` of the :obj:`reider`.
+        """
+        self.reider = reider
+        self.model_wh = (int(model_wh[0]), int(model_wh[1]))
+        self.__frame__ = None
+        self.__features__ = {}
+
+    @staticmethod
+    def __getKey__(box_xyxy):
+        return tuple(int(v) for v in box_xyxy[:4])
+
+    def encode(self, img, boxes_xywh, boxes_xyxy, cropper):
+        """Encode the appearance of people in an image with a single forward pass of the 
+        extractor and keep the features of this frame.
+
+        Parameters
+        ----------
+        img : Mat
+            A cv :obj:`Mat` image.
+        boxes_xywh : list[ndarray, ...] or ndarray
+            The bounding boxes :code:`[x, y, width, height]` of the people, ignored.
+        boxes_xyxy : list[ndarray, ...] or ndarray
+            The bounding boxes :code:`[x1, y1, x2, y2]` of the same people.
+        cropper : FrameCropper
+            A :class:`pyppbox.utils.croptools.FrameCropper` object used to crop the people.
+
+        Returns
+        -------
+        ndarray
+            The features, :code:`shape=(number of people, feature dimension)`.
+        """
+        cropper.setFrame(img)
+        crops = []
+        keys = []
+        for box in boxes_xyxy:
+            try:
+                crops.append(cropper.getBodyCrop(box, self.model_wh))
+                keys.append(self.__getKey__(box))
+            except ValueError as e:
+                # Empty crop -> Encode a blank crop which is not shared with the reider
+                add_warning_log("TorchreidEncoder : encode() -> " + str(e))
+                crops.append(np.zeros((self.model_wh[1], self.model_wh[0], 3), dtype=np.uint8))
+                keys.append(None)
+        self.__frame__ = img
+        self.__features__ = {}
+        if len(crops) == 0: return np.empty((0, 0), dtype=np.float32)
+        features = self.reider.extract(crops, is_bgr=True)
+        for key, feature in zip(keys, features):
+            if key is not None: self.__features__[key] = feature
+        return features
+
+    def getFeatures(self, img, boxes_xyxy):
+        """Get the features of people kept by the last :meth:`encode()`.
+
+        Parameters
+        ----------
+        img : Mat
+            The cv :obj:`Mat` image, the features are only returned if it is the same object 
+            as the last encoded image.
+        boxes_xyxy : list[ndarray, ...] or ndarray
+            The bounding boxes :code:`[x1, y1, x2, y2]` of the people.
+
+        Returns
+        -------
+        list[ndarray or None, ...]
+            The feature of each bounding box, or :code:`None` if it was not encoded.
+        """
+        if img is not self.__frame__: return [None] * len(boxes_xyxy)
+        return [self.__features__.get(self.__getKey__(box)) for box in boxes_xyxy]
+
+    def reset(self):
+        """Forget the features of the last encoded frame."""
+        self.__frame__ = None
+        self.__features__ = {}
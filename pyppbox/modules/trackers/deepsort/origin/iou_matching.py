@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import numpy as np
 # from . import linear_assignment
 from . import linear_assignment
+from pyppbox.modules.trackers.gridindex import overlapPairs, pairIoU
 
 
 def iou(bbox, candidates):
@@ -40,8 +41,42 @@ def iou(bbox, candidates):
     return area_intersection / (area_bbox + area_candidates - area_intersection)
 
 
+def iou_batch(bboxes, candidates):
+    """Computer intersection over union between all pairs of bounding boxes.
+
+    Parameters
+    ----------
+    bboxes : ndarray
+        A matrix of N bounding boxes (one per row) in format
+        `(top left x, top left y, width, height)`.
+    candidates : ndarray
+        A matrix of M candidate bounding boxes (one per row) in the same format
+        as `bboxes`.
+
+    Returns
+    -------
+    ndarray
+        An NxM matrix, where element (i, j) is the same as
+        `iou(bboxes[i], candidates)[j]`.
+
+    """
+    bboxes_tl, bboxes_br = bboxes[:, np.newaxis, :2], \
+        bboxes[:, np.newaxis, :2] + bboxes[:, np.newaxis, 2:]
+    candidates_tl = candidates[np.newaxis, :, :2]
+    candidates_br = candidates[np.newaxis, :, :2] + candidates[np.newaxis, :, 2:]
+
+    tl = np.maximum(bboxes_tl, candidates_tl)
+    br = np.minimum(bboxes_br, candidates_br)
+    wh = np.maximum(0., br - tl)
+
+    area_intersection = wh.prod(axis=2)
+    area_bboxes = bboxes[:, 2:].prod(axis=1)[:, np.newaxis]
+    area_candidates = candidates[:, 2:].prod(axis=1)[np.newaxis, :]
+    return area_intersection / (area_bboxes + area_candidates - area_intersection)
+
+
 def iou_cost(tracks, detections, track_indices=None,
-             detection_indices=None):
+             detection_indices=None, grid_min_pairs=np.inf):
     """An intersection over union distance metric.
 
     Parameters
@@ -56,6 +91,10 @@ def iou_cost(tracks, detections, track_indices=None,
     detection_indices : Optional[List[int]]
         A list of indices to detections that should be matched. Defaults
         to all `detections`.
+    grid_min_pairs : Optional[int]
+        With at least this many track-detection pairs, only the overlapping
+        pairs found by pyppbox.modules.trackers.gridindex are computed, the
+        others have a cost of 1.
 
     Returns
     -------
@@ -70,13 +109,26 @@ def iou_cost(tracks, detections, track_indices=None,
     if detection_indices is None:
         detection_indices = np.arange(len(detections))
 
-    cost_matrix = np.zeros((len(track_indices), len(detection_indices)))
-    for row, track_idx in enumerate(track_indices):
-        if tracks[track_idx].time_since_update > 1:
-            cost_matrix[row, :] = linear_assignment.INFTY_COST
-            continue
-
-        bbox = tracks[track_idx].to_tlwh()
-        candidates = np.asarray([detections[i].tlwh for i in detection_indices])
-        cost_matrix[row, :] = 1. - iou(bbox, candidates)
+    cost_matrix = np.full((len(track_indices), len(detection_indices)),
+                          linear_assignment.INFTY_COST)
+    if len(track_indices) == 0 or len(detection_indices) == 0:
+        return cost_matrix
+    recent = np.array(
+        [tracks[i].time_since_update <= 1 for i in track_indices], dtype=bool)
+    if not np.any(recent):
+        return cost_matrix
+    bboxes = np.asarray(
+        [tracks[i].to_tlwh() for i, r in zip(track_indices, recent) if r])
+    candidates = np.asarray([detections[i].tlwh for i in detection_indices])
+    if len(bboxes) * len(candidates) >= grid_min_pairs:
+        bboxes[:, 2:] += bboxes[:, :2]
+        candidates = candidates.copy()
+        candidates[:, 2:] += candidates[:, :2]
+        rows, cols = overlapPairs(bboxes, candidates)
+        recent_rows = np.flatnonzero(recent)
+        cost_matrix[recent_rows, :] = 1.
+        cost_matrix[recent_rows[rows], cols] = \
+            1. - pairIoU(bboxes, candidates, rows, cols)
+        return cost_matrix
+    cost_matrix[recent, :] = 1. - iou_batch(bboxes, candidates)
     return cost_matrix
@@ -227,3 +227,141 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+    def multi_predict(self, mean, covariance):
+        """Run Kalman filter prediction step for multiple tracks at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors of the object states at the
+            previous time step.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the object states at
+            the previous time step.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the mean vectors and covariance matrices of the predicted
+            states, same as calling `predict` for each track.
+
+        """
+        h = mean[:, 3]
+        ones = np.ones_like(h)
+        std = np.stack((
+            self._std_weight_position * h,
+            self._std_weight_position * h,
+            1e-2 * ones,
+            self._std_weight_position * h,
+            self._std_weight_velocity * h,
+            self._std_weight_velocity * h,
+            1e-5 * ones,
+            self._std_weight_velocity * h), axis=1)
+        motion_cov = np.zeros_like(covariance)
+        diag = np.arange(8)
+        motion_cov[:, diag, diag] = np.square(std)
+
+        mean = np.dot(mean, self._motion_mat.T)
+        covariance = np.matmul(np.matmul(
+            self._motion_mat, covariance), self._motion_mat.T) + motion_cov
+
+        return mean, covariance
+
+    def multi_project(self, mean, covariance):
+        """Project the state distributions of multiple tracks to measurement
+        space, see `project`.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 covariance matrices.
+
+        """
+        h = mean[:, 3]
+        std = np.stack((
+            self._std_weight_position * h,
+            self._std_weight_position * h,
+            1e-1 * np.ones_like(h),
+            self._std_weight_position * h), axis=1)
+        diag = np.arange(4)
+        covariance = covariance[:, :4, :4].copy()
+        covariance[:, diag, diag] += np.square(std)
+        return mean[:, :4], covariance
+
+    def multi_update(self, mean, covariance, measurement):
+        """Run Kalman filter correction step for multiple tracks at once, see
+        `update`.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional predicted mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices.
+        measurement : ndarray
+            The Nx4 dimensional measurement vectors (x, y, a, h), one for each
+            track.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_mean, projected_cov = self.multi_project(mean, covariance)
+
+        cholesky_factor = np.linalg.cholesky(projected_cov)
+        inv_factor = np.linalg.inv(cholesky_factor)
+        # K = P H^T S^-1 with S^-1 = L^-T L^-1
+        kalman_gain = np.matmul(np.matmul(
+            covariance[:, :, :4], np.swapaxes(inv_factor, 1, 2)), inv_factor)
+        innovation = measurement - projected_mean
+
+        new_mean = mean + np.matmul(
+            kalman_gain, innovation[:, :, np.newaxis])[:, :, 0]
+        new_covariance = covariance - np.matmul(np.matmul(
+            kalman_gain, projected_cov), np.swapaxes(kalman_gain, 1, 2))
+        return new_mean, new_covariance
+
+    def multi_gating_distance(self, mean, covariance, measurements,
+                              only_position=False):
+        """Compute the gating distances between the state distributions of
+        multiple tracks and measurements, see `gating_distance`.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements in format (x, y, a, h).
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM matrix, where element (i, j) contains the squared
+            Mahalanobis distance between track i and `measurements[j]`.
+
+        """
+        mean, covariance = self.multi_project(mean, covariance)
+        if only_position:
+            mean, covariance = mean[:, :2], covariance[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        cholesky_factor = np.linalg.cholesky(covariance)
+        d = measurements[np.newaxis, :, :] - mean[:, np.newaxis, :]
+        z = np.matmul(np.linalg.inv(cholesky_factor), np.swapaxes(d, 1, 2))
+        squared_maha = np.sum(z * z, axis=1)
+        return squared_maha
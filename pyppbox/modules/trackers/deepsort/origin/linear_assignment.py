@@ -5,7 +5,7 @@ import numpy as np
 
 # from . import kalman_filter
 from . import kalman_filter
-from scipy.optimize import linear_sum_assignment
+from pyppbox.modules.trackers.assignment import linearAssignment
 
 
 INFTY_COST = 1e+5
@@ -13,7 +13,7 @@ INFTY_COST = 1e+5
 
 def min_cost_matching(
         distance_metric, max_distance, tracks, detections, track_indices=None,
-        detection_indices=None):
+        detection_indices=None, solver="auto"):
     """Solve linear assignment problem.
 
     Parameters
@@ -37,6 +37,9 @@ def min_cost_matching(
     detection_indices : List[int]
         List of detection indices that maps columns in `cost_matrix` to
         detections in `detections` (see description above).
+    solver : Optional[str]
+        The solver of pyppbox.modules.trackers.assignment, "auto", "lapjv",
+        "scipy", or "greedy".
 
     Returns
     -------
@@ -58,17 +61,13 @@ def min_cost_matching(
     cost_matrix = distance_metric(
         tracks, detections, track_indices, detection_indices)
     cost_matrix[cost_matrix > max_distance] = max_distance + 1e-5
-    indices = linear_sum_assignment(cost_matrix)
-    indices = np.asarray(indices)
-    indices = np.transpose(indices)
+    # Solved as a whole by SciPy like the original when solver="auto"
+    indices, unmatched_rows, unmatched_cols = linearAssignment(
+        cost_matrix, solver="scipy" if solver == "auto" else solver)
 
-    matches, unmatched_tracks, unmatched_detections = [], [], []
-    for col, detection_idx in enumerate(detection_indices):
-        if col not in indices[:, 1]:
-            unmatched_detections.append(detection_idx)
-    for row, track_idx in enumerate(track_indices):
-        if row not in indices[:, 0]:
-            unmatched_tracks.append(track_idx)
+    unmatched_detections = [detection_indices[col] for col in unmatched_cols]
+    unmatched_tracks = [track_indices[row] for row in unmatched_rows]
+    matches = []
     for row, col in indices:
         track_idx = track_indices[row]
         detection_idx = detection_indices[col]
@@ -82,7 +81,7 @@ def min_cost_matching(
 
 def matching_cascade(
         distance_metric, max_distance, cascade_depth, tracks, detections,
-        track_indices=None, detection_indices=None):
+        track_indices=None, detection_indices=None, solver="auto"):
     """Run matching cascade.
 
     Parameters
@@ -109,6 +108,9 @@ def matching_cascade(
         List of detection indices that maps columns in `cost_matrix` to
         detections in `detections` (see description above). Defaults to all
         detections.
+    solver : Optional[str]
+        The solver of pyppbox.modules.trackers.assignment, see
+        `min_cost_matching`.
 
     Returns
     -------
@@ -126,21 +128,22 @@ def matching_cascade(
 
     unmatched_detections = detection_indices
     matches = []
+    # Group the tracks by level once instead of scanning them at every level.
+    tracks_by_level = {}
+    for k in track_indices:
+        tracks_by_level.setdefault(tracks[k].time_since_update - 1, []).append(k)
     for level in range(cascade_depth):
         if len(unmatched_detections) == 0:  # No detections left
             break
 
-        track_indices_l = [
-            k for k in track_indices
-            if tracks[k].time_since_update == 1 + level
-        ]
+        track_indices_l = tracks_by_level.get(level, [])
         if len(track_indices_l) == 0:  # Nothing to match at this level
             continue
 
         matches_l, _, unmatched_detections = \
             min_cost_matching(
                 distance_metric, max_distance, tracks, detections,
-                track_indices_l, unmatched_detections)
+                track_indices_l, unmatched_detections, solver)
         matches += matches_l
     unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
     return matches, unmatched_tracks, unmatched_detections
@@ -186,10 +189,12 @@ def gate_cost_matrix(
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
     measurements = np.asarray(
-        [detections[i].to_xyah() for i in detection_indices])
-    for row, track_idx in enumerate(track_indices):
-        track = tracks[track_idx]
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = gated_cost
+        [detections[i].to_xyah() for i in detection_indices]).reshape(-1, 4)
+    if len(track_indices) == 0 or len(measurements) == 0:
+        return cost_matrix
+    gating_distance = kf.multi_gating_distance(
+        np.asarray([tracks[i].mean for i in track_indices]),
+        np.asarray([tracks[i].covariance for i in track_indices]),
+        measurements, only_position)
+    cost_matrix[gating_distance > gating_threshold] = gated_cost
     return cost_matrix
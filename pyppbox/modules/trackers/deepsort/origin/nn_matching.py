@@ -101,6 +101,11 @@ class NearestNeighborDistanceMetric(object):
     A nearest neighbor distance metric that, for each target, returns
     the closest distance to any sample that has been observed so far.
 
+    The samples are kept in a preallocated gallery of float32 ring buffers,
+    one slot of `budget` samples per target, so that adding a sample is O(1)
+    and the memory is bounded by the number of active targets. For the
+    cosine metric, the samples are stored L2-normalized.
+
     Parameters
     ----------
     metric : str
@@ -110,13 +115,15 @@ class NearestNeighborDistanceMetric(object):
         invalid match.
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
-        the oldest samples when the budget is reached.
+        the oldest samples when the budget is reached. If None, the ring
+        buffers grow as needed.
 
     Attributes
     ----------
     samples : Dict[int -> List[ndarray]]
         A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+        that have been observed so far, oldest first (read-only view of the
+        gallery).
 
     """
 
@@ -124,15 +131,64 @@ class NearestNeighborDistanceMetric(object):
 
 
         if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
+            self._normalize = False
         elif metric == "cosine":
-            self._metric = _nn_cosine_distance
+            self._normalize = True
         else:
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+        self._gallery = None  # (slots, capacity, dim) float32
+        self._norms = None    # (slots, capacity) squared norms, euclidean only
+        self._counts = np.zeros(0, dtype=int)
+        self._heads = np.zeros(0, dtype=int)
+        self._slots = {}
+        self._free = []
+
+    @property
+    def samples(self):
+        samples = {}
+        for target, slot in self._slots.items():
+            count, capacity = self._counts[slot], self._gallery.shape[1]
+            order = (self._heads[slot] - count + np.arange(count)) % capacity
+            samples[target] = list(self._gallery[slot, order])
+        return samples
+
+    def _allocate(self, dim):
+        capacity = self.budget if self.budget is not None else 16
+        self._gallery = np.zeros((16, max(1, capacity), dim), dtype=np.float32)
+        self._norms = np.zeros(self._gallery.shape[:2], dtype=np.float32)
+        self._counts = np.zeros(16, dtype=int)
+        self._heads = np.zeros(16, dtype=int)
+        self._free = list(range(15, -1, -1))
+
+    def _grow(self, slots=False, capacity=False):
+        (n, c, d) = self._gallery.shape
+        (new_n, new_c) = (2 * n if slots else n, 2 * c if capacity else c)
+        gallery = np.zeros((new_n, new_c, d), dtype=np.float32)
+        gallery[:n, :c] = self._gallery
+        norms = np.zeros((new_n, new_c), dtype=np.float32)
+        norms[:n, :c] = self._norms
+        self._gallery, self._norms = gallery, norms
+        if capacity:
+            # Only without budget, the buffers never wrapped around
+            self._heads = self._counts.copy()
+        if slots:
+            self._counts = np.concatenate((self._counts, np.zeros(n, dtype=int)))
+            self._heads = np.concatenate((self._heads, np.zeros(n, dtype=int)))
+            self._free += list(range(new_n - 1, n - 1, -1))
+
+    def _slot(self, target):
+        slot = self._slots.get(target)
+        if slot is None:
+            if len(self._free) == 0:
+                self._grow(slots=True)
+            slot = self._free.pop()
+            self._counts[slot] = 0
+            self._heads[slot] = 0
+            self._slots[target] = slot
+        return slot
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -147,11 +203,72 @@ class NearestNeighborDistanceMetric(object):
             A list of targets that are currently present in the scene.
 
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+        features = np.asarray(features, dtype=np.float32)
+        if len(features) > 0:
+            features = features.reshape(len(features), -1)
+            if self._normalize:
+                features = features / np.linalg.norm(
+                    features, axis=1, keepdims=True)
+            if self._gallery is None:
+                self._allocate(features.shape[1])
+            for feature, target in zip(features, targets):
+                slot = self._slot(target)
+                capacity = self._gallery.shape[1]
+                if self.budget is None and self._counts[slot] == capacity:
+                    self._grow(capacity=True)
+                    capacity = self._gallery.shape[1]
+                head = self._heads[slot]
+                self._gallery[slot, head] = feature
+                if not self._normalize:
+                    self._norms[slot, head] = np.dot(feature, feature)
+                self._heads[slot] = (head + 1) % capacity
+                self._counts[slot] = min(self._counts[slot] + 1, capacity)
+        active_targets = set(active_targets)
+        for target in [k for k in self._slots if k not in active_targets]:
+            self._free.append(self._slots.pop(target))
+
+    def get_state(self):
+        """Get a copy of the gallery as a dictionary of numpy arrays.
+
+        Returns
+        -------
+        Dict[str -> ndarray]
+            The gallery buffers and the slot of each target, empty if no
+            sample has been observed yet.
+
+        """
+        if self._gallery is None:
+            return {}
+        return {"gallery": self._gallery.copy(),
+                "norms": self._norms.copy(),
+                "counts": self._counts.copy(),
+                "heads": self._heads.copy(),
+                "targets": np.array(list(self._slots.keys()), dtype=int),
+                "slots": np.array(list(self._slots.values()), dtype=int),
+                "free": np.array(self._free, dtype=int)}
+
+    def set_state(self, state):
+        """Restore a gallery given by `get_state`.
+
+        Parameters
+        ----------
+        state : Dict[str -> ndarray]
+            The gallery buffers and the slot of each target.
+
+        """
+        if len(state) == 0:
+            self._gallery, self._norms = None, None
+            self._counts = np.zeros(0, dtype=int)
+            self._heads = np.zeros(0, dtype=int)
+            self._slots, self._free = {}, []
+            return
+        self._gallery = np.array(state["gallery"], dtype=np.float32)
+        self._norms = np.array(state["norms"], dtype=np.float32)
+        self._counts = np.array(state["counts"], dtype=int)
+        self._heads = np.array(state["heads"], dtype=int)
+        self._slots = dict(zip(np.asarray(state["targets"]).tolist(),
+                               np.asarray(state["slots"]).tolist()))
+        self._free = np.asarray(state["free"]).tolist()
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -171,7 +288,33 @@ class NearestNeighborDistanceMetric(object):
             `targets[i]` and `features[j]`.
 
         """
-        cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
+        cost_matrix = np.full((len(targets), len(features)), np.inf)
+        if len(targets) == 0 or len(features) == 0 or self._gallery is None:
+            return cost_matrix
+        features = np.asarray(features, dtype=np.float32).reshape(len(features), -1)
+        if self._normalize:
+            features = features / np.linalg.norm(features, axis=1, keepdims=True)
+
+        known = [i for i, target in enumerate(targets) if target in self._slots]
+        if len(known) == 0:
+            return cost_matrix
+        slots = np.array([self._slots[targets[i]] for i in known])
+        (_, capacity, dim) = self._gallery.shape
+
+        # One matrix multiply for all samples of all targets, then a
+        # segmented min-reduction over the samples of each target.
+        gallery = self._gallery[slots].reshape(-1, dim)
+        products = np.dot(gallery, features.T).reshape(len(slots), capacity, -1)
+        if self._normalize:
+            distances = 1. - products
+        else:
+            distances = -2. * products + \
+                self._norms[slots][:, :, np.newaxis] + \
+                np.square(features).sum(axis=1)[np.newaxis, np.newaxis, :]
+        unused = np.arange(capacity)[np.newaxis, :] >= self._counts[slots][:, np.newaxis]
+        distances[unused] = np.inf
+        distances = distances.min(axis=1)
+        if not self._normalize:
+            distances = np.maximum(0., distances)
+        cost_matrix[known] = distances
         return cost_matrix
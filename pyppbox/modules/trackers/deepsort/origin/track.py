@@ -60,6 +60,9 @@ class Track:
     features : List[ndarray]
         A cache of features. On each measurement update, the associated feature
         vector is added to this list.
+    detection_index : Optional[int]
+        Index of the detection this track was associated with at the current
+        time step, or None if the track was not associated.
 
     """
 
@@ -73,6 +76,7 @@ class Track:
         self.time_since_update = 0
 
         self.state = TrackState.Tentative
+        self.detection_index = None
         self.features = []
         if feature is not None:
             self.features.append(feature)
@@ -122,6 +126,37 @@ class Track:
         self.mean, self.covariance = kf.predict(self.mean, self.covariance)
         self.age += 1
         self.time_since_update += 1
+        self.detection_index = None
+
+    def mark_predicted(self, mean, covariance):
+        """Set the state distribution predicted for all tracks at once by
+        `KalmanFilter.multi_predict`, same as `predict` for a single track.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The predicted mean vector.
+        covariance : ndarray
+            The predicted covariance matrix.
+
+        """
+        self.mean, self.covariance = mean, covariance
+        self.age += 1
+        self.time_since_update += 1
+        self.detection_index = None
+
+    def coast(self, kf):
+        """Propagate the state distribution on a time step without detection.
+        Unlike `predict`, the age and the time since update are kept, so the
+        track is neither confirmed nor deleted by the coasted time steps.
+
+        Parameters
+        ----------
+        kf : kalman_filter.KalmanFilter
+            The Kalman filter.
+
+        """
+        self.mean, self.covariance = kf.predict(self.mean, self.covariance)
 
     def update(self, kf, detection):
         """Perform Kalman filter measurement update step and update the feature
@@ -144,6 +179,28 @@ class Track:
         if self.state == TrackState.Tentative and self.hits >= self._n_init:
             self.state = TrackState.Confirmed
 
+    def mark_updated(self, mean, covariance, detection):
+        """Set the state distribution corrected for all matched tracks at once
+        by `KalmanFilter.multi_update`, same as `update` for a single track.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The corrected mean vector.
+        covariance : ndarray
+            The corrected covariance matrix.
+        detection : Detection
+            The associated detection.
+
+        """
+        self.mean, self.covariance = mean, covariance
+        self.features.append(detection.feature)
+
+        self.hits += 1
+        self.time_since_update = 0
+        if self.state == TrackState.Tentative and self.hits >= self._n_init:
+            self.state = TrackState.Confirmed
+
     def mark_missed(self):
         """Mark this track as missed (no association at the current time step).
         """
@@ -22,6 +22,12 @@ class Tracker:
         Number of consecutive detections before the track is confirmed. The
         track state is set to `Deleted` if a miss occurs within the first
         `n_init` frames.
+    solver : str
+        The solver of pyppbox.modules.trackers.assignment, "auto", "lapjv",
+        "scipy", or "greedy".
+    grid_min_pairs : int
+        Minimum number of track-detection pairs of the IOU association to
+        find the overlapping pairs by pyppbox.modules.trackers.gridindex.
 
     Attributes
     ----------
@@ -38,11 +44,14 @@ class Tracker:
 
     """
 
-    def __init__(self, metric, max_iou_distance=0.7, max_age=30, n_init=3):
+    def __init__(self, metric, max_iou_distance=0.7, max_age=30, n_init=3,
+                 solver="auto", grid_min_pairs=16384):
         self.metric = metric
         self.max_iou_distance = max_iou_distance
         self.max_age = max_age
         self.n_init = n_init
+        self.solver = solver
+        self.grid_min_pairs = grid_min_pairs
 
         self.kf = kalman_filter.KalmanFilter()
         self.tracks = []
@@ -53,11 +62,29 @@ class Tracker:
 
         This function should be called once every time step, before `update`.
         """
-        for track in self.tracks:
-            track.predict(self.kf)
+        if len(self.tracks) == 0:
+            return
+        means, covariances = self.kf.multi_predict(
+            np.asarray([t.mean for t in self.tracks]),
+            np.asarray([t.covariance for t in self.tracks]))
+        for track, mean, covariance in zip(self.tracks, means, covariances):
+            track.mark_predicted(mean, covariance)
+
+    def coast(self):
+        """Propagate track state distributions one time step forward on a
+        time step without detection, see `Track.coast`.
+        """
+        if len(self.tracks) == 0:
+            return
+        means, covariances = self.kf.multi_predict(
+            np.asarray([t.mean for t in self.tracks]),
+            np.asarray([t.covariance for t in self.tracks]))
+        for track, mean, covariance in zip(self.tracks, means, covariances):
+            track.mean, track.covariance = mean, covariance
 
     def update(self, detections):
-        """Perform measurement update and track management.
+        """Perform measurement update and track management. The index of the
+        detection associated with each track is kept in `Track.detection_index`.
 
         Parameters
         ----------
@@ -70,13 +97,21 @@ class Tracker:
             self._match(detections)
 
         # Update track set.
-        for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(
-                self.kf, detections[detection_idx])
+        if len(matches) > 0:
+            means, covariances = self.kf.multi_update(
+                np.asarray([self.tracks[t].mean for t, _ in matches]),
+                np.asarray([self.tracks[t].covariance for t, _ in matches]),
+                np.asarray([detections[d].to_xyah() for _, d in matches]))
+            for (track_idx, detection_idx), mean, covariance in zip(
+                    matches, means, covariances):
+                self.tracks[track_idx].mark_updated(
+                    mean, covariance, detections[detection_idx])
+                self.tracks[track_idx].detection_index = detection_idx
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
             self._initiate_track(detections[detection_idx])
+            self.tracks[-1].detection_index = detection_idx
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         # Update distance metric.
@@ -93,27 +128,34 @@ class Tracker:
 
     def _match(self, detections):
 
-        def gated_metric(tracks, dets, track_indices, detection_indices):
-            features = np.array([dets[i].feature for i in detection_indices])
-            targets = np.array([tracks[i].track_id for i in track_indices])
-            cost_matrix = self.metric.distance(features, targets)
-            cost_matrix = linear_assignment.gate_cost_matrix(
-                self.kf, cost_matrix, tracks, dets, track_indices,
-                detection_indices)
-
-            return cost_matrix
-
         # Split track set into confirmed and unconfirmed tracks.
         confirmed_tracks = [
             i for i, t in enumerate(self.tracks) if t.is_confirmed()]
         unconfirmed_tracks = [
             i for i, t in enumerate(self.tracks) if not t.is_confirmed()]
 
+        # The gated appearance cost of all confirmed tracks and detections is
+        # computed once, each cascade level only takes its rows and columns.
+        full_cost = np.zeros((len(confirmed_tracks), len(detections)))
+        if len(confirmed_tracks) > 0 and len(detections) > 0:
+            features = np.array([d.feature for d in detections])
+            targets = np.array([self.tracks[i].track_id for i in confirmed_tracks])
+            full_cost = self.metric.distance(features, targets)
+            full_cost = linear_assignment.gate_cost_matrix(
+                self.kf, full_cost, self.tracks, detections, confirmed_tracks,
+                np.arange(len(detections)))
+        rows = np.full(len(self.tracks), -1, dtype=int)
+        rows[confirmed_tracks] = np.arange(len(confirmed_tracks))
+
+        def gated_metric(tracks, dets, track_indices, detection_indices):
+            return full_cost[np.ix_(rows[track_indices], detection_indices)]
+
         # Associate confirmed tracks using appearance features.
         matches_a, unmatched_tracks_a, unmatched_detections = \
             linear_assignment.matching_cascade(
                 gated_metric, self.metric.matching_threshold, self.max_age,
-                self.tracks, detections, confirmed_tracks)
+                self.tracks, detections, confirmed_tracks,
+                solver=self.solver)
 
         # Associate remaining tracks together with unconfirmed tracks using IOU.
         iou_track_candidates = unconfirmed_tracks + [
@@ -124,13 +166,77 @@ class Tracker:
             self.tracks[k].time_since_update != 1]
         matches_b, unmatched_tracks_b, unmatched_detections = \
             linear_assignment.min_cost_matching(
-                iou_matching.iou_cost, self.max_iou_distance, self.tracks,
-                detections, iou_track_candidates, unmatched_detections)
+                self._iou_cost, self.max_iou_distance, self.tracks,
+                detections, iou_track_candidates, unmatched_detections,
+                self.solver)
 
         matches = matches_a + matches_b
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
         return matches, unmatched_tracks, unmatched_detections
 
+    def get_state(self):
+        """Get a copy of all tracks and the distance metric as a dictionary of
+        numpy arrays, the metric arrays are prefixed by `metric.`.
+
+        Returns
+        -------
+        Dict[str -> ndarray]
+            The tracker state.
+
+        """
+        feature_counts = [len(t.features) for t in self.tracks]
+        features = [np.asarray(f, dtype=np.float32).reshape(-1)
+                    for t in self.tracks for f in t.features]
+        state = {
+            "means": np.array([t.mean for t in self.tracks]).reshape(-1, 8),
+            "covariances": np.array(
+                [t.covariance for t in self.tracks]).reshape(-1, 8, 8),
+            "track_ids": np.array([t.track_id for t in self.tracks], dtype=int),
+            "hits": np.array([t.hits for t in self.tracks], dtype=int),
+            "ages": np.array([t.age for t in self.tracks], dtype=int),
+            "time_since_update": np.array(
+                [t.time_since_update for t in self.tracks], dtype=int),
+            "states": np.array([t.state for t in self.tracks], dtype=int),
+            "feature_counts": np.array(feature_counts, dtype=int),
+            "features": np.array(features, dtype=np.float32) if len(features)
+                        > 0 else np.zeros((0, 0), dtype=np.float32),
+            "next_id": np.array(self._next_id)}
+        for key, value in self.metric.get_state().items():
+            state["metric." + key] = value
+        return state
+
+    def set_state(self, state):
+        """Restore the tracks and the distance metric given by `get_state`.
+
+        Parameters
+        ----------
+        state : Dict[str -> ndarray]
+            The tracker state.
+
+        """
+        self.tracks = []
+        features = np.asarray(state["features"], dtype=np.float32)
+        ends = np.cumsum(np.asarray(state["feature_counts"], dtype=int))
+        for i, track_id in enumerate(np.asarray(state["track_ids"]).tolist()):
+            track = Track(np.array(state["means"][i], dtype=np.float64),
+                          np.array(state["covariances"][i], dtype=np.float64),
+                          track_id, self.n_init, self.max_age)
+            track.hits = int(state["hits"][i])
+            track.age = int(state["ages"][i])
+            track.time_since_update = int(state["time_since_update"][i])
+            track.state = int(state["states"][i])
+            track.features = list(features[ends[i] - state["feature_counts"][i]:ends[i]])
+            self.tracks.append(track)
+        self._next_id = int(state["next_id"])
+        self.metric.set_state({key[len("metric."):]: value
+                               for key, value in state.items()
+                               if key.startswith("metric.")})
+
+    def _iou_cost(self, tracks, detections, track_indices, detection_indices):
+        return iou_matching.iou_cost(
+            tracks, detections, track_indices, detection_indices,
+            self.grid_min_pairs)
+
     def _initiate_track(self, detection):
         mean, covariance = self.kf.initiate(detection.to_xyah())
         self.tracks.append(Track(
@@ -0,0 +1,130 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+"""
+Uniform grid index of bounding boxes for the IoU association of crowded scenes. Only the pairs 
+of boxes sharing a grid cell are compared, so the candidate pairs are found in about linear time 
+instead of computing the full IoU matrix.
+"""
+
+
+import numpy as np
+
+
+def __asBoxes__(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if boxes.ndim != 2: boxes = boxes.reshape(-1, 4)
+    return boxes[:, :4]
+
+
+def __expandCells__(boxes, origin, cell):
+    # Every (box, cell) covered by the boxes
+    lo = np.floor((boxes[:, :2] - origin) / cell).astype(np.int64)
+    hi = np.maximum(np.floor((boxes[:, 2:] - origin) / cell).astype(np.int64), lo)
+    span = hi - lo + 1
+    counts = span[:, 0] * span[:, 1]
+    owners = np.repeat(np.arange(len(boxes)), counts)
+    within = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = lo[owners, 0] + within % span[owners, 0]
+    cy = lo[owners, 1] + within // span[owners, 0]
+    return owners, cx, cy
+
+
+def overlapPairs(boxes_a, boxes_b, cell=None):
+    """Find all pairs of overlapping bounding boxes, the pairs whose IoU is above 0.
+
+    Parameters
+    ----------
+    boxes_a : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2, ...]`, :code:`shape=(N, 4+)`.
+    boxes_b : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2, ...]`, :code:`shape=(M, 4+)`.
+    cell : float, default=None
+        The size of the grid cells. Set :code:`cell=None` to use twice the median size of 
+        the boxes.
+
+    Returns
+    -------
+    tuple(ndarray, ndarray)
+        The indices in :obj:`boxes_a` and the indices in :obj:`boxes_b` of the overlapping 
+        pairs.
+    """
+    a = __asBoxes__(boxes_a)
+    b = __asBoxes__(boxes_b)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    both = np.concatenate((a, b))
+    if cell is None:
+        cell = 2. * float(np.median(np.maximum(both[:, 2] - both[:, 0], both[:, 3] - both[:, 1])))
+    cell = max(cell, 1.0)
+    origin = both[:, :2].min(axis=0)
+    b_owners, bx, by = __expandCells__(b, origin, cell)
+    a_owners, ax, ay = __expandCells__(a, origin, cell)
+    height = int(max(by.max(), ay.max())) + 1
+    b_keys = bx * height + by
+    order = np.argsort(b_keys, kind="stable")
+    sorted_keys = b_keys[order]
+    a_keys = ax * height + ay
+    lo = np.searchsorted(sorted_keys, a_keys, side="left")
+    counts = np.searchsorted(sorted_keys, a_keys, side="right") - lo
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = np.repeat(a_owners, counts)
+    cols = b_owners[order[np.repeat(lo, counts) + within]]
+    x1 = np.maximum(a[rows, 0], b[cols, 0])
+    y1 = np.maximum(a[rows, 1], b[cols, 1])
+    # A pair sharing several cells is only kept in the cell of its intersection's top-left corner
+    keep = ((np.minimum(a[rows, 2], b[cols, 2]) > x1) & 
+            (np.minimum(a[rows, 3], b[cols, 3]) > y1) & 
+            (np.floor((x1 - origin[0]) / cell) == np.repeat(ax, counts)) & 
+            (np.floor((y1 - origin[1]) / cell) == np.repeat(ay, counts)))
+    return rows[keep], cols[keep]
+
+
+def pairIoU(boxes_a, boxes_b, rows, cols):
+    """Compute the IoU of the given pairs of bounding boxes.
+
+    Parameters
+    ----------
+    boxes_a : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2, ...]`, :code:`shape=(N, 4+)`.
+    boxes_b : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2, ...]`, :code:`shape=(M, 4+)`.
+    rows : ndarray
+        The indices of the pairs in :obj:`boxes_a`.
+    cols : ndarray
+        The indices of the pairs in :obj:`boxes_b`.
+
+    Returns
+    -------
+    ndarray
+        The IoU of each pair.
+    """
+    a = __asBoxes__(boxes_a)[rows]
+    b = __asBoxes__(boxes_b)[cols]
+    w = np.maximum(0., np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]))
+    h = np.maximum(0., np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]))
+    inter = w * h
+    return inter / ((a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + 
+                    (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter)
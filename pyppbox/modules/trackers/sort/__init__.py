@@ -19,8 +19,9 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 
-from pyppbox.utils.persontools import Person
+from pyppbox.utils.persontools import Person, PeopleFrame, predictPerson
 from pyppbox.utils.logtools import add_error_log, ignore_this_logger
+from pyppbox.utils.statetools import nestState, getSubState, getPeopleState, getPeopleFromState
 
 ignore_this_logger("sort")
 
@@ -32,51 +33,29 @@ class MySORT(object):
     """Class used as a custom layer or interface for interacting with SORT tracker.
     """
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, grid_min_pairs=16384):
         """Initialize according to the given :obj:`cfg` and :obj:`auto_load`.
 
         Parameters
         ----------
         cfg : TCFGSORT
             A :class:`TCFGDeepSORT` object which manages the configurations of tracker SORT.
+        grid_min_pairs : int, default=16384
+            Find the overlapping detection-track pairs by a spatial grid index instead of the 
+            full IoU matrix when the number of detections times the number of tracks is at 
+            least :obj:`grid_min_pairs`, see :mod:`pyppbox.modules.trackers.gridindex`.
         """
-        self.st = Sort(cfg.max_age, cfg.min_hits, cfg.iou_threshold)
+        self.st = Sort(cfg.max_age, cfg.min_hits, cfg.iou_threshold, grid_min_pairs=grid_min_pairs)
         self.previous_list = []
         self.current_list = []
 
 
-    def __getIndexFromSORTTracks__(self, box_xyxy, sort_tracks, max_spread=128):
-        track_index = -1
-        updated_cid = -1
-        box_list = box_xyxy.tolist()
-        tracks_list = sort_tracks.tolist()
-        spread_list = []
-
-        if len(box_list) > 0 and len(tracks_list) > 0:
-            for b in tracks_list:
-                max_spread = -1
-                for i in range(0, 4):
-                    sub_spread = abs(box_list[i] - b[i])
-                    if sub_spread > max_spread:
-                        max_spread = sub_spread
-                spread_list.append(max_spread)
-            
-            if len(spread_list) > 0:
-                sm_spread = min(spread_list)
-                if sm_spread <= max_spread:
-                    track_index = spread_list.index(sm_spread)
-                    updated_cid = int(tracks_list[track_index][4])
-
-        return track_index, updated_cid
-
-
-    def __getIndexFromPreviousList__(self, cid):
-        pindex = -1
-        for i in range(0, len(self.previous_list)):
-            if cid == self.previous_list[i].cid:
-                pindex = i
-                break
-        return pindex
+    def __getPreviousByCID__(self):
+        # cid -> first person of the previous list with that cid
+        previous = {}
+        for person in self.previous_list:
+            previous.setdefault(person.cid, person)
+        return previous
 
 
     def update(self, person_list, img=None):
@@ -84,30 +63,35 @@ class MySORT(object):
 
         Parameters
         ----------
-        person_list : list[Person, ...]
-            A list of :class:`Person` object which stores the detected people in the given :obj:`img`.
+        person_list : list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object or a :class:`PeopleFrame` which stores the detected 
+            people in the given :obj:`img`.
         img : any, default=None
             Being consistent with other trackers, will be ignored.
 
         Returns
         -------
-        list[Person, ...]
-            The updated list of :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            The updated list of :class:`Person` object, or a :class:`PeopleFrame` if 
+            :obj:`person_list` is a :class:`PeopleFrame`.
         """
         self.previous_list = self.current_list
         self.current_list = []
 
         if len(person_list) > 0:
-            if isinstance(person_list[0], Person):
+            if isinstance(person_list, PeopleFrame):
+                self.current_list = PeopleFrame.fromPeople(self.st.update_pyppbox(person_list))
+                self.current_list.copyIDsFrom(self.previous_list)
+            elif isinstance(person_list[0], Person):
                 self.current_list = self.st.update_pyppbox(person_list)
-                for i in range (0, len(self.current_list)):
-                    if len(self.previous_list) > 0:
-                        pindex = self.__getIndexFromPreviousList__(self.current_list[i].cid)
-                        if pindex >= 0:
-                            self.current_list[i].faceid = self.previous_list[pindex].faceid
-                            self.current_list[i].deepid = self.previous_list[pindex].deepid
-                            self.current_list[i].faceid_conf = self.previous_list[pindex].faceid_conf
-                            self.current_list[i].deepid_conf = self.previous_list[pindex].deepid_conf
+                previous = self.__getPreviousByCID__()
+                for person in self.current_list:
+                    pperson = previous.get(person.cid)
+                    if pperson is not None:
+                        person.faceid = pperson.faceid
+                        person.deepid = pperson.deepid
+                        person.faceid_conf = pperson.faceid_conf
+                        person.deepid_conf = pperson.deepid_conf
             else:
                 msg = ("MySORT : update() -> The element of input 'person_list' list " + 
                        "has unsupported type.")
@@ -115,3 +99,61 @@ class MySORT(object):
                 raise ValueError(msg)
 
         return self.current_list
+
+
+    def predict(self, img=None):
+        """Predict the people of the last update on a frame without detection by advancing the 
+        Kalman filters of all tracks. The track ages and hit streaks are not changed, so the 
+        tracks are neither confirmed nor deleted by the predicted frames.
+
+        Parameters
+        ----------
+        img : any, default=None
+            Being consistent with other trackers, will be ignored.
+
+        Returns
+        -------
+        list[Person, ...] or PeopleFrame
+            The list of predicted :class:`Person` object, or a :class:`PeopleFrame` if the last 
+            update was given a :class:`PeopleFrame`, flagged with :code:`predicted=True`.
+        """
+        self.previous_list = self.current_list
+        predicted_boxes = self.st.coast_pyppbox()
+        if isinstance(self.previous_list, PeopleFrame):
+            cids = self.previous_list.cids.tolist()
+            kept = [i for i, cid in enumerate(cids) if cid in predicted_boxes]
+            self.current_list = self.previous_list.select(kept).predict(
+                [predicted_boxes[cids[i]] for i in kept]
+            )
+        else:
+            self.current_list = [predictPerson(p, predicted_boxes[p.cid]) 
+                                 for p in self.previous_list if p.cid in predicted_boxes]
+        return self.current_list
+
+
+    def getState(self):
+        """Get a snapshot of the tracker, including the Kalman filters of all tracks and the
+        people of the last update with their IDs, see :mod:`pyppbox.utils.statetools`.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of the tracker state.
+        """
+        state = nestState(self.st.get_state_pyppbox(), "sort")
+        state.update(nestState(getPeopleState(self.current_list), "people"))
+        return state
+
+
+    def setState(self, state):
+        """Restore a snapshot given by :meth:`getState()`, the tracks are resumed with their
+        IDs and hit streaks, so they are not warmed up again.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :meth:`getState()`.
+        """
+        self.st.set_state_pyppbox(getSubState(state, "sort"))
+        self.current_list = getPeopleFromState(getSubState(state, "people"))
+        self.previous_list = []
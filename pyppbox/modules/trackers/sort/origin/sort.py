@@ -32,21 +32,25 @@ import time
 import argparse
 from filterpy.kalman import KalmanFilter
 
-import lap
-# from scipy.optimize import linear_sum_assignment
+from pyppbox.modules.trackers.assignment import linearAssignment, sparseAssignment
+from pyppbox.modules.trackers.gridindex import overlapPairs, pairIoU
+try:
+  import lap
+except ImportError:
+  lap = None
 
 np.random.seed(0)
 
 
-def linear_assignment(cost_matrix):
-  try:
-    # import lap
-    _, x, y = lap.lapjv(cost_matrix, extend_cost=True)
-    return np.array([[y[i],i] for i in x if i >= 0])
-  except ImportError:
-    from scipy.optimize import linear_sum_assignment
-    x, y = linear_sum_assignment(cost_matrix)
-    return np.array(list(zip(x, y)))
+def linear_assignment(cost_matrix, solver="auto"):
+  """
+  Returns the matched [[row, col],...] of the full minimum cost assignment. Made for pyppbox, solved
+  by pyppbox.modules.trackers.assignment, by lap first with a SciPy fallback like the original when
+  solver="auto".
+  """
+  if solver == "auto":
+    solver = "lapjv" if lap is not None else "scipy"
+  return linearAssignment(cost_matrix, solver=solver)[0]
 
 
 def iou_batch(bb_test, bb_gt):
@@ -96,6 +100,25 @@ def convert_x_to_bbox(x,score=None):
     return np.array([x[0]-w/2.,x[1]-h/2.,x[0]+w/2.,x[1]+h/2.,score]).reshape((1,5))
 
 
+def convert_bboxes_to_z(bboxes):
+  """
+  Vectorized convert_bbox_to_z() for bounding boxes (N,4+), returns z in the form (N,4).
+  """
+  w = bboxes[:, 2] - bboxes[:, 0]
+  h = bboxes[:, 3] - bboxes[:, 1]
+  return np.stack((bboxes[:, 0] + w/2., bboxes[:, 1] + h/2., w * h, w / h), axis=1)
+
+
+def convert_x_to_bboxes(x):
+  """
+  Vectorized convert_x_to_bbox() for states (N,7+), returns bounding boxes (N,4).
+  """
+  with np.errstate(invalid='ignore'):
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+  return np.stack((x[:, 0] - w/2., x[:, 1] - h/2., x[:, 0] + w/2., x[:, 1] + h/2.), axis=1)
+
+
 class KalmanBoxTracker(object):
   """
   This class represents the internal state of individual tracked objects observed as bbox.
@@ -150,6 +173,16 @@ class KalmanBoxTracker(object):
     self.history.append(convert_x_to_bbox(self.kf.x))
     return self.history[-1]
 
+  def coast(self):
+    """
+    Advances the state vector on a frame without detection and returns the predicted bounding
+    box estimate. Unlike predict(), the age, hit streak and time since update are kept.
+    """
+    if((self.kf.x[6]+self.kf.x[2])<=0):
+      self.kf.x[6] *= 0.0
+    self.kf.predict()
+    return convert_x_to_bbox(self.kf.x)
+
   def get_state(self):
     """
     Returns the current bounding box estimate.
@@ -157,63 +190,198 @@ class KalmanBoxTracker(object):
     return convert_x_to_bbox(self.kf.x)
 
 
-def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
+class KalmanBoxBatch(object):
+  """
+  Struct-of-arrays version of KalmanBoxTracker for all tracked objects at once. Made for pyppbox.
+  The states are kept in contiguous (N,7) mean and (N,7,7) covariance arrays, predict and update
+  are batched over all tracks, and dead tracks are removed by compacting the arrays. The filter is
+  the same constant velocity model as KalmanBoxTracker with the same initial values.
+  """
+  F = np.array([[1,0,0,0,1,0,0],[0,1,0,0,0,1,0],[0,0,1,0,0,0,1],[0,0,0,1,0,0,0],
+                [0,0,0,0,1,0,0],[0,0,0,0,0,1,0],[0,0,0,0,0,0,1]], dtype=np.float64)
+  Q = np.diag([1., 1., 1., 1., 0.01, 0.01, 0.0001])
+  R = np.diag([1., 1., 10., 10.])
+  P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])
+
+  def __init__(self):
+    self.x = np.zeros((0, 7))
+    self.P = np.zeros((0, 7, 7))
+    self.ids = np.zeros(0, dtype=int)
+    self.time_since_update = np.zeros(0, dtype=int)
+    self.hits = np.zeros(0, dtype=int)
+    self.hit_streak = np.zeros(0, dtype=int)
+    self.age = np.zeros(0, dtype=int)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def add(self, bboxes):
+    """
+    Initialises new tracks using initial bounding boxes [[x1,y1,x2,y2],...].
+    Returns the indices of the new tracks.
+    """
+    n = len(bboxes)
+    start = len(self.ids)
+    x = np.zeros((n, 7))
+    if n > 0:
+      x[:, :4] = convert_bboxes_to_z(np.asarray(bboxes, dtype=np.float64))
+    self.x = np.concatenate((self.x, x))
+    self.P = np.concatenate((self.P, np.broadcast_to(self.P0, (n, 7, 7))))
+    ids = np.arange(KalmanBoxTracker.count, KalmanBoxTracker.count + n)
+    KalmanBoxTracker.count += n
+    self.ids = np.concatenate((self.ids, ids))
+    zeros = np.zeros(n, dtype=int)
+    self.time_since_update = np.concatenate((self.time_since_update, zeros))
+    self.hits = np.concatenate((self.hits, zeros))
+    self.hit_streak = np.concatenate((self.hit_streak, zeros))
+    self.age = np.concatenate((self.age, zeros))
+    return np.arange(start, start + n)
+
+  def __advance__(self):
+    self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] = 0.
+    self.x = self.x @ self.F.T
+    self.P = self.F @ self.P @ self.F.T + self.Q
+
+  def predict(self):
+    """
+    Advances all state vectors and returns the predicted bounding boxes (N,4).
+    """
+    self.__advance__()
+    self.age += 1
+    self.hit_streak[self.time_since_update > 0] = 0
+    self.time_since_update += 1
+    return self.get_state()
+
+  def coast(self):
+    """
+    Advances all state vectors on a frame without detection and returns the predicted bounding
+    boxes (N,4). Unlike predict(), the ages, hit streaks and times since update are kept.
+    """
+    self.__advance__()
+    return self.get_state()
+
+  def update(self, indices, bboxes):
+    """
+    Updates the state vectors of the tracks at indices with observed bboxes [[x1,y1,x2,y2],...].
+    """
+    indices = np.asarray(indices, dtype=int)
+    if len(indices) == 0:
+      return
+    self.time_since_update[indices] = 0
+    self.hits[indices] += 1
+    self.hit_streak[indices] += 1
+    x = self.x[indices]
+    P = self.P[indices]
+    y = convert_bboxes_to_z(np.asarray(bboxes, dtype=np.float64)) - x[:, :4]
+    PHT = P[:, :, :4]
+    S = P[:, :4, :4] + self.R
+    K = PHT @ np.linalg.inv(S)
+    self.x[indices] = x + (K @ y[:, :, None])[:, :, 0]
+    # Joseph form like filterpy
+    I_KH = np.broadcast_to(np.eye(7), P.shape).copy()
+    I_KH[:, :, :4] -= K
+    self.P[indices] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ self.R @ K.transpose(0, 2, 1)
+
+  def get_state(self):
+    """
+    Returns the current bounding box estimates (N,4).
+    """
+    return convert_x_to_bboxes(self.x)
+
+  def compact(self, keep):
+    """
+    Keeps only the tracks where the boolean mask keep is True.
+    """
+    self.x = self.x[keep]
+    self.P = self.P[keep]
+    self.ids = self.ids[keep]
+    self.time_since_update = self.time_since_update[keep]
+    self.hits = self.hits[keep]
+    self.hit_streak = self.hit_streak[keep]
+    self.age = self.age[keep]
+
+
+def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3, solver="auto",
+                                     grid_min_pairs=np.inf):
   """
   Assigns detections to tracked object (both represented as bounding boxes)
+  Only the overlapping pairs are candidates of the assignment, made for pyppbox. When there are at
+  least grid_min_pairs detection-tracker pairs, the overlapping pairs are found by a grid index
+  instead of the full IOU matrix.
 
   Returns 3 lists of matches, unmatched_detections and unmatched_trackers
   """
   if len(trackers) == 0:
     return np.empty((0,2),dtype=int), np.arange(len(detections)), np.empty((0,5),dtype=int)
 
-  iou_matrix = iou_batch(detections, trackers)
-
-  if min(iou_matrix.shape) > 0:
-    a = (iou_matrix > iou_threshold).astype(np.int32)
-    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
-        matched_indices = np.stack(np.where(a), axis=1)
+  if len(detections) * len(trackers) >= grid_min_pairs:
+    rows, cols = overlapPairs(detections, trackers)
+    ious = pairIoU(detections, trackers, rows, cols)
+    above = ious > iou_threshold
+    if (above.any() and np.bincount(rows[above]).max() == 1 and 
+        np.bincount(cols[above]).max() == 1):
+      matched_indices = np.stack((rows[above], cols[above]), axis=1)
     else:
-      matched_indices = linear_assignment(-iou_matrix)
+      matched_indices = np.stack(sparseAssignment(len(detections), len(trackers), rows, cols, -ious,
+                                                  cost_limit=0., solver=solver), axis=1)
+    matched_indices = np.asarray(matched_indices, dtype=int).reshape(-1, 2)
+    matched_iou = pairIoU(detections, trackers, matched_indices[:,0], matched_indices[:,1])
   else:
-    matched_indices = np.empty(shape=(0,2))
+    iou_matrix = iou_batch(detections, trackers)
+
+    if min(iou_matrix.shape) > 0:
+      a = (iou_matrix > iou_threshold).astype(np.int32)
+      if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+          matched_indices = np.stack(np.where(a), axis=1)
+      else:
+        matched_indices = linear_assignment(-iou_matrix, solver=solver)
+    else:
+      matched_indices = np.empty(shape=(0,2))
 
-  unmatched_detections = []
-  for d, det in enumerate(detections):
-    if(d not in matched_indices[:,0]):
-      unmatched_detections.append(d)
-  unmatched_trackers = []
-  for t, trk in enumerate(trackers):
-    if(t not in matched_indices[:,1]):
-      unmatched_trackers.append(t)
+    matched_indices = np.asarray(matched_indices, dtype=int).reshape(-1, 2)
+    matched_iou = iou_matrix[matched_indices[:,0], matched_indices[:,1]]
+  unmatched_detections = np.setdiff1d(np.arange(len(detections)), matched_indices[:,0]).tolist()
+  unmatched_trackers = np.setdiff1d(np.arange(len(trackers)), matched_indices[:,1]).tolist()
 
   #filter out matched with low IOU
-  matches = []
-  for m in matched_indices:
-    if(iou_matrix[m[0], m[1]]<iou_threshold):
-      unmatched_detections.append(m[0])
-      unmatched_trackers.append(m[1])
-    else:
-      matches.append(m.reshape(1,2))
-  if(len(matches)==0):
-    matches = np.empty((0,2),dtype=int)
-  else:
-    matches = np.concatenate(matches,axis=0)
+  low = matched_iou < iou_threshold
+  unmatched_detections += matched_indices[low,0].tolist()
+  unmatched_trackers += matched_indices[low,1].tolist()
+  matches = matched_indices[~low]
 
-  return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+  return matches, np.array(unmatched_detections, dtype=int), np.array(unmatched_trackers, dtype=int)
 
 
 class Sort(object):
 
-  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3, solver="auto", grid_min_pairs=16384):
     """
     Sets key parameters for SORT
     """
     self.max_age = max_age
     self.min_hits = min_hits
     self.iou_threshold = iou_threshold
-    self.trackers = []
+    self.solver = solver
+    self.grid_min_pairs = grid_min_pairs
+    self.trackers = KalmanBoxBatch()
     self.frame_count = 0
 
+  def __predict__(self):
+    """
+    Advances all trackers, removes the ones with an invalid prediction, and returns the predicted
+    locations in the form [[x1,y1,x2,y2,0],...].
+    """
+    pos = self.trackers.predict()
+    valid = ~np.any(np.isnan(pos), axis=1)
+    if not np.all(valid):
+      self.trackers.compact(valid)
+      pos = pos[valid]
+    return np.concatenate((pos, np.zeros((len(pos), 1))), axis=1)
+
+  def __isConfirmed__(self):
+    return (self.trackers.time_since_update < 1) & \
+           ((self.trackers.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+
   def update(self, dets=np.empty((0, 5))):
     """
     Params:
@@ -225,69 +393,39 @@ class Sort(object):
     """
     self.frame_count += 1
     # get predicted locations from existing trackers.
-    trks = np.zeros((len(self.trackers), 5))
-    to_del = []
-    ret = []
-    for t, trk in enumerate(trks):
-      pos = self.trackers[t].predict()[0]
-      trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
-      if np.any(np.isnan(pos)):
-        to_del.append(t)
-    trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
-    for t in reversed(to_del):
-      self.trackers.pop(t)
-    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets,trks, self.iou_threshold)
+    trks = self.__predict__()
+    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets,trks, self.iou_threshold, self.solver, self.grid_min_pairs)
 
     # update matched trackers with assigned detections
-    for m in matched:
-      self.trackers[m[1]].update(dets[m[0], :])
+    self.trackers.update(matched[:,1], dets[matched[:,0], :])
 
     # create and initialise new trackers for unmatched detections
-    for i in unmatched_dets:
-      trk = KalmanBoxTracker(dets[i,:])
-      self.trackers.append(trk)
-    i = len(self.trackers)
-    for trk in reversed(self.trackers):
-      d = trk.get_state()[0]
-      if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits):
-        ret.append(np.concatenate((d,[trk.id+1])).reshape(1,-1)) # +1 as MOT benchmark requires positive
-      i -= 1
-      # remove dead tracklet
-      if(trk.time_since_update > self.max_age):
-        self.trackers.pop(i)
-    if len(ret) > 0:
-      return np.concatenate(ret)
-    return np.empty((0,5))
+    self.trackers.add(dets[unmatched_dets, :])
+
+    confirmed = self.__isConfirmed__()
+    ret = np.concatenate((self.trackers.get_state()[confirmed], 
+                          self.trackers.ids[confirmed, None] + 1), axis=1)[::-1] # +1 as MOT benchmark requires positive
+    # remove dead tracklet
+    self.trackers.compact(self.trackers.time_since_update <= self.max_age)
+    return ret
 
 
   def update_pyppbox(self, current_people):
     """
-    Similar to update(). Made for pyppbox's Person list.
+    Similar to update(). Made for pyppbox's Person list or PeopleFrame. The people are returned in
+    the order of the matched detections followed by the new tracks.
     """    
     self.frame_count += 1
 
-    people_trackers = []
-    updated_people = []
-
-    dets = np.empty((0, 5))
-    for i in range(0, len(current_people)):
-      row = current_people[i].getDetRS()
-      dets = np.append(dets, row, axis=0)
+    if hasattr(current_people, "getDets"):
+      # pyppbox's PeopleFrame
+      dets = current_people.getDets().astype(np.float64)
+    else:
+      dets = np.array([p.getDet() for p in current_people], dtype=np.float64).reshape(-1, 5)
 
     # get predicted locations from existing trackers.
-    trks = np.zeros((len(self.trackers), 5))
-    to_del = []
-    ret = []
-    for t, trk in enumerate(trks):
-      pos = self.trackers[t].predict()[0]
-      trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
-      if np.any(np.isnan(pos)):
-        to_del.append(t)
-    trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
-    for t in reversed(to_del):
-      self.trackers.pop(t)
-
-    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+    trks = self.__predict__()
+    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold, self.solver, self.grid_min_pairs)
 
     # Example:
     """
@@ -299,34 +437,75 @@ class Sort(object):
     # Meaning: matched[i] = [det_index, track_index]
     """
     # update matched trackers with assigned detections
-    for m in matched:
-      self.trackers[m[1]].update(dets[m[0],:])
-      p = current_people[m[0]]
-      p.cid = self.trackers[m[1]].id
-      # print(p.__print_self__())
-      people_trackers.append([p, m[1]])
+    self.trackers.update(matched[:,1], dets[matched[:,0],:])
 
     # create and initialise new trackers for unmatched detections
-    for u in unmatched_dets:
-      trk = KalmanBoxTracker(dets[u,:])
-      self.trackers.append(trk)
-      if u < len(current_people):
-        p = current_people[u]
-        p.cid = trk.id
-        # print(p.__print_self__())
-        people_trackers.append([p, len(self.trackers) - 1])
-
-    for pp_trk in people_trackers:
-      trk = self.trackers[pp_trk[1]]
-      if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits):
-        updated_people.append(pp_trk[0])
-      # remove dead tracklet
-      if(trk.time_since_update > self.max_age):
-        self.trackers.pop(pp_trk[1])
+    new_trks = self.trackers.add(dets[unmatched_dets,:])
+
+    det_indices = np.concatenate((matched[:,0], unmatched_dets))
+    trk_indices = np.concatenate((matched[:,1], new_trks)).astype(int)
+    confirmed = self.__isConfirmed__()[trk_indices]
+    cids = self.trackers.ids[trk_indices]
+
+    # remove dead tracklet
+    self.trackers.compact(self.trackers.time_since_update <= self.max_age)
 
+    if hasattr(current_people, "select"):
+      current_people.cids[det_indices] = cids
+      return current_people.select(det_indices[confirmed])
+
+    updated_people = []
+    for d, cid, ok in zip(det_indices.tolist(), cids.tolist(), confirmed.tolist()):
+      p = current_people[d]
+      p.cid = cid
+      if ok:
+        updated_people.append(p)
     return updated_people
 
 
+  def coast_pyppbox(self):
+    """
+    Advances all trackers on a frame without detection. Made for pyppbox.
+    Returns a dictionary of {tracker id: predicted [x1,y1,x2,y2]}.
+    """
+    pos = self.trackers.coast()
+    valid = ~np.any(np.isnan(pos), axis=1)
+    return dict(zip(self.trackers.ids[valid].tolist(), pos[valid]))
+
+
+  def get_state_pyppbox(self):
+    """
+    Returns a copy of the tracker state as a dictionary of numpy arrays. Made for pyppbox.
+    """
+    return {'x': self.trackers.x.copy(),
+            'P': self.trackers.P.copy(),
+            'ids': self.trackers.ids.copy(),
+            'time_since_update': self.trackers.time_since_update.copy(),
+            'hits': self.trackers.hits.copy(),
+            'hit_streak': self.trackers.hit_streak.copy(),
+            'age': self.trackers.age.copy(),
+            'frame_count': np.array(self.frame_count),
+            'next_id': np.array(KalmanBoxTracker.count)}
+
+
+  def set_state_pyppbox(self, state):
+    """
+    Restores a tracker state given by get_state_pyppbox(). Made for pyppbox.
+    The shared id counter is moved forward so that the new tracks never reuse a restored id.
+    """
+    trackers = KalmanBoxBatch()
+    trackers.x = np.array(state['x'], dtype=np.float64).reshape(-1, 7)
+    trackers.P = np.array(state['P'], dtype=np.float64).reshape(-1, 7, 7)
+    trackers.ids = np.array(state['ids'], dtype=int)
+    trackers.time_since_update = np.array(state['time_since_update'], dtype=int)
+    trackers.hits = np.array(state['hits'], dtype=int)
+    trackers.hit_streak = np.array(state['hit_streak'], dtype=int)
+    trackers.age = np.array(state['age'], dtype=int)
+    self.trackers = trackers
+    self.frame_count = int(state['frame_count'])
+    KalmanBoxTracker.count = max(KalmanBoxTracker.count, int(state['next_id']))
+
+
 def parse_args():
     """Parse input arguments."""
     parser = argparse.ArgumentParser(description='SORT demo')
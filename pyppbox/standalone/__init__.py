@@ -24,6 +24,8 @@ Standalone is designed for easy detect, track, and reid people in a single threa
 enviroment or in command line. 
 
 For multithreading application, see :py:class:`pyppbox.standalone.mt.MT`.
+For pipelining the detect, track, and reid stages of a video stream, see 
+:py:class:`pyppbox.standalone.pipeline.MTPipeline`.
 
 Example:
 
@@ -68,6 +70,7 @@ Example:
 
 
 from .mt import MT
+from .pipeline import MTPipeline
 
 __stdmt__ = MT()
 
@@ -91,6 +94,11 @@ def setMainDetector(detector=""):
     """See :func:`pyppbox.standalone.mt.MT.setMainDetector`"""
     __stdmt__.setMainDetector(detector=detector)
 
+def setDetectionInterval(interval=1, adaptive=False, max_interval=8, motion_threshold=0.02):
+    """See :func:`pyppbox.standalone.mt.MT.setDetectionInterval`"""
+    __stdmt__.setDetectionInterval(interval=interval, adaptive=adaptive, 
+                                   max_interval=max_interval, motion_threshold=motion_threshold)
+
 def detectPeople(img, 
                  img_is_mat=False, 
                  visual=False, 
@@ -98,7 +106,8 @@ def detectPeople(img,
                  save_file="", 
                  min_width_filter=35, 
                  alt_repspoint=False, 
-                 alt_repspoint_top=True):
+                 alt_repspoint_top=True, 
+                 as_frame=False):
     """See :func:`pyppbox.standalone.mt.MT.detectPeople`"""
     return __stdmt__.detectPeople(img, 
                                   img_is_mat=img_is_mat, 
@@ -107,7 +116,24 @@ def detectPeople(img,
                                   save_file=save_file, 
                                   min_width_filter=min_width_filter, 
                                   alt_repspoint=alt_repspoint, 
-                                  alt_repspoint_top=alt_repspoint_top)
+                                  alt_repspoint_top=alt_repspoint_top, 
+                                  as_frame=as_frame)
+
+def detectPeopleBatch(imgs, 
+                      img_is_mat=False, 
+                      visual=False, 
+                      min_width_filter=35, 
+                      alt_repspoint=False, 
+                      alt_repspoint_top=True, 
+                      as_frame=False):
+    """See :func:`pyppbox.standalone.mt.MT.detectPeopleBatch`"""
+    return __stdmt__.detectPeopleBatch(imgs, 
+                                       img_is_mat=img_is_mat, 
+                                       visual=visual, 
+                                       min_width_filter=min_width_filter, 
+                                       alt_repspoint=alt_repspoint, 
+                                       alt_repspoint_top=alt_repspoint_top, 
+                                       as_frame=as_frame)
 
 def setMainTracker(tracker=""):
     """See :func:`pyppbox.standalone.mt.MT.setMainTracker`"""
@@ -121,14 +147,44 @@ def setMainReIDer(reider="", auto_load=True):
     """See :func:`pyppbox.standalone.mt.MT.setMainReIDer`"""
     __stdmt__.setMainReIDer(reider=reider, auto_load=auto_load)
 
-def reidPeople(img, people, deduplicate=True, img_is_mat=False):
+def setReIDCache(enable=True, ttl=30, unknown_ttl=5, decay=0.99, max_size=512, drift_threshold=0.4):
+    """See :func:`pyppbox.standalone.mt.MT.setReIDCache`"""
+    __stdmt__.setReIDCache(enable=enable, ttl=ttl, unknown_ttl=unknown_ttl, decay=decay, 
+                           max_size=max_size, drift_threshold=drift_threshold)
+
+def reidPeople(img, people, deduplicate=True, img_is_mat=False, batch=False):
     """See :func:`pyppbox.standalone.mt.MT.reidPeople`"""
-    return __stdmt__.reidPeople(img, people, deduplicate=deduplicate, img_is_mat=img_is_mat)
+    return __stdmt__.reidPeople(img, people, deduplicate=deduplicate, img_is_mat=img_is_mat, batch=batch)
+
+def getState():
+    """See :func:`pyppbox.standalone.mt.MT.getState`"""
+    return __stdmt__.getState()
+
+def setState(state):
+    """See :func:`pyppbox.standalone.mt.MT.setState`"""
+    __stdmt__.setState(state)
 
-def trainReIDClassifier(reider="Default", train_data="", classifier_pkl=""):
+def setCheckpoint(state_file="", interval=100):
+    """See :func:`pyppbox.standalone.mt.MT.setCheckpoint`"""
+    __stdmt__.setCheckpoint(state_file=state_file, interval=interval)
+
+def trainReIDClassifier(reider="Default", train_data="", classifier_pkl="", use_cache=True):
     """See :func:`pyppbox.standalone.mt.MT.trainReIDClassifier`"""
-    __stdmt__.trainReIDClassifier(reider=reider, train_data=train_data, classifier_pkl=classifier_pkl)
+    __stdmt__.trainReIDClassifier(reider=reider, train_data=train_data, classifier_pkl=classifier_pkl, 
+                                  use_cache=use_cache)
+
+def enrollReIDIdentity(name, imgs, save=True):
+    """See :func:`pyppbox.standalone.mt.MT.enrollReIDIdentity`"""
+    return __stdmt__.enrollReIDIdentity(name, imgs, save=save)
+
+def removeReIDIdentity(name, save=True):
+    """See :func:`pyppbox.standalone.mt.MT.removeReIDIdentity`"""
+    return __stdmt__.removeReIDIdentity(name, save=save)
 
 __all__ = ['setConfigDir', 'setMainModules', 'getConfig', 'forceFullGTMode', 
-           'setMainDetector', 'detectPeople', 'setMainTracker', 'trackPeople', 
-           'setMainReIDer', 'reidPeople', 'trainReIDClassifier', 'MT']
+           'setMainDetector', 'setDetectionInterval', 'detectPeople', 'detectPeopleBatch', 
+           'setMainTracker', 'trackPeople', 
+           'setMainReIDer', 'setReIDCache', 'reidPeople', 'trainReIDClassifier', 
+           'enrollReIDIdentity', 'removeReIDIdentity', 
+           'getState', 'setState', 'setCheckpoint', 
+           'MT', 'MTPipeline']
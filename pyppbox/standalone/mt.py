@@ -24,6 +24,8 @@ from pyppbox.utils.logtools import add_info_log, add_warning_log, add_error_log
 
 # Common
 import cv2
+import threading
+import numpy as np
 from collections import Counter
 
 # Configurations
@@ -31,15 +33,20 @@ from pyppbox.config.configtools import isDictString, getCFGDict
 from pyppbox.config.myconfig import (
     MyConfigurator, NoneCFG,
     DCFGYOLOCLS, DCFGYOLOULT, DCFGGT, 
-    TCFGCentroid, TCFGSORT, TCFGDeepSORT, 
+    TCFGCentroid, TCFGSORT, TCFGDeepSORT, TCFGByteTrack, 
     RCFGFaceNet, RCFGTorchreid, 
 )
 
 # Classes & tools
-from pyppbox.utils.persontools import Person
+from pyppbox.utils.persontools import Person, PeopleFrame, predictPerson
+from pyppbox.utils.croptools import FrameCropper
 from pyppbox.utils.gttools import GTInterpreter
 from pyppbox.utils.evatools import NothingDetecter, NothingTracker, NothingReider, TKOReider
 from pyppbox.utils.commontools import getAbsPathFDS, isExist, getCVMat, getAncestorDir
+from pyppbox.utils.statetools import (nestState, getSubState, getPeopleState, getPeopleFromState, 
+                                      StateWriter)
+from pyppbox.modules.reiders.reidtools import assignUniqueIDs, ReIDCache
+from pyppbox.modules.modelpool import getModelPool
 
 
 __none_cfg__ = NoneCFG()
@@ -102,7 +109,19 @@ class MT(object):
 
     """
 
-    def __init__(self):
+    def __init__(self, share_models=True):
+        """Initialize an :class:`MT` object.
+
+        Parameters
+        ----------
+        share_models : bool, default=True
+            Indicate whether to share the detector and reider models with the other :class:`MT` 
+            objects of the same process through :class:`pyppbox.modules.modelpool.ModelPool`. 
+            A shared model is only loaded once for the same configurations, and its calls are 
+            serialized by a lock. Set :code:`share_models=False` to load private models, e.g. 
+            to run the same model concurrently on multiple GPUs. The trackers are never shared.
+        """
+        self.__share_models__ = share_models
         # config
         self.__cfg__ = MyConfigurator()
         self.__unistrings__ = self.__cfg__.unified_strings
@@ -111,16 +130,65 @@ class MT(object):
         self.__dt_is_set__ = False
         self.__dt_cfg__ = []
         self.__dt__ = []
+        self.__dt_interval__ = 1
+        self.__dt_adaptive__ = False
+        self.__dt_max_interval__ = 1
+        self.__dt_motion_threshold__ = 0.02
+        self.__dt_current_interval__ = 1
+        self.__dt_countdown__ = 0
         # tracker
         self.__tk_is_set__ = False
         self.__tk_cfg__ = []
         self.__tk__ = []
+        self.__tk_cropper__ = FrameCropper()
+        self.__tk_last__ = []
+        self.__tk_keyframe_boxes__ = {}
+        self.__tk_predicted_frames__ = 0
         # reider
         self.__ri_is_set__ = False
         self.__ri_cfg__ = []
         self.__ri__ = []
-        self.__deepidlistTMP__ = []
-        self.__faceidlistTMP__ = []
+        self.__ri_cropper__ = FrameCropper()
+        self.__probaTMP__ = {}
+        self.__probaByCID__ = {}
+        self.__reidTMP__ = set()
+        self.__ri_cache__ = None
+        self.__ri_classes_version__ = None
+        # state
+        # Serializes trackPeople(), reidPeople(), getState() and setState(), which share the 
+        # tracked people, the kept probability vectors and the ReID cache across threads
+        self.__state_lock__ = threading.RLock()
+        # Guards the tracked people and the detection interval read by detectPeople(), always 
+        # taken after __state_lock__, so a skipped frame does not wait for reidPeople()
+        self.__tk_lock__ = threading.RLock()
+        self.__st_writer__ = None
+        self.__st_interval__ = 100
+        self.__st_count__ = 0
+
+
+    ###########################################
+    # Model pool
+    ###########################################
+
+    def __newModel__(self, model_class, cfg, variant=None, **kwargs):
+        if self.__share_models__:
+            return getModelPool().acquire(model_class, cfg, variant=variant, **kwargs)
+        return model_class(cfg, **kwargs)
+
+    def __newReIDer__(self, model_class, auto_load):
+        # The reiders with and without their classifier are separate shared models
+        return self.__newModel__(model_class, self.__ri_cfg__, 
+                                 variant={'auto_load': bool(auto_load)}, auto_load=auto_load)
+
+    def __loadReIDClassifier__(self):
+        # Load the classifier of the main reider on first use, a shared reider is replaced by 
+        # the shared reider with its classifier instead of being changed for the other MTs
+        if self.__ri__.auto_load: return
+        if self.__share_models__:
+            self.__ri__ = self.__newReIDer__(self.__ri__.__class__, True)
+        else:
+            self.__ri__.load_classifier()
+            self.__ri__.auto_load = True
 
 
     ###########################################
@@ -287,12 +355,12 @@ class MT(object):
             if self.__cfg__.mcfg.detector.lower() == self.__unistrings__.yolo_cls:
                 from pyppbox.modules.detectors.yolocls import MyYOLOCLS
                 self.__dt_cfg__ = self.__cfg__.dcfg_yolocs
-                self.__dt__ = MyYOLOCLS(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOCLS, self.__dt_cfg__)
                 self.__dt_is_set__ = True
             elif self.__cfg__.mcfg.detector.lower() == self.__unistrings__.yolo_ult:
                 from pyppbox.modules.detectors.yoloult import MyYOLOULT
                 self.__dt_cfg__ = self.__cfg__.dcfg_yolout
-                self.__dt__ = MyYOLOULT(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOULT, self.__dt_cfg__)
                 self.__dt_is_set__ = True
             elif self.__cfg__.mcfg.detector.lower() == self.__unistrings__.gt:
                 self.__dt_cfg__ = self.__cfg__.dcfg_gt
@@ -313,14 +381,14 @@ class MT(object):
                 from pyppbox.modules.detectors.yolocls import MyYOLOCLS
                 self.__dt_cfg__ = DCFGYOLOCLS()
                 self.__dt_cfg__.set(detector_dict)
-                self.__dt__ = MyYOLOCLS(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOCLS, self.__dt_cfg__)
                 self.__dt_is_set__ = True
                 add_info_log("---PYPPBOX : Set detector='" + self.__dt_cfg__.dt_name + "'")
             elif detector_dict['dt_name'].lower() == self.__unistrings__.yolo_ult:
                 from pyppbox.modules.detectors.yoloult import MyYOLOULT
                 self.__dt_cfg__ = DCFGYOLOULT()
                 self.__dt_cfg__.set(detector_dict)
-                self.__dt__ = MyYOLOULT(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOULT, self.__dt_cfg__)
                 self.__dt_is_set__ = True
                 add_info_log("---PYPPBOX : Set detector='" + self.__dt_cfg__.dt_name + "'")
             elif detector_dict['dt_name'].lower() == self.__unistrings__.gt:
@@ -380,7 +448,7 @@ class MT(object):
                 if not self.__cfg_is_set__: self.setConfigDir()
                 self.__cfg__.setAllDCFG()
                 self.__dt_cfg__ = self.__cfg__.dcfg_yolocs
-                self.__dt__ = MyYOLOCLS(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOCLS, self.__dt_cfg__)
                 self.__dt_is_set__ = True
                 add_info_log("---PYPPBOX : Set detector='" + str(detector) + "'")
             elif detector.lower() == self.__unistrings__.yolo_ult:
@@ -388,7 +456,7 @@ class MT(object):
                 if not self.__cfg_is_set__: self.setConfigDir()
                 self.__cfg__.setAllDCFG()
                 self.__dt_cfg__ = self.__cfg__.dcfg_yolout
-                self.__dt__ = MyYOLOULT(self.__dt_cfg__)
+                self.__dt__ = self.__newModel__(MyYOLOULT, self.__dt_cfg__)
                 self.__dt_is_set__ = True
                 add_info_log("---PYPPBOX : Set detector='" + str(detector) + "'")
             elif detector.lower() == self.__unistrings__.gt:
@@ -409,6 +477,76 @@ class MT(object):
         else:
             add_warning_log("---PYPPBOX : detector='" + str(detector) + "' is not recognized.")
 
+    def setDetectionInterval(self, interval=1, adaptive=False, max_interval=8, motion_threshold=0.02):
+        """Set how often the main detector runs. On the frames between two detections, 
+        :func:`detectPeople()` skips the detector and :func:`trackPeople()` predicts the people 
+        of the last frame using the motion model of the main tracker, i.e. the Kalman filters of 
+        SORT and DeepSORT or the constant velocity of Centroid. The predicted people are flagged 
+        with :code:`predicted=True`. The detection interval only applies to YOLO Classic and YOLO 
+        Ultralytics with a main tracker other than "None", and the detector always runs while 
+        nobody is tracked.
+
+        Parameters
+        ----------
+        interval : int, default=1
+            Run the detector once every :obj:`interval` frames. :code:`interval=1` runs the 
+            detector on every frame.
+        adaptive : bool, default=False
+            Set :code:`adaptive=True` to adapt the interval between :obj:`interval` and 
+            :obj:`max_interval`. The interval grows by 1 after each detection on which the 
+            tracked people are the same as on the previous detection and their motion is 
+            within :obj:`motion_threshold`; otherwise, it is halved.
+        max_interval : int, default=8
+            Maximum interval of the adaptive mode.
+        motion_threshold : float, default=0.02
+            Maximum motion per frame of the adaptive mode, which is the largest displacement of 
+            the bounding box centres divided by the bounding box heights.
+        """
+        if int(interval) < 1 or (adaptive and int(max_interval) < int(interval)):
+            msg = ("PYPPBOX : setDetectionInterval() -> interval='" + str(interval) + 
+                   "' or max_interval='" + str(max_interval) + "' is not valid.")
+            add_error_log(msg)
+            raise ValueError(msg)
+        self.__dt_interval__ = int(interval)
+        self.__dt_adaptive__ = adaptive
+        self.__dt_max_interval__ = int(max_interval) if adaptive else int(interval)
+        self.__dt_motion_threshold__ = motion_threshold
+        self.__dt_current_interval__ = int(interval)
+        self.__dt_countdown__ = 0
+
+    def __usesDetectionInterval__(self):
+        return self.__dt_max_interval__ > 1
+
+    def __isPredictedFrame__(self):
+        if (self.__dt_max_interval__ <= 1 or 
+            not self.__tk_is_set__ or 
+            not hasattr(self.__tk__, "predict") or 
+            len(self.__tk_last__) == 0 or 
+            (self.__dt_cfg__.dt_name.lower() != self.__unistrings__.yolo_cls and 
+             self.__dt_cfg__.dt_name.lower() != self.__unistrings__.yolo_ult)):
+            self.__dt_countdown__ = 0
+            return False
+        if self.__dt_countdown__ > 0:
+            self.__dt_countdown__ -= 1
+            return True
+        self.__dt_countdown__ = self.__dt_current_interval__ - 1
+        return False
+
+    def __getPredictedPeople__(self):
+        # The last tracked people flagged as predicted on a skipped frame, otherwise None
+        with self.__tk_lock__:
+            if not self.__isPredictedFrame__(): return None
+            if isinstance(self.__tk_last__, PeopleFrame):
+                return self.__tk_last__.predict(self.__tk_last__.boxes_xyxy)
+            return [predictPerson(p, p.box_xyxy) for p in self.__tk_last__]
+
+    def __getDetectorConf__(self):
+        # ByteTrack associates the people between low_thresh and track_thresh in its second 
+        # stage, so the detector keeps them for ByteTrack, otherwise its own conf applies
+        if self.__tk_is_set__ and self.__tk_cfg__.tk_name.lower() == self.__unistrings__.bytetrack:
+            return min(float(self.__dt_cfg__.conf), float(self.__tk_cfg__.low_thresh))
+        return None
+
     def detectPeople(self, 
                      img, 
                      img_is_mat=False, 
@@ -417,7 +555,8 @@ class MT(object):
                      save_file="", 
                      min_width_filter=35,
                      alt_repspoint=False, 
-                     alt_repspoint_top=True): 
+                     alt_repspoint_top=True, 
+                     as_frame=False): 
         """Detect people by giving an image. :func:`setConfigDir()` or :func:`setMainDetector()` must 
         be called in advance.
 
@@ -440,27 +579,46 @@ class MT(object):
             An indication of whether to use the alternative :meth:`findRepspointBB`.
         alt_repspoint_top : bool, default=True
             A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            Decide whether to return the detected people as a :class:`PeopleFrame` instead of 
+            a list of :class:`Person`, which is accepted by :func:`trackPeople()`, 
+            :func:`reidPeople()`, :class:`ResIO`, and :func:`visualizePeople()` without any 
+            per-person conversion.
         
+        Note: On a frame skipped by :func:`setDetectionInterval()`, the detector does not run and 
+        the returned people are the last tracked people flagged with :code:`predicted=True`, which 
+        tell :func:`trackPeople()` to predict them using the motion model of the main tracker. 
+        If the main tracker is ByteTrack, YOLO Classic and YOLO Ultralytics detect with their 
+        :obj:`conf` lowered to :obj:`low_thresh` of ByteTrack, so the people with low detection 
+        confidences are given to its second association stage.
+
         Returns
         -------
-        list[Person, ...]
-            A  list of :class:`Person` object.
+        list[Person, ...] or PeopleFrame
+            A  list of :class:`Person` object, or a :class:`PeopleFrame` if :code:`as_frame=True`.
         Mat
             A cv :obj:`Mat` image.
         """ 
-        people = []
+        people = PeopleFrame() if as_frame else []
         if self.__dt_is_set__: 
             if not isinstance(self.__dt__, NothingDetecter):
                 if not img_is_mat: img = getCVMat(img)
-                if (self.__dt_cfg__.dt_name.lower() == self.__unistrings__.yolo_cls or 
+                predicted = self.__getPredictedPeople__()
+                if predicted is not None:
+                    people = predicted
+                elif (self.__dt_cfg__.dt_name.lower() == self.__unistrings__.yolo_cls or 
                     self.__dt_cfg__.dt_name.lower() == self.__unistrings__.yolo_ult):
                     people, img = self.__dt__.detectPeople(img, 
                                                            visual=visual, 
                                                            min_width_filter=min_width_filter, 
                                                            alt_repspoint=alt_repspoint, 
-                                                           alt_repspoint_top=alt_repspoint_top)
+                                                           alt_repspoint_top=alt_repspoint_top, 
+                                                           as_frame=as_frame, 
+                                                           conf=self.__getDetectorConf__())
                 elif self.__dt_cfg__.dt_name.lower() == self.__unistrings__.gt:
                     people, img = self.__dt__.getPeople(img, visual=visual)
+                if as_frame: people = PeopleFrame.fromPeople(people)
+                elif isinstance(people, PeopleFrame): people = people.toPeople()
                 if save:
                     if isExist(getAncestorDir(str(save_file))):
                         filename = getAbsPathFDS(str(save_file))
@@ -474,6 +632,73 @@ class MT(object):
             add_warning_log("---PYPPBOX : detectPeople() -> The main detector is not set.")
         return people, img
 
+    def detectPeopleBatch(self, 
+                          imgs, 
+                          img_is_mat=False, 
+                          visual=False, 
+                          min_width_filter=35,
+                          alt_repspoint=False, 
+                          alt_repspoint_top=True, 
+                          as_frame=False): 
+        """Detect people in multiple images at once, e.g. the current frames of multiple streams or 
+        a chunk of an offline video. YOLO Classic and YOLO Ultralytics run a single batched inference 
+        on all images, and the people of each image are the same as :func:`detectPeople()`. 
+        :func:`setConfigDir()` or :func:`setMainDetector()` must be called in advance. 
+
+        Note: :func:`setDetectionInterval()` does not apply to :func:`detectPeopleBatch()`. The 
+        :obj:`conf` of the detector is lowered for ByteTrack like :func:`detectPeople()`.
+
+        Parameters
+        ----------
+        imgs : list[str or Mat, ...]
+            Set a list of image files or cv :obj:`Mat`.
+        img_is_mat : bool, default=False
+            Speed up the function by telling whether all :obj:`imgs` are cv :obj:`Mat`.
+        visual : bool, default=False
+            Decide whether to visualize like drawing bounding boxes and keypoints to the 
+            return :obj:`imgs`.
+        min_width_filter : int, default=35
+            Mininum width filter of a detected person.
+        alt_repspoint : bool, default=False
+            An indication of whether to use the alternative :meth:`findRepspointBB`.
+        alt_repspoint_top : bool, default=True
+            A parameter passed to :obj:`prefer_top` of :meth:`findRepspointBB`.
+        as_frame : bool, default=False
+            Decide whether to return the detected people of each image as a :class:`PeopleFrame`.
+        
+        Returns
+        -------
+        list[list[Person, ...] or PeopleFrame, ...]
+            A list of :class:`Person` object lists, or :class:`PeopleFrame` objects if 
+            :code:`as_frame=True`, one per image.
+        list[Mat, ...]
+            A list of cv :obj:`Mat` images.
+        """ 
+        people_list = []
+        img_list = []
+        if self.__dt_is_set__: 
+            if not img_is_mat: imgs = [getCVMat(img) for img in imgs]
+            img_list = list(imgs)
+            if isinstance(self.__dt__, NothingDetecter):
+                people_list = [[] for _ in img_list]
+            elif (self.__dt_cfg__.dt_name.lower() == self.__unistrings__.yolo_cls or 
+                  self.__dt_cfg__.dt_name.lower() == self.__unistrings__.yolo_ult):
+                people_list, img_list = self.__dt__.detectPeopleBatch(img_list, 
+                                                                      visual=visual, 
+                                                                      min_width_filter=min_width_filter, 
+                                                                      alt_repspoint=alt_repspoint, 
+                                                                      alt_repspoint_top=alt_repspoint_top, 
+                                                                      as_frame=as_frame, 
+                                                                      conf=self.__getDetectorConf__())
+            elif self.__dt_cfg__.dt_name.lower() == self.__unistrings__.gt:
+                for i in range(0, len(img_list)):
+                    people, img_list[i] = self.__dt__.getPeople(img_list[i], visual=visual)
+                    people_list.append(people)
+            if as_frame: people_list = [PeopleFrame.fromPeople(people) for people in people_list]
+        else:
+            add_warning_log("---PYPPBOX : detectPeopleBatch() -> The main detector is not set.")
+        return people_list, img_list
+
 
     ###########################################
     # Tracker
@@ -499,6 +724,12 @@ class MT(object):
                 self.__tk__ = MyDeepSORT(self.__tk_cfg__)
                 self.__tk_is_set__ = True
                 self.__setGTDTOnly__()
+            elif self.__cfg__.mcfg.tracker.lower() == self.__unistrings__.bytetrack:
+                from pyppbox.modules.trackers.bytetrack import MyByteTrack
+                self.__tk_cfg__ = self.__cfg__.tcfg_bytetrack
+                self.__tk__ = MyByteTrack(self.__tk_cfg__)
+                self.__tk_is_set__ = True
+                self.__setGTDTOnly__()
             elif self.__cfg__.mcfg.tracker.lower() == self.__unistrings__.none:
                 self.__tk_cfg__ = __none_cfg__
                 self.__tk__ = NothingTracker()
@@ -533,6 +764,14 @@ class MT(object):
                 self.__tk_is_set__ = True
                 self.__setGTDTOnly__()
                 add_info_log("---PYPPBOX : Set tracker='" + self.__tk_cfg__.tk_name + "'")
+            elif tracker_dict['tk_name'].lower() == self.__unistrings__.bytetrack:
+                from pyppbox.modules.trackers.bytetrack import MyByteTrack
+                self.__tk_cfg__ = TCFGByteTrack()
+                self.__tk_cfg__.set(tracker_dict)
+                self.__tk__ = MyByteTrack(self.__tk_cfg__)
+                self.__tk_is_set__ = True
+                self.__setGTDTOnly__()
+                add_info_log("---PYPPBOX : Set tracker='" + self.__tk_cfg__.tk_name + "'")
             elif tracker_dict['tk_name'].lower() == self.__unistrings__.none:
                 self.__tk_cfg__ = __none_cfg__
                 self.__tk__ = NothingTracker()
@@ -565,6 +804,11 @@ class MT(object):
         """
         self.__tk_is_set__ = False
         self.__tk__ = []
+        self.__tk_last__ = []
+        self.__tk_keyframe_boxes__ = {}
+        self.__tk_predicted_frames__ = 0
+        self.__probaByCID__ = {}
+        if self.__ri_cache__ is not None: self.__ri_cache__.clear()
         if isinstance(tracker, dict):
             self.__setCustomTracker__(tracker)
         elif isinstance(tracker, str):
@@ -602,6 +846,15 @@ class MT(object):
                 self.__tk_is_set__ = True
                 self.__setGTDTOnly__()
                 add_info_log("---PYPPBOX : Set tracker='" + str(tracker) + "'")
+            elif tracker.lower() == self.__unistrings__.bytetrack:
+                from pyppbox.modules.trackers.bytetrack import MyByteTrack
+                if not self.__cfg_is_set__: self.setConfigDir()
+                self.__cfg__.setAllTCFG()
+                self.__tk_cfg__ = self.__cfg__.tcfg_bytetrack
+                self.__tk__ = MyByteTrack(self.__tk_cfg__)
+                self.__tk_is_set__ = True
+                self.__setGTDTOnly__()
+                add_info_log("---PYPPBOX : Set tracker='" + str(tracker) + "'")
             elif tracker.lower() == self.__unistrings__.none:
                 if not self.__cfg_is_set__: self.setConfigDir()
                 self.__cfg__.setAllTCFG()
@@ -620,28 +873,88 @@ class MT(object):
         ----------
         img : str or Mat
             Set an image file or a cv :obj:`Mat`.
-        people : list[Person, ...]
-            Set a list of :class:`Person` object which stores the detected people in the input :obj:`img`.
+        people : list[Person, ...] or PeopleFrame
+            Set a list of :class:`Person` object or a :class:`PeopleFrame` which stores the detected 
+            people in the input :obj:`img`.
         img_is_mat : bool, default=False
             Speed up the function by telling whether the :obj:`img` is cv :obj:`Mat`.
         
+        Note: If all people are flagged with :code:`predicted=True`, which is the output of 
+        :func:`detectPeople()` on a frame skipped by :func:`setDetectionInterval()`, the tracker 
+        is not updated and the people of the last frame are predicted by its motion model instead.
+
         Returns
         -------
-        list[Person, ...]
-            A list of :class:`Person` object which stores people with updated IDs.
+        list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object, or a :class:`PeopleFrame` if :obj:`people` is a 
+            :class:`PeopleFrame`, which stores people with updated IDs.
         """
-        res = []
-        if self.__tk_is_set__: 
-            if isinstance(people, list):
-                if not img_is_mat: img = getCVMat(img)
-                res = self.__tk__.update(people, img=img)
+        with self.__state_lock__, self.__tk_lock__:
+            res = []
+            if self.__tk_is_set__: 
+                if isinstance(people, (list, PeopleFrame)):
+                    if not img_is_mat: img = getCVMat(img)
+                    if isinstance(people, PeopleFrame): predicted = bool(np.all(people.predicted))
+                    else: predicted = all(getattr(p, "predicted", False) for p in people)
+                    if len(people) > 0 and hasattr(self.__tk__, "predict") and predicted:
+                        res = self.__tk__.predict(img=img)
+                        self.__tk_predicted_frames__ += 1
+                    else:
+                        if self.__tk_cfg__.tk_name.lower() == self.__unistrings__.deepsort:
+                            self.__bindTrackerEncoder__()
+                            self.__tk_cropper__.reset()
+                            res = self.__tk__.update(people, img=img, cropper=self.__tk_cropper__)
+                        else:
+                            res = self.__tk__.update(people, img=img)
+                        self.__updateDetectionInterval__(res)
+                    self.__tk_last__ = res
+                    self.__writeCheckpoint__()
+                else:
+                    msg = "PYPPBOX : trackPeople() -> Input 'people' is not correct."
+                    add_error_log(msg)
+                    raise ValueError(msg)
             else:
-                msg = "PYPPBOX : trackPeople() -> Input 'people' is not correct."
-                add_error_log(msg)
-                raise ValueError(msg)
+                add_warning_log("---PYPPBOX : trackPeople() -> The main tracker is not set.")
+            return res
+
+    def __bindTrackerEncoder__(self):
+        # DeepSORT configured with encoder 'Torchreid' reuses the Torchreid reider, so the 
+        # features of a frame are computed once and shared with reidPeople()
+        if not self.__tk__.usesTorchreid(self.__tk_cfg__): return
+        from pyppbox.modules.trackers.deepsort.encoders import TorchreidEncoder
+        encoder = self.__tk__.encoder
+        if self.__ri_is_set__ and self.__ri_cfg__.ri_name.lower() == self.__unistrings__.torchreid:
+            if encoder is None or getattr(encoder, "reider", None) is not self.__ri__:
+                self.__tk__.setEncoder(TorchreidEncoder(self.__ri__, self.__ri_cfg__.model_wh))
+        elif encoder is None:
+            from pyppbox.modules.reiders.torchreid import MyTorchreid
+            if not hasattr(self.__cfg__, "rcfg_torchreid"): self.__cfg__.setAllRCFG()
+            reider = self.__newModel__(MyTorchreid, self.__cfg__.rcfg_torchreid, 
+                                       variant={'auto_load': False}, auto_load=False)
+            self.__tk__.setEncoder(TorchreidEncoder(reider, self.__cfg__.rcfg_torchreid.model_wh))
+
+    def __updateDetectionInterval__(self, people):
+        if isinstance(people, PeopleFrame):
+            boxes = dict(zip(people.cids.tolist(), people.boxes_xyxy.astype(np.float64)))
         else:
-            add_warning_log("---PYPPBOX : trackPeople() -> The main tracker is not set.")
-        return res
+            boxes = {p.cid: np.asarray(p.box_xyxy, dtype=np.float64) for p in people}
+        if self.__dt_adaptive__:
+            last = self.__tk_keyframe_boxes__
+            stable = len(boxes) > 0 and boxes.keys() == last.keys()
+            if stable:
+                frames = self.__tk_predicted_frames__ + 1
+                motion = max([np.abs((boxes[cid][:2] + boxes[cid][2:]) - 
+                                     (last[cid][:2] + last[cid][2:])).max() / 2.0 / 
+                              max(last[cid][3] - last[cid][1], 1.0) for cid in boxes]) / frames
+                stable = motion <= self.__dt_motion_threshold__
+            if stable:
+                self.__dt_current_interval__ = min(self.__dt_current_interval__ + 1, 
+                                                   self.__dt_max_interval__)
+            else:
+                self.__dt_current_interval__ = max(self.__dt_current_interval__ // 2, 
+                                                   self.__dt_interval__)
+        self.__tk_keyframe_boxes__ = boxes
+        self.__tk_predicted_frames__ = 0
 
 
     ###########################################
@@ -653,13 +966,13 @@ class MT(object):
             if self.__cfg__.mcfg.reider.lower() == self.__unistrings__.facenet:
                 from pyppbox.modules.reiders.facenet import MyFaceNet
                 self.__ri_cfg__ = self.__cfg__.rcfg_facenet
-                self.__ri__ = MyFaceNet(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyFaceNet, auto_load)
                 self.__ri_is_set__ = True
                 self.__setGTDTOnly__()
             elif self.__cfg__.mcfg.reider.lower() == self.__unistrings__.torchreid:
                 from pyppbox.modules.reiders.torchreid import MyTorchreid
                 self.__ri_cfg__ = self.__cfg__.rcfg_torchreid
-                self.__ri__ = MyTorchreid(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyTorchreid, auto_load)
                 self.__ri_is_set__ = True
                 self.__setGTDTOnly__()
             elif self.__cfg__.mcfg.reider.lower() == self.__unistrings__.none:
@@ -681,7 +994,7 @@ class MT(object):
                 from pyppbox.modules.reiders.facenet import MyFaceNet
                 self.__ri_cfg__ = RCFGFaceNet()
                 self.__ri_cfg__.set(reider_dict)
-                self.__ri__ = MyFaceNet(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyFaceNet, auto_load)
                 self.__ri_is_set__ = True
                 add_info_log("---PYPPBOX : Set reider='" + self.__ri_cfg__.ri_name + "'")
                 self.__setGTDTOnly__()
@@ -689,7 +1002,7 @@ class MT(object):
                 from pyppbox.modules.reiders.torchreid import MyTorchreid
                 self.__ri_cfg__ = RCFGTorchreid()
                 self.__ri_cfg__.set(reider_dict)
-                self.__ri__ = MyTorchreid(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyTorchreid, auto_load)
                 self.__ri_is_set__ = True
                 add_info_log("---PYPPBOX : Set reider='" + self.__ri_cfg__.ri_name + "'")
                 self.__setGTDTOnly__()
@@ -741,6 +1054,9 @@ class MT(object):
         """
         self.__ri_is_set__ = False
         self.__ri__ = []
+        self.__probaByCID__ = {}
+        self.__ri_classes_version__ = None
+        if self.__ri_cache__ is not None: self.__ri_cache__.clear()
         if isinstance(reider, dict):
             self.__setCustomReIDer__(reider, auto_load)
         elif isinstance(reider, str):
@@ -756,7 +1072,7 @@ class MT(object):
                 if not self.__cfg_is_set__: self.setConfigDir()
                 self.__cfg__.setAllRCFG()
                 self.__ri_cfg__ = self.__cfg__.rcfg_facenet
-                self.__ri__ = MyFaceNet(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyFaceNet, auto_load)
                 self.__ri_is_set__ = True
                 add_info_log("---PYPPBOX : Set reider='" + str(reider) + "'")
                 self.__setGTDTOnly__()
@@ -765,7 +1081,7 @@ class MT(object):
                 if not self.__cfg_is_set__: self.setConfigDir()
                 self.__cfg__.setAllRCFG()
                 self.__ri_cfg__ = self.__cfg__.rcfg_torchreid
-                self.__ri__ = MyTorchreid(self.__ri_cfg__, auto_load=auto_load)
+                self.__ri__ = self.__newReIDer__(MyTorchreid, auto_load)
                 self.__ri_is_set__ = True
                 add_info_log("---PYPPBOX : Set reider='" + str(reider) + "'")
                 self.__setGTDTOnly__()
@@ -784,7 +1100,50 @@ class MT(object):
         else:
             add_warning_log("---PYPPBOX : reider='" + str(reider) + "' is not valid")
 
-    def reidPeople(self, img, people, deduplicate=True, img_is_mat=False):
+    def setReIDCache(self, 
+                     enable=True, 
+                     ttl=30, 
+                     unknown_ttl=5, 
+                     decay=0.99, 
+                     max_size=512, 
+                     drift_threshold=0.4):
+        """Enable or disable the per-track ReID cache of :func:`reidPeople()`. Once enabled, the 
+        result of each track :attr:`cid` is cached, and a tracked person is only re-identified 
+        again when the track is new, when the cached result is older than :obj:`ttl` frames 
+        (:obj:`unknown_ttl` for an unknown result), when the cached confidence has decayed below 
+        the :obj:`min_confidence` of the main reider (:obj:`min_similarity` with 
+        :code:`classifier: Gallery`), or when the colour histogram of the body crop has drifted 
+        beyond :obj:`drift_threshold`, e.g. after an ID switch of the tracker. 
+        The cache is only used with a main tracker other than "None", and it is cleared whenever 
+        the main tracker or the main reider is set. See 
+        :class:`pyppbox.modules.reiders.reidtools.ReIDCache`.
+
+        Parameters
+        ----------
+        enable : bool, default=True
+            Set :code:`enable=False` to disable and remove the cache.
+        ttl : int, default=30
+            Maximum age in frames of a known result.
+        unknown_ttl : int, default=5
+            Maximum age in frames of an unknown result.
+        decay : float, default=0.99
+            Confidence decay factor per frame.
+        max_size : int, default=512
+            Maximum number of cached tracks, the least recently seen tracks are evicted first.
+        drift_threshold : float, default=0.4
+            Maximum Bhattacharyya distance (0 to 1) between the cached and the current colour 
+            histogram of a track.
+        """
+        if enable:
+            self.__ri_cache__ = ReIDCache(ttl=ttl, 
+                                          unknown_ttl=unknown_ttl, 
+                                          decay=decay, 
+                                          max_size=max_size, 
+                                          drift_threshold=drift_threshold)
+        else:
+            self.__ri_cache__ = None
+
+    def reidPeople(self, img, people, deduplicate=True, img_is_mat=False, batch=False):
         """Re-identify people by giving an image and a list of detected or tracked people. 
         :func:`setConfigDir()` or :func:`setMainReIDer()` must be called in advance.
 
@@ -792,59 +1151,83 @@ class MT(object):
         ----------
         img : str or Mat
             Set an image file or a cv :obj:`Mat`.
-        people : list[Person, ...]
-            Set a list of :class:`Person` object which stores the detected or tracked people in 
-            the input :obj:`img`.
+        people : list[Person, ...] or PeopleFrame
+            Set a list of :class:`Person` object or a :class:`PeopleFrame` which stores the 
+            detected or tracked people in the input :obj:`img`.
         deduplicate : bool, default=True
-            Indicate whether to re-reid people who have the same face ids or deep ids.
+            Indicate whether to resolve people who have the same face ids or deep ids. The 
+            duplicates are resolved by a one-to-one assignment over their class-probability 
+            vectors, which were already computed in this frame or kept from the same track 
+            :attr:`cid` in the previous frame, so no extra inference is needed in most cases.
         img_is_mat : bool, default=False
             Speed up the function by telling whether the :obj:`img` is cv :obj:`Mat`.
+        batch : bool, default=False
+            Indicate whether to collect the crops of all people who need to be re-identified 
+            and re-identify them with a single forward pass and a single classifier call per 
+            frame, which is much faster in crowded scenes. The results are the same as 
+            :code:`batch=False`, unless FaceNet is configured with :code:`bulk_mtcnn: True` 
+            which localizes the faces by a single bulk MTCNN pass over the padded head crops, 
+            so the faces and IDs may differ slightly.
+            
+        Note: If the main tracker is DeepSORT configured with :code:`encoder: Torchreid` and the 
+        main reider is Torchreid, the features computed by :func:`trackPeople()` for the same 
+        :obj:`img` are reused, so the people are not embedded a second time.
+
+        Note: If the ReID cache is enabled by :func:`setReIDCache()`, the tracked people whose 
+        cached results are still valid are not re-identified and get their cached IDs instead.
         
         Returns
         -------
-        list[Person, ...]
-            A list of :class:`Person` object which stores people with the updated IDs.
+        list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object, or a :class:`PeopleFrame` if :obj:`people` is a 
+            :class:`PeopleFrame`, which stores people with the updated IDs.
         tuple(int, int)
             A tuple of (ReID count, ReID deduplicate count).
         """
-        res = []
-        reid_count = [0, 0]
-        if self.__ri_is_set__:
-            if self.__ri_cfg__.ri_name.lower() != self.__unistrings__.none:
-                if not self.__ri__.auto_load:
-                    self.__ri__.load_classifier()
-                    self.__ri__.auto_load = True
-            if isinstance(people, list):
-                if len(people) > 0:
-                    if isinstance(people[0], Person):
-                        if not img_is_mat: img = getCVMat(img)
-                        res, reid_count[0] = self.__reidNormal__(img, people)
-                        if deduplicate: res, reid_count[1] = self.__reidDupkiller__(img, res)
-                    else:
-                        msg = "PYPPBOX : reidPeople() -> Input 'people' has unsupported element."
-                        add_error_log(msg)
-                        raise ValueError(msg)
+        with self.__state_lock__:
+            res = []
+            reid_count = [0, 0]
+            if self.__ri_is_set__:
+                if self.__ri_cfg__.ri_name.lower() != self.__unistrings__.none:
+                    self.__loadReIDClassifier__()
+                    self.__checkReIDClasses__()
+                if isinstance(people, (list, PeopleFrame)):
+                    if len(people) > 0:
+                        if isinstance(people[0], Person):
+                            if not img_is_mat: img = getCVMat(img)
+                            self.__ri_cropper__.reset()
+                            self.__probaTMP__ = {}
+                            self.__reidTMP__ = set()
+                            signatures, cached = self.__lookupReIDCache__(img, people)
+                            res, reid_count[0] = self.__reidNormal__(img, people, batch=batch, skip=cached)
+                            if deduplicate: res, reid_count[1] = self.__reidDupkiller__(img, res, batch=batch)
+                            self.__keepProbaByCID__(res)
+                            self.__storeReIDCache__(res, signatures)
+                        else:
+                            msg = "PYPPBOX : reidPeople() -> Input 'people' has unsupported element."
+                            add_error_log(msg)
+                            raise ValueError(msg)
+                else:
+                    msg = "PYPPBOX : reidPeople() -> The input 'people' is invalid."
+                    add_error_log(msg)
+                    raise ValueError(msg)
             else:
-                msg = "PYPPBOX : reidPeople() -> The input 'people' is invalid."
-                add_error_log(msg)
-                raise ValueError(msg)
-        else:
-            add_warning_log("---PYPPBOX : reidPeople() -> The main ReIDer is not set.")
-        return res, tuple(reid_count)
+                add_warning_log("---PYPPBOX : reidPeople() -> The main ReIDer is not set.")
+            return res, tuple(reid_count)
 
-    def __reidNormal__(self, img, people):
+    def __reidNormal__(self, img, people, batch=False, skip=set()):
         if self.__ri_cfg__.ri_name.lower() == self.__unistrings__.facenet:
-            return self.__reidFaceNormal__(img, people)
+            return self.__reidUnknown__(img, people, True, batch, skip)
         elif self.__ri_cfg__.ri_name.lower() == self.__unistrings__.torchreid:
-            return self.__reidDeepNormal__(img, people)
+            return self.__reidUnknown__(img, people, False, batch, skip)
         else:
             return self.__reidEmpty__(img, people)
 
-    def __reidDupkiller__(self, img, people):
+    def __reidDupkiller__(self, img, people, batch=False):
         if self.__ri_cfg__.ri_name.lower() == self.__unistrings__.facenet:
-            return self.__reidDupFacekiller__(img, people)
+            return self.__reidDupAssign__(img, people, True, batch)
         elif self.__ri_cfg__.ri_name.lower() == self.__unistrings__.torchreid:
-            return self.__reidDupDeepkiller__(img, people)
+            return self.__reidDupAssign__(img, people, False, batch)
         else:
             return self.__reidEmpty__(img, people)
 
@@ -857,105 +1240,235 @@ class MT(object):
             index += 1
         return people, 0
 
-    def __reidDeepNormal__(self, img, people):
+    def __getID__(self, person, face):
+        return person.faceid if face else person.deepid
+
+    def __setID__(self, person, face, result):
+        if face:
+            person.faceid, person.faceid_conf = result
+        else:
+            person.deepid, person.deepid_conf = result
+
+    def __isUnknownID__(self, rid, face):
+        if face:
+            return self.__unistrings__.err_fid in rid or self.__unistrings__.unk_fid in rid
+        return self.__unistrings__.err_did in rid or self.__unistrings__.unk_did in rid
+
+    def __getDeepCrop__(self, img, person):
+        self.__ri_cropper__.setFrame(img)
+        return self.__ri_cropper__.getBodyCrop(person.box_xyxy, self.__ri_cfg__.model_wh)
+
+    def __getFaceCrop__(self, img, person):
+        self.__ri_cropper__.setFrame(img)
+        return self.__ri_cropper__.getHeadRegion(person.repspoint, 
+                                                 self.__cfg__.rcfg_facenet.yl_h_calibration, 
+                                                 self.__cfg__.rcfg_facenet.yl_w_calibration)
+
+    def __getCrop__(self, img, person, face):
+        if face: return self.__getFaceCrop__(img, person)
+        return self.__getDeepCrop__(img, person)
+
+    def __getSharedFeatures__(self, img, people, indices):
+        # Features of this frame already computed by the TorchreidEncoder of DeepSORT
+        encoder = getattr(self.__tk__, "encoder", None) if self.__tk_is_set__ else None
+        if (len(indices) == 0 or not hasattr(encoder, "getFeatures") or 
+            getattr(encoder, "reider", None) is not self.__ri__): 
+            return {}
+        features = encoder.getFeatures(img, [people[index].box_xyxy for index in indices])
+        return {index: feature for index, feature in zip(indices, features) if feature is not None}
+
+    def __reidOnFeatures__(self, people, shared, caller):
         reid_count = 0
-        index = 0
-        self.__deepidlistTMP__ = []
-        for person in people:
-            deepid = person.deepid
-            if self.__unistrings__.err_did in deepid or self.__unistrings__.unk_did in deepid:
-                miniframe = img.copy()
-                try:
-                    [x1, y1, x2, y2] = person.box_xyxy
-                    miniframe = miniframe[y1:y2, x1:x2]
-                    people[index].deepid, people[index].deepid_conf = self.__ri__.recognize(
-                        cv2.resize(miniframe, self.__ri_cfg__.model_wh), 
-                        is_bgr=True
-                    )
-                    reid_count += 1
-                except Exception as e:
-                    add_warning_log("---PYPPBOX : __reidDeepNormal__() -> " + str(e))
-            self.__deepidlistTMP__.append(deepid)
-            index += 1
-        return people, reid_count
+        try:
+            shared_indices = list(shared.keys())
+            results, probas = self.__ri__.recognize_features(
+                np.stack([shared[index] for index in shared_indices]), return_proba=True
+            )
+            for index, result, proba in zip(shared_indices, results, probas):
+                self.__setID__(people[index], False, result)
+                self.__probaTMP__[index] = proba
+                self.__reidTMP__.add(index)
+                reid_count += 1
+        except Exception as e:
+            add_warning_log("---PYPPBOX : " + caller + "() -> " + str(e))
+        return reid_count
 
-    def __reidDupDeepkiller__(self, img, people):
+    def __getKeypointFaces__(self, img, people, indices):
+        # Faces aligned by the pose keypoints, only with FaceNet 'face_locator: Keypoints'
+        if (len(indices) == 0 or 
+            str(getattr(self.__ri__, "face_locator", "")).lower() != "keypoints"):
+            return {}
+        self.__ri_cropper__.setFrame(img)
+        faces = {}
+        for index in indices:
+            if len(people[index].keypoints) == 0: continue
+            face = self.__ri_cropper__.getKeypointFace(people[index].keypoints, 
+                                                       self.__ri__.image_size, 
+                                                       min_conf=self.__ri__.min_keypoint_conf)
+            if face is not None: faces[index] = face
+        return faces
+
+    def __reidOnFaces__(self, people, faces, caller):
         reid_count = 0
-        if len(self.__deepidlistTMP__) != len(set(self.__deepidlistTMP__)):
-            ddeepids = [k for k, v in Counter(self.__deepidlistTMP__).items() if v > 1]
-            for ddeepid in ddeepids:
-                index = 0
-                for person in people:
-                    try:
-                        if person.deepid == ddeepid:
-                            [x1, y1, x2, y2] = person.box_xyxy
-                            miniframe = img.copy()
-                            miniframe = miniframe[y1:y2, x1:x2]
-                            people[index].deepid, people[index].deepid_conf = self.__ri__.recognize(
-                                cv2.resize(miniframe, self.__ri_cfg__.model_wh), 
-                                is_bgr=True
-                            )
-                            reid_count += 1
-                    except Exception as e:
-                        add_warning_log("---PYPPBOX : __reidDupDeepkiller__() -> " + str(e))
-                    index += 1
-        return people, reid_count
+        try:
+            face_indices = list(faces.keys())
+            results, probas = self.__ri__.recognize_faces(
+                [faces[index] for index in face_indices], is_bgr=True, return_proba=True
+            )
+            for index, result, proba in zip(face_indices, results, probas):
+                self.__setID__(people[index], True, result)
+                self.__probaTMP__[index] = proba
+                self.__reidTMP__.add(index)
+                reid_count += 1
+        except Exception as e:
+            add_warning_log("---PYPPBOX : " + caller + "() -> " + str(e))
+        return reid_count
 
-    def __reidFaceNormal__(self, img, people):
+    def __reidOn__(self, img, people, indices, face, batch, caller):
         reid_count = 0
-        index = 0
-        self.__faceidlistTMP__ = []
-        for person in people:
-            faceid = person.faceid
-            if self.__unistrings__.err_fid in faceid or self.__unistrings__.unk_fid in faceid:
-                (x, y) = person.repspoint
-                miniframe = img.copy()
+        if face:
+            # MTCNN is only the fallback of the people without confident keypoints
+            aligned = self.__getKeypointFaces__(img, people, indices)
+            if len(aligned) > 0:
+                reid_count += self.__reidOnFaces__(people, aligned, caller)
+                indices = [index for index in indices if index not in aligned]
+        else:
+            shared = self.__getSharedFeatures__(img, people, indices)
+            if len(shared) > 0:
+                reid_count += self.__reidOnFeatures__(people, shared, caller)
+                indices = [index for index in indices if index not in shared]
+        if batch:
+            crop_indices = []
+            crops = []
+            for index in indices:
                 try:
-                    miniframe = miniframe[
-                        y + int(self.__cfg__.rcfg_facenet.yl_h_calibration[0]):
-                        y + int(self.__cfg__.rcfg_facenet.yl_h_calibration[1]), 
-                        x + int(self.__cfg__.rcfg_facenet.yl_w_calibration[0]):
-                        x + int(self.__cfg__.rcfg_facenet.yl_w_calibration[1])
-                    ]
-                    people[index].faceid, people[index].faceid_conf = self.__ri__.recognize(
-                        miniframe, 
-                        is_bgr=True
+                    crops.append(self.__getCrop__(img, people[index], face))
+                    crop_indices.append(index)
+                except Exception as e:
+                    add_warning_log("---PYPPBOX : " + caller + "() -> " + str(e))
+            if len(crops) > 0:
+                try:
+                    results, probas = self.__ri__.recognize_batch(crops, is_bgr=True, return_proba=True)
+                    for index, result, proba in zip(crop_indices, results, probas):
+                        if result is not None:
+                            self.__setID__(people[index], face, result)
+                            self.__probaTMP__[index] = proba
+                            self.__reidTMP__.add(index)
+                            reid_count += 1
+                except Exception as e:
+                    add_warning_log("---PYPPBOX : " + caller + "() -> " + str(e))
+        else:
+            for index in indices:
+                try:
+                    result, conf, proba = self.__ri__.recognize(
+                        self.__getCrop__(img, people[index], face), 
+                        is_bgr=True, 
+                        return_proba=True
                     )
+                    self.__setID__(people[index], face, (result, conf))
+                    self.__probaTMP__[index] = proba
+                    self.__reidTMP__.add(index)
                     reid_count += 1
                 except Exception as e:
-                    add_warning_log("---PYPPBOX : __reidFaceNormal__() -> " + str(e))
-            self.__faceidlistTMP__.append(faceid)
-            index += 1
-        return people, reid_count
+                    add_warning_log("---PYPPBOX : " + caller + "() -> " + str(e))
+        return reid_count
 
-    def __reidDupFacekiller__(self, img, people):
-        reid_count = 0
-        if len(self.__faceidlistTMP__) != len(set(self.__faceidlistTMP__)):
-            dfaceids = [k for k, v in Counter(self.__faceidlistTMP__).items() if v > 1]
-            for dfaceid in dfaceids:
-                index = 0
-                for person in people:
-                    try:
-                        if person.faceid == dfaceid:
-                            (x, y) = person.repspoint
-                            miniframe = img.copy()
-                            miniframe = miniframe[
-                                y + int(self.__cfg__.rcfg_facenet.yl_h_calibration[0]):
-                                y + int(self.__cfg__.rcfg_facenet.yl_h_calibration[1]), 
-                                x + int(self.__cfg__.rcfg_facenet.yl_w_calibration[0]):
-                                x + int(self.__cfg__.rcfg_facenet.yl_w_calibration[1])
-                            ]
-                            people[index].faceid, people[index].faceid_conf = self.__ri__.recognize(
-                                miniframe, 
-                                is_bgr=True
-                            )
-                            reid_count += 1
-                    except Exception as e:
-                        add_warning_log("---PYPPBOX : __reidDupFacekiller__() -> " + str(e))
-                    index += 1
-        return people, reid_count
+    def __reidUnknown__(self, img, people, face, batch, skip=set()):
+        indices = [i for i, person in enumerate(people) 
+                   if i not in skip and self.__isUnknownID__(self.__getID__(person, face), face)]
+        caller = "__reidFaceNormal__" if face else "__reidDeepNormal__"
+        return people, self.__reidOn__(img, people, indices, face, batch, caller)
+
+    def __reidDupAssign__(self, img, people, face, batch):
+        ids = [self.__getID__(person, face) for person in people]
+        counts = Counter([rid for rid in ids if not self.__isUnknownID__(rid, face)])
+        dids = set([k for k, v in counts.items() if v > 1])
+        if len(dids) == 0: return people, 0
+        rows = [i for i, rid in enumerate(ids) if rid in dids]
+        # Use the probability vectors of this frame, or the last ones of the same track
+        missing = []
+        for i in rows:
+            if i not in self.__probaTMP__:
+                proba = self.__probaByCID__.get(people[i].cid)
+                if proba is not None:
+                    self.__probaTMP__[i] = proba
+                else:
+                    missing.append(i)
+        if len(missing) > 0:
+            caller = "__reidDupFacekiller__" if face else "__reidDupDeepkiller__"
+            self.__reidOn__(img, people, missing, face, batch, caller)
+        class_names = self.__ri__.getClassNames()
+        rows = [i for i in rows if self.__probaTMP__.get(i) is not None and 
+                len(self.__probaTMP__[i]) == len(class_names)]
+        if len(rows) == 0: return people, 0
+        class_indices = {name: k for k, name in enumerate(class_names)}
+        excluded = [class_indices[rid] for rid in counts if rid not in dids and rid in class_indices]
+        assigned = assignUniqueIDs(np.vstack([self.__probaTMP__[i] for i in rows]), 
+                                   self.__ri__.min_confidence / 100.0, 
+                                   excluded_classes=excluded)
+        unk = self.__unistrings__.unk_fid if face else self.__unistrings__.unk_did
+        for i, (k, p) in zip(rows, assigned):
+            if k >= 0:
+                self.__setID__(people[i], face, (class_names[k], float(p*100)))
+            else:
+                self.__setID__(people[i], face, (unk, 100.0))
+        return people, len(rows)
+
+    def __keepProbaByCID__(self, people):
+        kept = {}
+        if self.__tk_is_set__ and self.__tk_cfg__.tk_name.lower() != self.__unistrings__.none:
+            for i, person in enumerate(people):
+                proba = self.__probaTMP__.get(i)
+                if proba is None: proba = self.__probaByCID__.get(person.cid)
+                if proba is not None: kept[person.cid] = proba
+        self.__probaByCID__ = kept
+
+    def __isReIDCacheActive__(self):
+        return (self.__ri_cache__ is not None and 
+                self.__tk_is_set__ and 
+                self.__tk_cfg__.tk_name.lower() != self.__unistrings__.none and 
+                self.__ri_cfg__.ri_name.lower() in [self.__unistrings__.facenet, 
+                                                    self.__unistrings__.torchreid])
+
+    def __lookupReIDCache__(self, img, people):
+        signatures = {}
+        cached = set()
+        if not self.__isReIDCacheActive__(): return signatures, cached
+        face = self.__ri_cfg__.ri_name.lower() == self.__unistrings__.facenet
+        unk = self.__unistrings__.unk_fid if face else self.__unistrings__.unk_did
+        self.__ri_cache__.min_confidence = self.__ri__.min_confidence
+        self.__ri_cache__.nextFrame()
+        self.__ri_cropper__.setFrame(img)
+        for i, person in enumerate(people):
+            try:
+                signatures[i] = self.__ri_cache__.computeSignature(
+                    self.__ri_cropper__.getBodyCrop(person.box_xyxy, (32, 64))
+                )
+            except Exception:
+                signatures[i] = None
+            hit = self.__ri_cache__.lookup(person.cid, signatures[i])
+            if hit is None:
+                # Force the re-identification of a new, expired, or drifted track
+                self.__setID__(person, face, (unk, 100.0))
+            else:
+                self.__setID__(person, face, hit)
+                cached.add(i)
+        return signatures, cached
+
+    def __storeReIDCache__(self, people, signatures):
+        if not self.__isReIDCacheActive__(): return
+        face = self.__ri_cfg__.ri_name.lower() == self.__unistrings__.facenet
+        for i, person in enumerate(people):
+            rid = self.__getID__(person, face)
+            conf = person.faceid_conf if face else person.deepid_conf
+            self.__ri_cache__.store(person.cid, 
+                                    rid, 
+                                    conf, 
+                                    self.__isUnknownID__(rid, face), 
+                                    signature=signatures.get(i), 
+                                    refreshed=i in self.__reidTMP__)
 
-    def trainReIDClassifier(self, reider="Default", train_data="", classifier_pkl=""):
+    def trainReIDClassifier(self, reider="Default", train_data="", classifier_pkl="", use_cache=True):
         """Train classifier of a reider by pointing to a data directory. Calling 
         :func:`setConfigDir()` or :func:`setMainReIDer()` in advance is not required.
 
@@ -971,7 +1484,14 @@ class MT(object):
             must be 128x256 for Torchreid and 182x182 for FaceNet.
         classifier_pkl : str, default=""
             A file path for the classifier PKL file. Set :code:`classifier_pkl=""` or keep default 
-            to use the configured :obj:`classifier_pkl` in the input :obj:`reider`.
+            to use the configured :obj:`classifier_pkl` in the input :obj:`reider`. With 
+            :code:`classifier: Gallery`, the embedding gallery is saved to the :code:`.npz` file 
+            named after it instead.
+        use_cache : bool, default=True
+            An indication of whether to reuse the embeddings of the unchanged images stored by 
+            the last training with the same :obj:`classifier_pkl` and model, see 
+            :class:`pyppbox.modules.reiders.reidtools.FeatureStore`. Set :code:`use_cache=False` 
+            to embed all images again.
         """
         self.setMainReIDer(reider=reider, auto_load=False)
         if self.__ri_is_set__:
@@ -1001,4 +1521,197 @@ class MT(object):
                     add_info_log("------------ Torchreid -------------")
                 add_info_log("---PYPPBOX : train_data='" + str(self.__ri_cfg__.train_data) + "'")
                 add_info_log("---PYPPBOX : classifier_pkl='" + str(self.__ri_cfg__.classifier_pkl) + "'")
-                self.__ri__.train_classifier()
+                self.__ri__.train_classifier(use_cache=use_cache)
+                # The shared reiders of the same class may have loaded the old classifier
+                getModelPool().invalidate(type(self.__ri__))
+
+    def __galleryReIDer__(self, caller):
+        # The loaded main reider if it supports enroll() and remove(), otherwise None
+        if not self.__ri_is_set__ or not hasattr(self.__ri__, "enroll"):
+            add_warning_log("---PYPPBOX : " + caller + "() -> The main ReIDer is not FaceNet or Torchreid.")
+            return None
+        self.__loadReIDClassifier__()
+        return self.__ri__
+
+    def __checkReIDClasses__(self):
+        # A shared reider may have enrolled or removed an identity for another MT, which 
+        # changes the length and the order of the probability vectors
+        version = getattr(self.__ri__, "classes_version", 0)
+        if self.__ri_classes_version__ is not None and version != self.__ri_classes_version__:
+            self.__resetReIDClasses__()
+        self.__ri_classes_version__ = version
+
+    def __resetReIDClasses__(self):
+        # The classes changed -> The kept probability vectors and cached results are outdated
+        with self.__state_lock__:
+            self.__probaByCID__ = {}
+            if self.__ri_cache__ is not None: self.__ri_cache__.clear()
+
+    def enrollReIDIdentity(self, name, imgs, save=True):
+        """Enroll a new identity, or add more images to a known identity, in the embedding 
+        gallery of the main reider without retraining its classifier. The main reider must be 
+        FaceNet or Torchreid configured with :code:`classifier: Gallery`, see 
+        :class:`pyppbox.modules.reiders.reidtools.EmbeddingGallery`. The kept 
+        class-probability vectors and the ReID cache of :func:`reidPeople()` are reset.
+
+        Parameters
+        ----------
+        name : str
+            The ID of the identity.
+        imgs : list[Mat, ...]
+            A list of cv :obj:`Mat` BGR images of the identity, the head regions for FaceNet or 
+            the body regions for Torchreid.
+        save : bool, default=True
+            An indication of whether to save the gallery to the :code:`.npz` file named after 
+            the configured :obj:`classifier_pkl`.
+
+        Returns
+        -------
+        int
+            The number of enrolled images.
+        """
+        count = 0
+        reider = self.__galleryReIDer__("enrollReIDIdentity")
+        if reider is not None:
+            count = reider.enroll(name, imgs, is_bgr=True, save=save)
+            self.__resetReIDClasses__()
+        return count
+
+    def removeReIDIdentity(self, name, save=True):
+        """Remove an identity from the embedding gallery of the main reider, see 
+        :func:`enrollReIDIdentity()`.
+
+        Parameters
+        ----------
+        name : str
+            The ID of the identity.
+        save : bool, default=True
+            An indication of whether to save the gallery to the :code:`.npz` file named after 
+            the configured :obj:`classifier_pkl`.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the identity was in the gallery.
+        """
+        removed = False
+        reider = self.__galleryReIDer__("removeReIDIdentity")
+        if reider is not None:
+            removed = reider.remove(name, save=save)
+            if removed: self.__resetReIDClasses__()
+        return removed
+
+    ###########################################
+    # State
+    ###########################################
+
+    def getState(self):
+        """Get a snapshot of the main tracker and the ReID results as a flat dictionary of 
+        numpy arrays, which can be saved by :func:`pyppbox.utils.statetools.saveState()`. The 
+        snapshot includes the tracks of the main tracker, the last tracked people with their 
+        face IDs and deep IDs, the state of :func:`setDetectionInterval()`, the kept 
+        class-probability vectors of :func:`reidPeople()`, and the ReID cache of 
+        :func:`setReIDCache()`. The models and configurations are not included.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of the snapshot.
+        """
+        with self.__state_lock__, self.__tk_lock__:
+            state = {}
+            if self.__tk_is_set__:
+                state['tk_name'] = np.array(self.__tk_cfg__.tk_name)
+                if hasattr(self.__tk__, "getState"):
+                    state.update(nestState(self.__tk__.getState(), "tk"))
+                else:
+                    state.update(nestState(getPeopleState(self.__tk_last__), "last"))
+                cids = list(self.__tk_keyframe_boxes__.keys())
+                state['keyframe_cids'] = np.array(cids, dtype=int)
+                state['keyframe_boxes'] = np.array([self.__tk_keyframe_boxes__[c] for c in cids], 
+                                                   dtype=np.float64).reshape(-1, 4)
+                state['tk_predicted_frames'] = np.array(self.__tk_predicted_frames__)
+                state['dt_current_interval'] = np.array(self.__dt_current_interval__)
+                state['dt_countdown'] = np.array(self.__dt_countdown__)
+            if self.__ri_is_set__:
+                state['ri_name'] = np.array(self.__ri_cfg__.ri_name)
+                cids = list(self.__probaByCID__.keys())
+                state['proba_cids'] = np.array(cids, dtype=int)
+                if len(cids) > 0:
+                    state['probas'] = np.array([self.__probaByCID__[c] for c in cids], dtype=np.float64)
+                else:
+                    state['probas'] = np.zeros((0, 0))
+                if self.__ri_cache__ is not None:
+                    state.update(nestState(self.__ri_cache__.getState(), "ri_cache"))
+            return state
+
+    def setState(self, state):
+        """Restore a snapshot given by :func:`getState()`, e.g. loaded by 
+        :func:`pyppbox.utils.statetools.loadState()` after a restart. The main tracker must be 
+        set to the same tracker in advance; the tracks are then resumed with their IDs and 
+        identities without warming up again. The ReID results are only restored if the main 
+        reider is the same as well.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :func:`getState()`.
+        """
+        with self.__state_lock__, self.__tk_lock__:
+            if 'tk_name' in state:
+                tk_name = str(state['tk_name'])
+                if not self.__tk_is_set__ or self.__tk_cfg__.tk_name.lower() != tk_name.lower():
+                    msg = ("PYPPBOX : setState() -> The state of tracker '" + tk_name + 
+                           "' does not match the main tracker.")
+                    add_error_log(msg)
+                    raise ValueError(msg)
+                if hasattr(self.__tk__, "setState"):
+                    self.__tk__.setState(getSubState(state, "tk"))
+                    self.__tk_last__ = self.__tk__.current_list
+                else:
+                    self.__tk_last__ = getPeopleFromState(getSubState(state, "last"))
+                self.__tk_keyframe_boxes__ = dict(zip(state['keyframe_cids'].tolist(), 
+                                                      state['keyframe_boxes'].copy()))
+                self.__tk_predicted_frames__ = int(state['tk_predicted_frames'])
+                self.__dt_current_interval__ = int(state['dt_current_interval'])
+                self.__dt_countdown__ = int(state['dt_countdown'])
+            if (self.__ri_is_set__ and 'ri_name' in state and 
+                self.__ri_cfg__.ri_name.lower() == str(state['ri_name']).lower()):
+                self.__probaByCID__ = dict(zip(state['proba_cids'].tolist(), 
+                                               [p.copy() for p in state['probas']]))
+                self.__ri_classes_version__ = None
+                if self.__ri_cache__ is not None and 'ri_cache.frame' in state:
+                    self.__ri_cache__.setState(getSubState(state, "ri_cache"))
+
+    def setCheckpoint(self, state_file="", interval=100):
+        """Write the snapshot of :func:`getState()` to a file every :obj:`interval` calls of 
+        :func:`trackPeople()`. The file is written by a background thread, see 
+        :class:`pyppbox.utils.statetools.StateWriter`, so the tracking is not blocked.
+
+        Parameters
+        ----------
+        state_file : str, default=""
+            The path of the :code:`.npz` file, set :code:`state_file=""` to stop the checkpoints 
+            after writing the last queued snapshot.
+        interval : int, default=100
+            Number of :func:`trackPeople()` calls between two snapshots.
+        """
+        if self.__st_writer__ is not None:
+            self.__st_writer__.close()
+            self.__st_writer__ = None
+        if state_file != "":
+            state_file = getAbsPathFDS(str(state_file))
+            if not isExist(getAncestorDir(state_file)):
+                msg = "PYPPBOX : setCheckpoint() -> state_file='" + str(state_file) + "' is not valid."
+                add_error_log(msg)
+                raise ValueError(msg)
+            self.__st_writer__ = StateWriter(state_file)
+        self.__st_interval__ = max(int(interval), 1)
+        self.__st_count__ = 0
+
+    def __writeCheckpoint__(self):
+        if self.__st_writer__ is None: return
+        self.__st_count__ += 1
+        if self.__st_count__ >= self.__st_interval__:
+            self.__st_count__ = 0
+            self.__st_writer__.write(self.getState())
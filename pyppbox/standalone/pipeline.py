@@ -0,0 +1,390 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+# Logging
+from pyppbox.utils.logtools import add_info_log, add_warning_log, add_error_log
+
+# Common
+import cv2
+import queue
+import threading
+
+# Classes & tools
+from .mt import MT
+from pyppbox.utils.visualizetools import visualizePeople
+
+
+class __StageEnd__(object):
+    """:meta private:"""
+    pass
+
+class __StageFailure__(object):
+    """:meta private:"""
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class MTPipeline(object):
+
+    """A pipelined executor built around :class:`MT`. Each stage, read -> detect -> track ->
+    reid -> visual, runs in its own worker thread and hands frames over to the next stage
+    through a bounded queue, so decoding, detection, re-identification and drawing overlap
+    and the throughput approaches the slowest stage instead of the sum of all stages. Every
+    stage has exactly one worker, so the frame order is preserved and tracking stays strictly
+    sequential.
+
+    Example:
+
+    >>> import cv2
+    >>> from pyppbox.standalone import MT, MTPipeline
+    >>>
+    >>> ppbmt = MT()
+    >>> ppbmt.setMainModules(main_yaml={'detector': 'YOLO_Classic',
+    >>>                                 'tracker': 'SORT',
+    >>>                                 'reider': 'Torchreid'})
+    >>> pipeline = MTPipeline(ppbmt, queue_size=4)
+    >>> for frame_index, visualized_mat, people, reid_count in pipeline.run("data/gta.mp4"):
+    >>>     cv2.imshow("Pipeline", visualized_mat)
+    >>>     if cv2.waitKey(1) & 0xFF == ord('q'):
+    >>>         break
+    >>>
+
+    Attributes
+    ----------
+    mt : MT
+        The :class:`MT` object used by all stages.
+    queue_size : int
+        The maximum number of frames waiting in front of each stage.
+    visual : bool
+        Indicate whether the visual stage draws the people using :func:`visualizePeople`.
+    deduplicate : bool
+        Passed to :obj:`deduplicate` of :meth:`MT.reidPeople`.
+    sync_reid : bool
+        Indicate whether tracking the frame :code:`n` waits for the re-identification of the
+        frame :code:`n-1`, so the IDs carried over by the tracker are the same as in the serial
+        loop.
+    stages : tuple(str, ...)
+        The names of the stages in order.
+
+    Notes
+    -----
+    If :meth:`MT.setDetectionInterval` may skip frames when :meth:`start()` is called, the
+    detect and track stages run in one worker, because the decision to skip the detector depends
+    on the tracker output of the previous frame. The worker still detects the frame :code:`n`
+    while the frame :code:`n-1` is re-identified, and only waits for it right before tracking.
+    The layout is decided by :meth:`start()`, so call :meth:`MT.setDetectionInterval` before it.
+    """
+
+    stages = ("read", "detect", "track", "reid", "visual")
+
+    def __init__(self,
+                 mt=None,
+                 queue_size=4,
+                 visual=True,
+                 deduplicate=True,
+                 sync_reid=True,
+                 detect_kwargs=None,
+                 visual_kwargs=None):
+        """Initialize by giving an :class:`MT` object.
+
+        Parameters
+        ----------
+        mt : MT, default=None
+            A ready :class:`MT` object with its main modules already set. Set :code:`mt=None`
+            to create a new :class:`MT` object and set its main modules according to the main.yaml
+            of the internal config directory.
+        queue_size : int, default=4
+            The maximum number of frames waiting in front of each stage, which also bounds
+            the memory used by the pipeline.
+        visual : bool, default=True
+            Indicate whether to visualize the people using :func:`visualizePeople` in the visual
+            stage. If :code:`visual=False`, the original frames are returned.
+        deduplicate : bool, default=True
+            Passed to :obj:`deduplicate` of :meth:`MT.reidPeople`.
+        sync_reid : bool, default=True
+            Indicate whether tracking the frame :code:`n` waits until the re-identification of
+            the frame :code:`n-1` is done. Keep :code:`sync_reid=True` to get exactly the same IDs
+            as the serial loop, including with :meth:`MT.setDetectionInterval`; set
+            :code:`sync_reid=False` to let tracking run ahead of re-identification at the cost of
+            re-identifying the new tracks one frame later. The calls of :meth:`MT.trackPeople`,
+            :meth:`MT.reidPeople` and :meth:`MT.getState` are serialized by a lock of the
+            :class:`MT` object, so the checkpoints and the ReID cache stay consistent in both modes.
+        detect_kwargs : dict, default=None
+            Extra keyword arguments passed to :meth:`MT.detectPeople`, for example
+            :code:`{'min_width_filter': 35}`.
+        visual_kwargs : dict, default=None
+            Extra keyword arguments passed to :func:`visualizePeople`, for example
+            :code:`{'show_skl': (False, False, 5)}`.
+        """
+        if mt is None:
+            mt = MT()
+            mt.setMainModules()
+        if not isinstance(mt, MT):
+            msg = "MTPipeline : __init__() -> Input 'mt' is not an MT object."
+            add_error_log(msg)
+            raise ValueError(msg)
+        if not isinstance(queue_size, int) or queue_size < 1:
+            msg = "MTPipeline : __init__() -> queue_size='" + str(queue_size) + "' is not valid."
+            add_error_log(msg)
+            raise ValueError(msg)
+        self.mt = mt
+        self.queue_size = queue_size
+        self.visual = visual
+        self.deduplicate = deduplicate
+        self.sync_reid = sync_reid
+        self.__detect_kwargs__ = dict(detect_kwargs) if detect_kwargs else {}
+        self.__visual_kwargs__ = dict(visual_kwargs) if visual_kwargs else {}
+        self.__queues__ = {}
+        self.__workers__ = []
+        self.__stop_event__ = threading.Event()
+        self.__reid_cond__ = threading.Condition()
+        self.__reid_done__ = -1
+        self.__running__ = False
+
+    def __putItem__(self, q, item):
+        while not self.__stop_event__.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __takeItem__(self, q):
+        while not self.__stop_event__.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return __StageEnd__()
+
+    def __markReIDDone__(self, frame_index):
+        with self.__reid_cond__:
+            self.__reid_done__ = frame_index
+            self.__reid_cond__.notify_all()
+
+    def __waitReIDDone__(self, frame_index):
+        with self.__reid_cond__:
+            while self.__reid_done__ < frame_index and not self.__stop_event__.is_set():
+                self.__reid_cond__.wait(timeout=0.1)
+
+    def __readStage__(self, source, q_out):
+        cap = None
+        frame_index = 0
+        try:
+            if isinstance(source, (str, int)):
+                cap = cv2.VideoCapture(source)
+                while cap.isOpened() and not self.__stop_event__.is_set():
+                    hasFrame, frame = cap.read()
+                    if not hasFrame: break
+                    if not self.__putItem__(q_out, (frame_index, frame)): break
+                    frame_index += 1
+            else:
+                for frame in source:
+                    if self.__stop_event__.is_set(): break
+                    if not self.__putItem__(q_out, (frame_index, frame)): break
+                    frame_index += 1
+        except Exception as e:
+            add_error_log("MTPipeline : read -> " + str(e))
+            self.__putItem__(q_out, __StageFailure__("read", e))
+        finally:
+            if cap is not None: cap.release()
+        self.__putItem__(q_out, __StageEnd__())
+
+    def __runStage__(self, name, task, q_in, q_out):
+        while True:
+            item = self.__takeItem__(q_in)
+            if isinstance(item, (__StageEnd__, __StageFailure__)):
+                # Unblock the tracking stage if it waits for a frame that will never come
+                if name == "reid": self.__markReIDDone__(float("inf"))
+                self.__putItem__(q_out, item)
+                break
+            try:
+                item = task(item)
+            except Exception as e:
+                add_error_log("MTPipeline : " + name + " -> " + str(e))
+                if name == "reid": self.__markReIDDone__(float("inf"))
+                self.__putItem__(q_out, __StageFailure__(name, e))
+                break
+            if not self.__putItem__(q_out, item): break
+
+    def __detectTask__(self, item):
+        frame_index, frame = item
+        people, _ = self.mt.detectPeople(frame, img_is_mat=True, visual=False, 
+                                         **self.__detect_kwargs__)
+        return (frame_index, frame, people)
+
+    def __trackTask__(self, item):
+        frame_index, frame, people = item
+        if self.sync_reid: self.__waitReIDDone__(frame_index - 1)
+        people = self.mt.trackPeople(frame, people, img_is_mat=True)
+        return (frame_index, frame, people)
+
+    def __detectTrackTask__(self, item):
+        # Skipping the detector reads the tracker state of the previous frame, so the detection
+        # and the tracking of a frame must not be separated by the frames queued in between. The
+        # detection does not wait for the re-identification, only __trackTask__() does.
+        return self.__trackTask__(self.__detectTask__(item))
+
+    def __reidTask__(self, item):
+        frame_index, frame, people = item
+        people, reid_count = self.mt.reidPeople(frame, people, deduplicate=self.deduplicate, 
+                                                img_is_mat=True)
+        self.__markReIDDone__(frame_index)
+        return (frame_index, frame, people, reid_count)
+
+    def __visualTask__(self, item):
+        frame_index, frame, people, reid_count = item
+        if self.visual:
+            frame = visualizePeople(frame, people, show_reid=reid_count, **self.__visual_kwargs__)
+        return (frame_index, frame, people, reid_count)
+
+    def start(self, source):
+        """Start all the stages. Calling :meth:`start()` while the pipeline is running is not
+        allowed.
+
+        Parameters
+        ----------
+        source : str or int or iterable
+            A video file or a camera index passed to :obj:`cv2.VideoCapture`, or an iterable
+            such as a list or a generator of cv :obj:`Mat` frames.
+        """
+        if self.__running__:
+            msg = "MTPipeline : start() -> The pipeline is already running, call stop() first."
+            add_error_log(msg)
+            raise ValueError(msg)
+        self.__stop_event__.clear()
+        self.__reid_done__ = -1
+        if self.mt.__usesDetectionInterval__():
+            tasks = [("detect", self.__detectTrackTask__)]
+        else:
+            tasks = [("detect", self.__detectTask__),
+                     ("track", self.__trackTask__)]
+        tasks += [("reid", self.__reidTask__),
+                  ("visual", self.__visualTask__)]
+        self.__queues__ = {name: queue.Queue(maxsize=self.queue_size) for name, _ in tasks}
+        self.__queues__["output"] = queue.Queue(maxsize=self.queue_size)
+        outputs = [name for name, _ in tasks[1:]] + ["output"]
+        self.__workers__ = [threading.Thread(target=self.__readStage__,
+                                             args=(source, self.__queues__["detect"]),
+                                             name="MTPipeline-read",
+                                             daemon=True)]
+        for (name, task), output in zip(tasks, outputs):
+            self.__workers__.append(threading.Thread(target=self.__runStage__,
+                                                     args=(name, task,
+                                                           self.__queues__[name],
+                                                           self.__queues__[output]),
+                                                     name="MTPipeline-" + name,
+                                                     daemon=True))
+        for worker in self.__workers__: worker.start()
+        self.__running__ = True
+        add_info_log("---PYPPBOX : MTPipeline started with queue_size=" + str(self.queue_size))
+
+    def read(self, timeout=None):
+        """Read the next processed frame in order.
+
+        Parameters
+        ----------
+        timeout : float, default=None
+            The maximum time in seconds to wait for the next frame. Set :code:`timeout=None`
+            to wait until the next frame is ready or the pipeline is finished.
+
+        Returns
+        -------
+        tuple(int, Mat, list[Person, ...], tuple(int, int)) or None
+            A tuple of (frame index, visualized or original frame, list of :class:`Person`
+            object, reid count), or :code:`None` once all frames have been read.
+        """
+        if not self.__running__: return None
+        try:
+            item = self.__queues__["output"].get(timeout=timeout)
+        except queue.Empty:
+            msg = "MTPipeline : read() -> No frame is ready after timeout=" + str(timeout) + "."
+            add_warning_log(msg)
+            raise TimeoutError(msg)
+        if isinstance(item, __StageEnd__):
+            self.stop()
+            return None
+        if isinstance(item, __StageFailure__):
+            self.stop()
+            msg = "MTPipeline : read() -> Stage '" + item.stage + "' failed, " + str(item.error)
+            add_error_log(msg)
+            raise RuntimeError(msg) from item.error
+        return item
+
+    def stop(self):
+        """Stop and join all the stages, and discard the frames still waiting in the queues."""
+        self.__stop_event__.set()
+        with self.__reid_cond__:
+            self.__reid_cond__.notify_all()
+        for worker in self.__workers__:
+            if worker is not threading.current_thread(): worker.join()
+        self.__workers__ = []
+        self.__running__ = False
+
+    def run(self, source):
+        """A generator that calls :meth:`start()`, yields every processed frame in order by
+        :meth:`read()`, and calls :meth:`stop()` at the end or when the loop is broken.
+
+        Parameters
+        ----------
+        source : str or int or iterable
+            See :meth:`start()`.
+
+        Yields
+        ------
+        tuple(int, Mat, list[Person, ...], tuple(int, int))
+            A tuple of (frame index, visualized or original frame, list of :class:`Person`
+            object, reid count).
+        """
+        self.start(source)
+        try:
+            while True:
+                item = self.read()
+                if item is None: break
+                yield item
+        finally:
+            self.stop()
+
+    def getQueueDepths(self):
+        """Get the current number of frames waiting in front of each stage and in the output.
+        A stage whose queue stays full is the bottleneck of the pipeline.
+
+        Returns
+        -------
+        dict
+            A dictionary of :code:`{'detect': int, 'track': int, 'reid': int, 'visual': int,
+            'output': int}`. The key :code:`'track'` is absent while the detect and track stages
+            run in one worker, see :class:`MTPipeline`.
+        """
+        return {name: q.qsize() for name, q in self.__queues__.items()}
+
+    def isRunning(self):
+        """Check whether the pipeline is running.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the pipeline is running.
+        """
+        return self.__running__
+
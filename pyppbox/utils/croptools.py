@@ -0,0 +1,321 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+import cv2
+import numpy as np
+
+from .logtools import add_warning_log
+
+
+def getKeypointFaceTransform(keypoints, size, min_conf=0.5):
+    """
+    Get the affine transform of an aligned face crop from the COCO body keypoints of a person, 
+    for example the keypoints of a YOLO Ultralytics pose model, where the first 5 keypoints are 
+    the nose, the left eye, the right eye, the left ear, and the right ear. The crop is rotated 
+    so that the eyes are level, the eyes are centered at 38% of its height, and its side is 2.4 
+    times the face scale. The face scale is the largest of the eye distance, 1.8 times the 
+    nose-to-eyes distance, and the ear distance divided by 2.1, so it stays stable when the head 
+    is turned and the eyes get closer.
+
+    Parameters
+    ----------
+    keypoints : ndarray
+        The keypoints of a person, :code:`shape=(number of keypoints, 2 or 3)`, where the third 
+        column is the confidence and an undetected keypoint is at (0, 0).
+    size : int
+        The side of the face crop.
+    min_conf : float, default=0.5
+        The minimum confidence of a used keypoint.
+
+    Returns
+    -------
+    ndarray or None
+        The 2x3 affine matrix from the frame to the face crop, or :code:`None` if any eye is 
+        missing or below :obj:`min_conf`, or if the person faces away.
+    """
+    if hasattr(keypoints, "cpu"): keypoints = keypoints.cpu().numpy()
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    if keypoints.ndim != 2 or keypoints.shape[0] < 5 or keypoints.shape[1] < 2: return None
+    points = keypoints[:5, :2]
+    valid = np.any(points != 0, axis=1)
+    if keypoints.shape[1] > 2: valid &= keypoints[:5, 2] >= min_conf
+    if not (valid[1] and valid[2]): return None
+    (nose, left_eye, right_eye, left_ear, right_ear) = points
+    eyes = (left_eye + right_eye) / 2.
+    # The left eye of a person facing the camera is on the right side of the image
+    eye_line = left_eye - right_eye
+    eye_distance = np.hypot(eye_line[0], eye_line[1])
+    if eye_line[0] <= 0 or eye_distance < 1.: return None
+    scale = eye_distance
+    if valid[0]: scale = max(scale, 1.8 * np.hypot(*(nose - eyes)))
+    if valid[3] and valid[4]: scale = max(scale, np.hypot(*(left_ear - right_ear)) / 2.1)
+    zoom = size / (2.4 * scale)
+    (c, s) = (zoom * eye_line[0] / eye_distance, zoom * eye_line[1] / eye_distance)
+    return np.array([[c, s, size / 2. - (c * eyes[0] + s * eyes[1])], 
+                     [-s, c, 0.38 * size - (-s * eyes[0] + c * eyes[1])]])
+
+
+class FrameCropper(object):
+
+    """
+    A class used to crop people from a single frame for the reiders and the trackers. All crops
+    are taken from views of the original frame, the frame itself is never copied, and the resized
+    crops are written into preallocated buffers which are reused from one frame to the next.
+    Each crop is made only once per frame; asking for the same box and the same size again
+    returns the cached crop.
+
+    A :class:`FrameCropper` is not thread-safe, use one object per thread or per stage.
+
+    Example:
+
+    >>> cropper = FrameCropper()
+    >>> cropper.setFrame(frame)
+    >>> body = cropper.getBodyCrop(person.box_xyxy, (128, 256))        # Torchreid model_wh
+    >>> patches = cropper.getPatches([p.box_xywh for p in people], (128, 64))  # DeepSORT
+    >>> head = cropper.getHeadRegion(person.repspoint, [-125, 75], [-55, 55])  # FaceNet
+    >>> face = cropper.getKeypointFace(person.keypoints, 182)                    # FaceNet
+    """
+
+    def __init__(self, init_capacity=32):
+        """
+        Construct a FrameCropper.
+
+        Parameters
+        ----------
+        init_capacity : int, default=32
+            Initial number of crops of each size that the buffers can hold before growing.
+        """
+        self.init_capacity = init_capacity
+        self.__img__ = None
+        self.__buffers__ = {}
+        self.__slot_maps__ = {}
+
+    def setFrame(self, img):
+        """
+        Set the frame to crop from. Setting the same frame object again keeps the cached crops.
+
+        Parameters
+        ----------
+        img : Mat
+            A cv :obj:`Mat` frame.
+        """
+        if img is not self.__img__:
+            self.__img__ = img
+            self.__slot_maps__ = {}
+
+    def reset(self):
+        """
+        Forget the current frame and its cached crops, the buffers are kept for reuse.
+        """
+        self.__img__ = None
+        self.__slot_maps__ = {}
+
+    def __getBuffer__(self, key, shape):
+        slot_map = self.__slot_maps__.setdefault(key, {})
+        buffer = self.__buffers__.get(key)
+        n = len(slot_map)
+        if buffer is None:
+            buffer = np.empty((max(self.init_capacity, 1),) + shape, dtype=np.uint8)
+            self.__buffers__[key] = buffer
+        elif n >= buffer.shape[0]:
+            grown = np.empty((buffer.shape[0] * 2,) + shape, dtype=np.uint8)
+            grown[:n] = buffer[:n]
+            buffer = grown
+            self.__buffers__[key] = buffer
+        return buffer, slot_map, n
+
+    def __frameShape__(self):
+        if self.__img__ is None:
+            msg = "FrameCropper : No frame is set, call setFrame() first."
+            raise ValueError(msg)
+        return self.__img__.shape
+
+    def getBodyCrop(self, box_xyxy, wh):
+        """
+        Get the crop of a bounding box resized to :obj:`wh`, for example the :obj:`model_wh`
+        of Torchreid. The bounding box is clipped at the frame boundaries.
+
+        Parameters
+        ----------
+        box_xyxy : ndarray
+            Bounding box :code:`[x1, y1, x2, y2]`.
+        wh : tuple(int, int)
+            The size (width, height) of the crop.
+
+        Returns
+        -------
+        ndarray
+            The crop, :code:`shape=(height, width, 3)`, a view of the internal buffer which is
+            valid until the next frame.
+        """
+        (h, w) = self.__frameShape__()[:2]
+        x1, y1, x2, y2 = [int(v) for v in box_xyxy]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x1 >= x2 or y1 >= y2:
+            msg = "FrameCropper : getBodyCrop() -> box_xyxy=" + str(list(box_xyxy)) + " is empty."
+            raise ValueError(msg)
+        key = ("body", int(wh[0]), int(wh[1]))
+        box = (x1, y1, x2, y2)
+        slot_map = self.__slot_maps__.get(key, {})
+        if box in slot_map:
+            return self.__buffers__[key][slot_map[box]]
+        buffer, slot_map, slot = self.__getBuffer__(key, (int(wh[1]), int(wh[0]), 3))
+        cv2.resize(self.__img__[y1:y2, x1:x2], (int(wh[0]), int(wh[1])), dst=buffer[slot])
+        slot_map[box] = slot
+        return buffer[slot]
+
+    def getBodyCrops(self, boxes_xyxy, wh):
+        """
+        Get the crops of multiple bounding boxes, see :meth:`getBodyCrop()`.
+
+        Parameters
+        ----------
+        boxes_xyxy : list[ndarray, ...]
+            A list of bounding boxes :code:`[x1, y1, x2, y2]`.
+        wh : tuple(int, int)
+            The size (width, height) of the crops.
+
+        Returns
+        -------
+        list[ndarray, ...]
+            A list of crops.
+        """
+        return [self.getBodyCrop(box, wh) for box in boxes_xyxy]
+
+    def __getPatchSlot__(self, box_xywh, patch_shape):
+        # Same geometry as DeepSORT's generate_detections.extract_image_patch()
+        bbox = np.array(box_xywh)
+        target_aspect = float(patch_shape[1]) / patch_shape[0]
+        new_width = target_aspect * bbox[3]
+        bbox[0] -= (new_width - bbox[2]) / 2
+        bbox[2] = new_width
+        bbox[2:] += bbox[:2]
+        bbox = bbox.astype(np.int32)
+        bbox[:2] = np.maximum(0, bbox[:2])
+        bbox[2:] = np.minimum(np.asarray(self.__frameShape__()[:2][::-1]) - 1, bbox[2:])
+        key = ("patch", int(patch_shape[0]), int(patch_shape[1]))
+        box = tuple(bbox.tolist())
+        slot_map = self.__slot_maps__.get(key, {})
+        if box in slot_map:
+            return key, slot_map[box]
+        buffer, slot_map, slot = self.__getBuffer__(key, (int(patch_shape[0]), int(patch_shape[1]), 3))
+        if np.any(bbox[:2] >= bbox[2:]):
+            add_warning_log("FrameCropper : getPatches() -> Failed to extract image patch: " + 
+                            str(np.asarray(box_xywh).tolist()))
+            buffer[slot] = np.random.uniform(0., 255., buffer.shape[1:]).astype(np.uint8)
+        else:
+            sx, sy, ex, ey = box
+            cv2.resize(self.__img__[sy:ey, sx:ex], (int(patch_shape[1]), int(patch_shape[0])),
+                       dst=buffer[slot])
+        slot_map[box] = slot
+        return key, slot
+
+    def getPatches(self, boxes_xywh, patch_shape):
+        """
+        Get the DeepSORT encoder patches of multiple bounding boxes. Like DeepSORT's
+        :code:`extract_image_patch()`, each bounding box is first adapted to the aspect ratio of
+        :obj:`patch_shape` and then clipped at the frame boundaries. An empty patch is filled
+        with random noise.
+
+        Parameters
+        ----------
+        boxes_xywh : list[ndarray, ...]
+            A list of bounding boxes :code:`[x, y, width, height]`.
+        patch_shape : tuple(int, int)
+            The shape (height, width) of the patches, for example :code:`image_shape[:2]` of
+            the DeepSORT encoder.
+
+        Returns
+        -------
+        ndarray
+            The patches, :code:`shape=(len(boxes_xywh), height, width, 3)`.
+        """
+        key = ("patch", int(patch_shape[0]), int(patch_shape[1]))
+        slots = [self.__getPatchSlot__(box, patch_shape)[1] for box in boxes_xywh]
+        if len(slots) == 0:
+            return np.empty((0, int(patch_shape[0]), int(patch_shape[1]), 3), dtype=np.uint8)
+        buffer = self.__buffers__[key]
+        if slots == list(range(slots[0], slots[0] + len(slots))):
+            return buffer[slots[0]:slots[0] + len(slots)]
+        return buffer[slots]
+
+    def getHeadRegion(self, repspoint, h_calibration, w_calibration):
+        """
+        Get the calibrated head region around a :obj:`repspoint`, for example the FaceNet
+        :obj:`yl_h_calibration` and :obj:`yl_w_calibration`. The region is clipped at the
+        frame boundaries and is not resized.
+
+        Parameters
+        ----------
+        repspoint : tuple(int, int)
+            Respesented 2D point (x, y).
+        h_calibration : list[int, int]
+            The [top, bottom] offsets from the :obj:`y` of the :obj:`repspoint`.
+        w_calibration : list[int, int]
+            The [left, right] offsets from the :obj:`x` of the :obj:`repspoint`.
+
+        Returns
+        -------
+        ndarray
+            The head region, a view of the frame.
+        """
+        (h, w) = self.__frameShape__()[:2]
+        (x, y) = repspoint
+        y1 = min(max(0, int(y) + int(h_calibration[0])), h)
+        y2 = min(max(0, int(y) + int(h_calibration[1])), h)
+        x1 = min(max(0, int(x) + int(w_calibration[0])), w)
+        x2 = min(max(0, int(x) + int(w_calibration[1])), w)
+        return self.__img__[y1:y2, x1:x2]
+
+    def getKeypointFace(self, keypoints, size, min_conf=0.5):
+        """
+        Get the aligned face crop of a person from its body keypoints, see 
+        :func:`getKeypointFaceTransform()`. The parts of the crop outside the frame are black.
+
+        Parameters
+        ----------
+        keypoints : ndarray
+            The keypoints of a person, :code:`shape=(number of keypoints, 2 or 3)`.
+        size : int
+            The side of the face crop, for example :obj:`image_size` of FaceNet.
+        min_conf : float, default=0.5
+            The minimum confidence of a used keypoint.
+
+        Returns
+        -------
+        ndarray or None
+            The face crop, :code:`shape=(size, size, 3)`, a view of the internal buffer which is 
+            valid until the next frame, or :code:`None` if the keypoints can't locate the face.
+        """
+        self.__frameShape__()
+        transform = getKeypointFaceTransform(keypoints, size, min_conf=min_conf)
+        if transform is None: return None
+        key = ("face", int(size))
+        box = tuple(np.round(transform, 6).ravel().tolist())
+        slot_map = self.__slot_maps__.get(key, {})
+        if box in slot_map:
+            return self.__buffers__[key][slot_map[box]]
+        buffer, slot_map, slot = self.__getBuffer__(key, (int(size), int(size), 3))
+        cv2.warpAffine(self.__img__, transform, (int(size), int(size)), dst=buffer[slot], 
+                       flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        slot_map[box] = slot
+        return buffer[slot]
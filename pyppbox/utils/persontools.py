@@ -19,6 +19,8 @@
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
 
+import copy
+import threading
 import numpy as np
 from pyppbox.config.unifiedstrings import UnifiedStrings
 
@@ -54,6 +56,9 @@ class Person(object):
         Confidence of :attr:`faceid`.
     deepid_conf : float, default=0.0
         Confidence of :attr:`deepid`.
+    predicted : bool, default=False
+        An indication of whether the person is predicted by the tracker's motion model on 
+        a frame without detection, see :func:`predictPerson()`.
     misc : list[], optional
         Miscellaneous items.
     """
@@ -116,6 +121,7 @@ class Person(object):
         self.deepid = deepid
         self.faceid_conf = faceid_conf
         self.deepid_conf = deepid_conf
+        self.predicted = False
         self.misc = []
 
     def updateIDs(self, new_cid, new_faceid, new_deepid, 
@@ -168,6 +174,620 @@ class Person(object):
               "\t" + str(self.facid) + "\t" + str(self.deepid))
 
 
+def predictPerson(person, box_xyxy):
+    """Get a copy of a :class:`Person` object moved to a predicted bounding :code:`box_xyxy`, 
+    for example the one given by a tracker's motion model on a frame without detection. The 
+    :attr:`repspoint` and the :attr:`keypoints` keep their relative positions inside the 
+    bounding box, and the copy is flagged with :code:`predicted=True`.
+
+    Parameters
+    ----------
+    person : Person
+        A :class:`Person` object, normally tracked in the previous frame.
+    box_xyxy : ndarray
+        Predicted bounding box :code:`[x1, y1, x2, y2]`.
+
+    Returns
+    -------
+    Person
+        The predicted :class:`Person` object.
+    """
+    # A copy of a view would still write into its PeopleFrame
+    if isinstance(person, PersonView): person = person.toPerson()
+    old = np.asarray(person.box_xyxy, dtype=np.float64)
+    new = np.asarray(box_xyxy, dtype=np.float64)[:4]
+    sx = (new[2] - new[0]) / max(old[2] - old[0], 1.0)
+    sy = (new[3] - new[1]) / max(old[3] - old[1], 1.0)
+    predicted = copy.copy(person)
+    predicted.box_xyxy = np.rint(new).astype(int)
+    predicted.box_xywh = np.array([predicted.box_xyxy[0], 
+                                   predicted.box_xyxy[1], 
+                                   predicted.box_xyxy[2] - predicted.box_xyxy[0], 
+                                   predicted.box_xyxy[3] - predicted.box_xyxy[1]])
+    predicted.repspoint = (int(new[0] + (person.repspoint[0] - old[0]) * sx), 
+                           int(new[1] + (person.repspoint[1] - old[1]) * sy))
+    if len(person.keypoints) > 0:
+        keypoints = person.keypoints
+        if hasattr(keypoints, "cpu"): keypoints = keypoints.cpu().numpy()
+        keypoints = np.array(keypoints, dtype=np.float64)
+        # Keep the undetected keypoints at (0, 0)
+        visible = np.any(keypoints[..., :2] != 0, axis=-1)
+        keypoints[..., 0] = np.where(visible, new[0] + (keypoints[..., 0] - old[0]) * sx, 0.0)
+        keypoints[..., 1] = np.where(visible, new[1] + (keypoints[..., 1] - old[1]) * sy, 0.0)
+        predicted.keypoints = keypoints
+    predicted.misc = list(person.misc)
+    predicted.predicted = True
+    return predicted
+
+
+class PeopleFrame(object):
+
+    """
+    A class used to represent all people in a single frame as a struct of arrays, one row per 
+    person, so the detectors, trackers, reiders, :class:`ResIO`, and :func:`visualizePeople` can 
+    work on whole arrays instead of converting the :class:`Person` objects one by one. Iterating 
+    or indexing a :class:`PeopleFrame` with an int gives a :class:`PersonView`, which behaves 
+    like a :class:`Person` and reads and writes the row of that person, so the code written for 
+    a list of :class:`Person` also works on a :class:`PeopleFrame`.
+
+    The face IDs and deep IDs are stored as indices into a string table shared by all 
+    :class:`PeopleFrame` objects, see :meth:`getIDName()` and :meth:`getIDIndex()`.
+
+    Example:
+
+    >>> frame = PeopleFrame(boxes_xyxy=np.array([[10, 20, 60, 200]]), det_confs=[0.9])
+    >>> dets = frame.getDets()          # ndarray, shape=(1, 5)
+    >>> frame[0].cid = 7                # Same as frame.cids[0] = 7
+    >>> people = frame.toPeople()       # list[Person, ...]
+
+    Attributes
+    ----------
+    init_ids : ndarray
+        Initial IDs, :code:`shape=(N,)`, :code:`dtype=int`.
+    cids : ndarray
+        Current IDs, :code:`shape=(N,)`, :code:`dtype=int`.
+    boxes_xywh : ndarray
+        Bounding boxes :code:`[x, y, width, height]`, :code:`shape=(N, 4)`, :code:`dtype=int`.
+    boxes_xyxy : ndarray
+        Bounding boxes :code:`[x1, y1, x2, y2]`, :code:`shape=(N, 4)`, :code:`dtype=int`.
+    repspoints : ndarray
+        Respesented 2D points :code:`[x, y]`, :code:`shape=(N, 2)`, :code:`dtype=int`.
+    det_confs : ndarray
+        Confidences of detection, :code:`shape=(N,)`.
+    keypoints : ndarray or None
+        Keypoints of the bodies, :code:`shape=(N, number of keypoints, 2 or 3)`, or 
+        :code:`None` if the detector gives no keypoints.
+    faceid_indices : ndarray
+        Indices of the face IDs in the shared string table, :code:`shape=(N,)`.
+    deepid_indices : ndarray
+        Indices of the deep IDs in the shared string table, :code:`shape=(N,)`.
+    faceid_confs : ndarray
+        Confidences of the face IDs, :code:`shape=(N,)`.
+    deepid_confs : ndarray
+        Confidences of the deep IDs, :code:`shape=(N,)`.
+    predicted : ndarray
+        Indications of whether the people are predicted by the tracker's motion model, 
+        :code:`shape=(N,)`, :code:`dtype=bool`.
+    misc : list[list[], ...]
+        Miscellaneous items of every person.
+    """
+
+    __id_names__ = []
+    __id_table__ = {}
+    __id_lock__ = threading.Lock()
+
+    def __init__(self, 
+                 boxes_xyxy=None, 
+                 boxes_xywh=None, 
+                 repspoints=None, 
+                 det_confs=None, 
+                 keypoints=None, 
+                 cids=None, 
+                 init_ids=None):
+        """
+        Construct a PeopleFrame from the arrays of a detector, only one of :obj:`boxes_xyxy` 
+        and :obj:`boxes_xywh` is needed. All people are unknown with the default confidences 
+        of :class:`Person`.
+
+        Parameters
+        ----------
+        boxes_xyxy : ndarray, optional
+            Bounding boxes :code:`[x1, y1, x2, y2]`, :code:`shape=(N, 4)`.
+        boxes_xywh : ndarray, optional
+            Bounding boxes :code:`[x, y, width, height]`, :code:`shape=(N, 4)`.
+        repspoints : ndarray, optional
+            Respesented 2D points :code:`[x, y]`, :code:`shape=(N, 2)`, default to 
+            :code:`(0, 0)` like :class:`Person`.
+        det_confs : ndarray, optional
+            Confidences of detection, :code:`shape=(N,)`, default to 0.5 like :class:`Person`.
+        keypoints : ndarray, optional
+            Keypoints of the bodies, :code:`shape=(N, number of keypoints, 2 or 3)`.
+        cids : ndarray, optional
+            Current IDs, default to :code:`[0, 1, ..., N-1]`.
+        init_ids : ndarray, optional
+            Initial IDs, default to :obj:`cids`.
+        """
+        if boxes_xyxy is not None:
+            self.boxes_xyxy = np.array(boxes_xyxy, dtype=int).reshape(-1, 4)
+            self.boxes_xywh = self.boxes_xyxy.copy()
+            self.boxes_xywh[:, 2:] -= self.boxes_xyxy[:, :2]
+        elif boxes_xywh is not None:
+            self.boxes_xywh = np.array(boxes_xywh, dtype=int).reshape(-1, 4)
+            self.boxes_xyxy = self.boxes_xywh.copy()
+            self.boxes_xyxy[:, 2:] += self.boxes_xywh[:, :2]
+        else:
+            self.boxes_xyxy = np.empty((0, 4), dtype=int)
+            self.boxes_xywh = np.empty((0, 4), dtype=int)
+        n = len(self.boxes_xyxy)
+        if repspoints is None: self.repspoints = np.zeros((n, 2), dtype=int)
+        else: self.repspoints = np.array(repspoints, dtype=int).reshape(-1, 2)
+        if det_confs is None: self.det_confs = np.full(n, 0.5)
+        else: self.det_confs = np.array(det_confs, dtype=np.float64).reshape(-1)
+        if keypoints is None or len(keypoints) == 0: self.keypoints = None
+        else: self.keypoints = np.array(keypoints, dtype=np.float32)
+        if cids is None: self.cids = np.arange(n, dtype=int)
+        else: self.cids = np.array(cids, dtype=int).reshape(-1)
+        if init_ids is None: self.init_ids = self.cids.copy()
+        else: self.init_ids = np.array(init_ids, dtype=int).reshape(-1)
+        self.faceid_indices = np.full(n, PeopleFrame.getIDIndex(__ustrings__.unk_fid), dtype=int)
+        self.deepid_indices = np.full(n, PeopleFrame.getIDIndex(__ustrings__.unk_did), dtype=int)
+        self.faceid_confs = np.full(n, 100.0)
+        self.deepid_confs = np.full(n, 100.0)
+        self.predicted = np.zeros(n, dtype=bool)
+        self.misc = [[] for _ in range(n)]
+
+    @staticmethod
+    def getIDIndex(name):
+        """Get the index of a face ID or deep ID in the shared string table, the ID is added 
+        to the table if it is new.
+
+        Parameters
+        ----------
+        name : str
+            A face ID or deep ID.
+
+        Returns
+        -------
+        int
+            The index of :obj:`name`.
+        """
+        index = PeopleFrame.__id_table__.get(name)
+        if index is None:
+            with PeopleFrame.__id_lock__:
+                index = PeopleFrame.__id_table__.get(name)
+                if index is None:
+                    index = len(PeopleFrame.__id_names__)
+                    PeopleFrame.__id_names__.append(name)
+                    PeopleFrame.__id_table__[name] = index
+        return index
+
+    @staticmethod
+    def getIDName(index):
+        """Get the face ID or deep ID of an index of the shared string table.
+
+        Parameters
+        ----------
+        index : int
+            An index given by :meth:`getIDIndex()`.
+
+        Returns
+        -------
+        str
+            The face ID or deep ID.
+        """
+        return PeopleFrame.__id_names__[int(index)]
+
+    @property
+    def faceids(self):
+        """list[str, ...] : The face IDs of all people."""
+        return [PeopleFrame.__id_names__[i] for i in self.faceid_indices]
+
+    @property
+    def deepids(self):
+        """list[str, ...] : The deep IDs of all people."""
+        return [PeopleFrame.__id_names__[i] for i in self.deepid_indices]
+
+    def __len__(self):
+        return len(self.cids)
+
+    def __iter__(self):
+        for i in range(len(self.cids)):
+            yield PersonView(self, i)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0: index += len(self.cids)
+            if index < 0 or index >= len(self.cids):
+                raise IndexError("PeopleFrame index out of range")
+            return PersonView(self, int(index))
+        return self.select(index)
+
+    def select(self, indices):
+        """Get a new :class:`PeopleFrame` of some people, the arrays are copied.
+
+        Parameters
+        ----------
+        indices : list[int, ...] or ndarray or slice
+            The indices, a boolean mask, or a slice of the people to select.
+
+        Returns
+        -------
+        PeopleFrame
+            The selected people.
+        """
+        if not isinstance(indices, slice):
+            indices = np.asarray(indices)
+            if indices.dtype == bool: indices = np.flatnonzero(indices)
+            indices = indices.astype(int).reshape(-1)
+        selected = PeopleFrame.__new__(PeopleFrame)
+        selected.init_ids = self.init_ids[indices].copy()
+        selected.cids = self.cids[indices].copy()
+        selected.boxes_xywh = self.boxes_xywh[indices].copy()
+        selected.boxes_xyxy = self.boxes_xyxy[indices].copy()
+        selected.repspoints = self.repspoints[indices].copy()
+        selected.det_confs = self.det_confs[indices].copy()
+        selected.keypoints = None if self.keypoints is None else self.keypoints[indices].copy()
+        selected.faceid_indices = self.faceid_indices[indices].copy()
+        selected.deepid_indices = self.deepid_indices[indices].copy()
+        selected.faceid_confs = self.faceid_confs[indices].copy()
+        selected.deepid_confs = self.deepid_confs[indices].copy()
+        selected.predicted = self.predicted[indices].copy()
+        if isinstance(indices, slice): selected.misc = [list(m) for m in self.misc[indices]]
+        else: selected.misc = [list(self.misc[i]) for i in indices]
+        return selected
+
+    @staticmethod
+    def fromPeople(people):
+        """Get a :class:`PeopleFrame` of a list of :class:`Person` object. A list of 
+        :class:`PersonView` of the same :class:`PeopleFrame` is converted by 
+        :meth:`select()` without touching each person.
+
+        Parameters
+        ----------
+        people : list[Person, ...] or PeopleFrame
+            A list of :class:`Person` object, a :class:`PeopleFrame` is returned as it is.
+
+        Returns
+        -------
+        PeopleFrame
+            The people as a :class:`PeopleFrame`.
+        """
+        if isinstance(people, PeopleFrame): return people
+        if len(people) == 0: return PeopleFrame()
+        if isinstance(people[0], PersonView):
+            frame = people[0].frame
+            if all(isinstance(p, PersonView) and p.frame is frame for p in people):
+                return frame.select([p.index for p in people])
+        frame = PeopleFrame(boxes_xyxy=[p.box_xyxy for p in people], 
+                            repspoints=[p.repspoint for p in people], 
+                            det_confs=[p.det_conf for p in people], 
+                            cids=[p.cid for p in people], 
+                            init_ids=[p.init_id for p in people])
+        frame.boxes_xywh = np.array([p.box_xywh for p in people], dtype=int).reshape(-1, 4)
+        keypoints = [p.keypoints for p in people]
+        if all(len(k) > 0 for k in keypoints):
+            frame.keypoints = np.array([k.cpu().numpy() if hasattr(k, "cpu") else k 
+                                        for k in keypoints], dtype=np.float32)
+        frame.faceid_indices = np.array([PeopleFrame.getIDIndex(p.faceid) for p in people], dtype=int)
+        frame.deepid_indices = np.array([PeopleFrame.getIDIndex(p.deepid) for p in people], dtype=int)
+        frame.faceid_confs = np.array([p.faceid_conf for p in people], dtype=np.float64)
+        frame.deepid_confs = np.array([p.deepid_conf for p in people], dtype=np.float64)
+        frame.predicted = np.array([getattr(p, "predicted", False) for p in people], dtype=bool)
+        frame.misc = [list(p.misc) for p in people]
+        return frame
+
+    def toPeople(self):
+        """Get a list of independent :class:`Person` object of all people.
+
+        Returns
+        -------
+        list[Person, ...]
+            A list of :class:`Person` object.
+        """
+        return [view.toPerson() for view in self]
+
+    def getDets(self):
+        """Get a numpy array of detection bounding boxes with confidences in shape (N, 5), 
+        the same as stacking :meth:`Person.getDet()` of all people.
+
+        Returns
+        -------
+        ndarray
+            Numpy array of x1, y1, x2, y2, and confidence of all people.
+        """
+        return np.concatenate((self.boxes_xyxy, self.det_confs[:, None]), axis=1)
+
+    def copyIDsFrom(self, other, indices=None):
+        """Copy the face IDs, deep IDs, and their confidences of the people of :obj:`other` 
+        who have the same :attr:`cids`, for example the people tracked in the previous frame.
+
+        Parameters
+        ----------
+        other : PeopleFrame or list[Person, ...]
+            The people to copy the IDs from.
+        indices : list[int, ...], default=None
+            Only copy the IDs of these people, set :code:`indices=None` for all people.
+        """
+        other = PeopleFrame.fromPeople(other)
+        if len(other) == 0 or len(self) == 0: return
+        rows = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=int).reshape(-1)
+        if len(rows) == 0: return
+        # The first person of each cid in other, like a linear search would give
+        other_cids, first = np.unique(other.cids, return_index=True)
+        pos = np.clip(np.searchsorted(other_cids, self.cids[rows]), 0, len(other_cids) - 1)
+        found = other_cids[pos] == self.cids[rows]
+        rows, src = rows[found], first[pos[found]]
+        self.faceid_indices[rows] = other.faceid_indices[src]
+        self.deepid_indices[rows] = other.deepid_indices[src]
+        self.faceid_confs[rows] = other.faceid_confs[src]
+        self.deepid_confs[rows] = other.deepid_confs[src]
+
+    def predict(self, boxes_xyxy):
+        """Get a copy of all people moved to the predicted bounding boxes, the vectorized 
+        :func:`predictPerson()`.
+
+        Parameters
+        ----------
+        boxes_xyxy : ndarray
+            Predicted bounding boxes :code:`[x1, y1, x2, y2]`, :code:`shape=(N, 4)`.
+
+        Returns
+        -------
+        PeopleFrame
+            The predicted people flagged with :code:`predicted=True`.
+        """
+        old = self.boxes_xyxy.astype(np.float64)
+        new = np.asarray(boxes_xyxy, dtype=np.float64).reshape(-1, 4)[:, :4]
+        sx = (new[:, 2] - new[:, 0]) / np.maximum(old[:, 2] - old[:, 0], 1.0)
+        sy = (new[:, 3] - new[:, 1]) / np.maximum(old[:, 3] - old[:, 1], 1.0)
+        predicted = self.select(slice(None))
+        predicted.boxes_xyxy = np.rint(new).astype(int)
+        predicted.boxes_xywh = predicted.boxes_xyxy.copy()
+        predicted.boxes_xywh[:, 2:] -= predicted.boxes_xyxy[:, :2]
+        predicted.repspoints = np.stack(
+            (np.trunc(new[:, 0] + (self.repspoints[:, 0] - old[:, 0]) * sx), 
+             np.trunc(new[:, 1] + (self.repspoints[:, 1] - old[:, 1]) * sy)), axis=1
+        ).astype(int)
+        if self.keypoints is not None:
+            keypoints = self.keypoints.astype(np.float64)
+            # Keep the undetected keypoints at (0, 0)
+            visible = np.any(keypoints[..., :2] != 0, axis=-1)
+            keypoints[..., 0] = np.where(visible, new[:, None, 0] + 
+                                         (keypoints[..., 0] - old[:, None, 0]) * sx[:, None], 0.0)
+            keypoints[..., 1] = np.where(visible, new[:, None, 1] + 
+                                         (keypoints[..., 1] - old[:, None, 1]) * sy[:, None], 0.0)
+            predicted.keypoints = keypoints.astype(np.float32)
+        predicted.predicted[:] = True
+        return predicted
+
+    def getState(self):
+        """Get a snapshot of all people as a dictionary of numpy arrays, which can be saved
+        by :func:`pyppbox.utils.statetools.saveState()` without pickling. The face IDs and
+        deep IDs are stored as strings, because the shared string table differs between
+        processes. The :attr:`misc` items are not included.
+
+        Returns
+        -------
+        dict[str, ndarray]
+            The copied arrays of all people.
+        """
+        state = {'init_ids': self.init_ids.copy(),
+                 'cids': self.cids.copy(),
+                 'boxes_xywh': self.boxes_xywh.copy(),
+                 'boxes_xyxy': self.boxes_xyxy.copy(),
+                 'repspoints': self.repspoints.copy(),
+                 'det_confs': self.det_confs.copy(),
+                 'faceids': np.array(self.faceids, dtype=str),
+                 'deepids': np.array(self.deepids, dtype=str),
+                 'faceid_confs': self.faceid_confs.copy(),
+                 'deepid_confs': self.deepid_confs.copy(),
+                 'predicted': self.predicted.copy()}
+        if self.keypoints is not None: state['keypoints'] = self.keypoints.copy()
+        return state
+
+    @staticmethod
+    def fromState(state):
+        """Get a :class:`PeopleFrame` of a snapshot given by :meth:`getState()`.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A snapshot given by :meth:`getState()`.
+
+        Returns
+        -------
+        PeopleFrame
+            The people of the snapshot.
+        """
+        frame = PeopleFrame.__new__(PeopleFrame)
+        frame.init_ids = np.array(state['init_ids'], dtype=int).reshape(-1)
+        frame.cids = np.array(state['cids'], dtype=int).reshape(-1)
+        frame.boxes_xywh = np.array(state['boxes_xywh'], dtype=int).reshape(-1, 4)
+        frame.boxes_xyxy = np.array(state['boxes_xyxy'], dtype=int).reshape(-1, 4)
+        frame.repspoints = np.array(state['repspoints'], dtype=int).reshape(-1, 2)
+        frame.det_confs = np.array(state['det_confs'], dtype=np.float64).reshape(-1)
+        if 'keypoints' in state: frame.keypoints = np.array(state['keypoints'], dtype=np.float32)
+        else: frame.keypoints = None
+        frame.faceid_indices = np.array([PeopleFrame.getIDIndex(str(n)) for n in state['faceids']],
+                                        dtype=int)
+        frame.deepid_indices = np.array([PeopleFrame.getIDIndex(str(n)) for n in state['deepids']],
+                                        dtype=int)
+        frame.faceid_confs = np.array(state['faceid_confs'], dtype=np.float64).reshape(-1)
+        frame.deepid_confs = np.array(state['deepid_confs'], dtype=np.float64).reshape(-1)
+        frame.predicted = np.array(state['predicted'], dtype=bool).reshape(-1)
+        frame.misc = [[] for _ in range(len(frame.cids))]
+        return frame
+
+
+class PersonView(Person):
+
+    """
+    A class used to represent a person of a :class:`PeopleFrame`. It is a :class:`Person` 
+    whose attributes read and write the row :attr:`index` of the arrays of :attr:`frame`, 
+    so it stays valid only as long as the rows of :attr:`frame` are not reordered.
+
+    Attributes
+    ----------
+    frame : PeopleFrame
+        The :class:`PeopleFrame` object of the person.
+    index : int
+        The row of the person in :attr:`frame`.
+    """
+
+    def __init__(self, frame, index):
+        """
+        Construct a PersonView.
+
+        Parameters
+        ----------
+        frame : PeopleFrame
+            The :class:`PeopleFrame` object of the person.
+        index : int
+            The row of the person in :obj:`frame`.
+        """
+        self.__dict__['frame'] = frame
+        self.__dict__['index'] = index
+
+    def __setattr__(self, name, value):
+        if name in ('frame', 'index'):
+            raise AttributeError("PersonView : '" + name + "' can't be changed.")
+        object.__setattr__(self, name, value)
+
+    def toPerson(self):
+        """Get an independent :class:`Person` object of this person.
+
+        Returns
+        -------
+        Person
+            A :class:`Person` object.
+        """
+        person = Person(self.init_id, 
+                        self.cid, 
+                        box_xywh=self.box_xywh.copy(), 
+                        box_xyxy=self.box_xyxy.copy(), 
+                        keypoints=[] if self.frame.keypoints is None else self.keypoints.copy(), 
+                        repspoint=self.repspoint, 
+                        det_conf=self.det_conf, 
+                        faceid=self.faceid, 
+                        deepid=self.deepid, 
+                        faceid_conf=self.faceid_conf, 
+                        deepid_conf=self.deepid_conf)
+        person.predicted = self.predicted
+        person.misc = list(self.misc)
+        return person
+
+    @property
+    def init_id(self):
+        return int(self.frame.init_ids[self.index])
+
+    @init_id.setter
+    def init_id(self, value):
+        self.frame.init_ids[self.index] = value
+
+    @property
+    def cid(self):
+        return int(self.frame.cids[self.index])
+
+    @cid.setter
+    def cid(self, value):
+        self.frame.cids[self.index] = value
+
+    @property
+    def box_xywh(self):
+        return self.frame.boxes_xywh[self.index]
+
+    @box_xywh.setter
+    def box_xywh(self, value):
+        self.frame.boxes_xywh[self.index] = value
+
+    @property
+    def box_xyxy(self):
+        return self.frame.boxes_xyxy[self.index]
+
+    @box_xyxy.setter
+    def box_xyxy(self, value):
+        self.frame.boxes_xyxy[self.index] = value
+
+    @property
+    def keypoints(self):
+        if self.frame.keypoints is None: return []
+        return self.frame.keypoints[self.index]
+
+    @keypoints.setter
+    def keypoints(self, value):
+        if hasattr(value, "cpu"): value = value.cpu().numpy()
+        if len(value) == 0: return
+        if self.frame.keypoints is None:
+            value = np.asarray(value, dtype=np.float32)
+            self.frame.keypoints = np.zeros((len(self.frame),) + value.shape, dtype=np.float32)
+        self.frame.keypoints[self.index] = value
+
+    @property
+    def repspoint(self):
+        (x, y) = self.frame.repspoints[self.index]
+        return (int(x), int(y))
+
+    @repspoint.setter
+    def repspoint(self, value):
+        self.frame.repspoints[self.index] = value
+
+    @property
+    def det_conf(self):
+        return float(self.frame.det_confs[self.index])
+
+    @det_conf.setter
+    def det_conf(self, value):
+        self.frame.det_confs[self.index] = value
+
+    @property
+    def faceid(self):
+        return PeopleFrame.getIDName(self.frame.faceid_indices[self.index])
+
+    @faceid.setter
+    def faceid(self, value):
+        self.frame.faceid_indices[self.index] = PeopleFrame.getIDIndex(value)
+
+    @property
+    def deepid(self):
+        return PeopleFrame.getIDName(self.frame.deepid_indices[self.index])
+
+    @deepid.setter
+    def deepid(self, value):
+        self.frame.deepid_indices[self.index] = PeopleFrame.getIDIndex(value)
+
+    @property
+    def faceid_conf(self):
+        return float(self.frame.faceid_confs[self.index])
+
+    @faceid_conf.setter
+    def faceid_conf(self, value):
+        self.frame.faceid_confs[self.index] = value
+
+    @property
+    def deepid_conf(self):
+        return float(self.frame.deepid_confs[self.index])
+
+    @deepid_conf.setter
+    def deepid_conf(self, value):
+        self.frame.deepid_confs[self.index] = value
+
+    @property
+    def predicted(self):
+        return bool(self.frame.predicted[self.index])
+
+    @predicted.setter
+    def predicted(self, value):
+        self.frame.predicted[self.index] = value
+
+    @property
+    def misc(self):
+        return self.frame.misc[self.index]
+
+    @misc.setter
+    def misc(self, value):
+        self.frame.misc[self.index] = value
+
+
 #####################################################################################
 
 
@@ -225,6 +845,55 @@ def findRepspointBB(box_xyxy, prefer_top=True):
     return (x, y)
 
 
+def findRepspoints(boxes_xyxy, calibrate_weight):
+    """Vectorized :func:`findRepspoint()` for multiple bounding boxes at once, the results 
+    are the same as calling :func:`findRepspoint()` on every bounding box.
+
+    Parameters
+    ----------
+    boxes_xyxy : ndarray
+        Bounding boxes :code:`[[x1, y1, x2, y2], ...]`, :code:`shape=(N, 4)`.
+    calibrate_weight : float
+        Calibration weight.
+
+    Returns
+    -------
+    ndarray
+        Respesented 2D points :code:`[[x, y], ...]`, :code:`shape=(N, 2)`, :code:`dtype=int`.
+    """
+    boxes = np.asarray(boxes_xyxy).reshape(-1, 4)
+    x = np.trunc((boxes[:, 0] + boxes[:, 2]) / 2)
+    y_start = np.minimum(boxes[:, 1], boxes[:, 3])
+    y_dist = np.abs(boxes[:, 1] - boxes[:, 3])
+    y = np.trunc(y_start + calibrate_weight*y_dist)
+    return np.stack((x, y), axis=1).astype(int)
+
+
+def findRepspointsBB(boxes_xyxy, prefer_top=True):
+    """Vectorized :func:`findRepspointBB()` for multiple bounding boxes at once, the results 
+    are the same as calling :func:`findRepspointBB()` on every bounding box.
+
+    Parameters
+    ----------
+    boxes_xyxy : ndarray
+        Bounding boxes :code:`[[x1, y1, x2, y2], ...]`, :code:`shape=(N, 4)`.
+    prefer_top : bool, default=True
+        Decide whether :code:`y` is at the top or bottom of the bounding boxes.
+
+    Returns
+    -------
+    ndarray
+        Respesented 2D points :code:`[[x, y], ...]`, :code:`shape=(N, 2)`, :code:`dtype=int`.
+    """
+    boxes = np.asarray(boxes_xyxy).reshape(-1, 4)
+    x = np.trunc((boxes[:, 0] + boxes[:, 2]) / 2)
+    if prefer_top:
+        y = np.minimum(boxes[:, 1], boxes[:, 3])
+    else:
+        y = np.maximum(boxes[:, 1], boxes[:, 3])
+    return np.stack((x, y), axis=1).astype(int)
+
+
 def findRepspointUP(keypoint, box_xyxy, calibrate_weight, prefer_box=True):
     """Find respesented point :code:`(x, y)` of a :class:`Person` object by its
     YOLOv8 pose :code:`keypoint` (17 keypoints) or by the bounding :code:`box_xyxy` 
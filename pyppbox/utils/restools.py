@@ -21,7 +21,7 @@
 
 import numpy as np
 
-from .persontools import Person
+from .persontools import Person, PeopleFrame
 from .logtools import add_info_log, add_warning_log
 from .commontools import (joinFPathFull, getGlobalRootDir, isExist, 
                           getAbsPathFDS, getTimestamp)
@@ -75,10 +75,13 @@ class ResIO(object):
         ----------
         frame : int
             A frame index.
-        people : list[Person, ...]
-            A list of object :class:`Person`.
+        people : list[Person, ...] or PeopleFrame
+            A list of object :class:`Person` or a :class:`PeopleFrame`.
         """
-        if isinstance(people, list):
+        if isinstance(people, PeopleFrame):
+            self.frames.extend([str(frame)] * len(people))
+            self.people.extend(people)
+        elif isinstance(people, list):
             if len(people) > 0:
                 if isinstance(people[0], Person):
                     for person in people:
@@ -0,0 +1,243 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#                                                                           #
+#   pyppbox: Toolbox for people detecting, tracking, and re-identifying.    #
+#   Copyright (C) 2022 UMONS-Numediart                                      #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published by    #
+#   the Free Software Foundation, either version 3 of the License, or       #
+#   (at your option) any later version.                                     #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the           #
+#   GNU General Public License for more details.                            #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.  #
+#                                                                           #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+
+
+"""
+Tools to checkpoint the states of the trackers and :class:`pyppbox.standalone.mt.MT`. A state 
+is a flat dictionary of numpy arrays, e.g. given by :meth:`MySORT.getState()`, which is saved as 
+an uncompressed :code:`.npz` file without pickling, so a restarted process can resume its IDs 
+and identities by :meth:`setState()` without warming up the tracker again.
+
+Example:
+
+>>> from pyppbox.standalone import MT
+>>> from pyppbox.utils.statetools import saveState, loadState
+>>> 
+>>> ppbmt = MT()
+>>> ppbmt.setMainModules()
+>>> ...
+>>> saveState(ppbmt.getState(), "stream_1.npz")
+>>> 
+>>> # After a restart
+>>> ppbmt = MT()
+>>> ppbmt.setMainModules()
+>>> ppbmt.setState(loadState("stream_1.npz"))
+
+"""
+
+
+import os
+import threading
+import numpy as np
+
+from .persontools import PeopleFrame
+from .logtools import add_error_log, add_warning_log
+
+
+def saveState(state, state_file):
+    """Save a state as an uncompressed :code:`.npz` file. The file is written next to 
+    :obj:`state_file` first and then renamed, so an existing :obj:`state_file` is never left 
+    half written.
+
+    Parameters
+    ----------
+    state : dict[str, ndarray]
+        A flat dictionary of numpy arrays, the arrays of Python objects are not supported.
+    state_file : str
+        The path of the :code:`.npz` file.
+    """
+    arrays = {}
+    for key, value in state.items():
+        array = np.asarray(value)
+        if array.dtype == object:
+            msg = "saveState() -> The state '" + str(key) + "' is not a numeric or string array."
+            add_error_log(msg)
+            raise ValueError(msg)
+        arrays[key] = array
+    tmp_file = str(state_file) + ".tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_file, state_file)
+
+def loadState(state_file):
+    """Load a state saved by :func:`saveState()`.
+
+    Parameters
+    ----------
+    state_file : str
+        The path of the :code:`.npz` file.
+
+    Returns
+    -------
+    dict[str, ndarray]
+        The flat dictionary of numpy arrays.
+    """
+    with np.load(state_file, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+def nestState(state, prefix):
+    """Prefix all keys of a state, so that the states of multiple objects can be saved in one 
+    flat dictionary.
+
+    Parameters
+    ----------
+    state : dict[str, ndarray]
+        A state.
+    prefix : str
+        The prefix, joined to the keys with a dot.
+
+    Returns
+    -------
+    dict[str, ndarray]
+        The state with prefixed keys.
+    """
+    return {prefix + "." + key: value for key, value in state.items()}
+
+def getSubState(state, prefix):
+    """Get the state nested by :func:`nestState()` with :obj:`prefix`.
+
+    Parameters
+    ----------
+    state : dict[str, ndarray]
+        A state which contains the keys prefixed by :obj:`prefix`.
+    prefix : str
+        The prefix.
+
+    Returns
+    -------
+    dict[str, ndarray]
+        The state without the prefix.
+    """
+    head = prefix + "."
+    return {key[len(head):]: value for key, value in state.items() if key.startswith(head)}
+
+def getPeopleState(people):
+    """Get the state of a list of :class:`Person` or a :class:`PeopleFrame`, see 
+    :meth:`PeopleFrame.getState()`.
+
+    Parameters
+    ----------
+    people : list[Person, ...] or PeopleFrame
+        The people, for example the last tracked people of a tracker.
+
+    Returns
+    -------
+    dict[str, ndarray]
+        The state of the people.
+    """
+    state = PeopleFrame.fromPeople(people).getState()
+    state['is_frame'] = np.array(isinstance(people, PeopleFrame))
+    return state
+
+def getPeopleFromState(state):
+    """Get the people of a state given by :func:`getPeopleState()`.
+
+    Parameters
+    ----------
+    state : dict[str, ndarray]
+        The state of the people.
+
+    Returns
+    -------
+    list[Person, ...] or PeopleFrame
+        A :class:`PeopleFrame` if the people were a :class:`PeopleFrame`; otherwise, a list of 
+        :class:`Person` object.
+    """
+    if len(state) == 0: return []
+    frame = PeopleFrame.fromState(state)
+    if bool(state.get('is_frame', True)): return frame
+    return frame.toPeople()
+
+
+class StateWriter(object):
+
+    """A background writer of the states given by :meth:`write()`. Only the latest state waiting 
+    to be written is kept, so a slow disk never blocks or piles up behind the caller.
+
+    Attributes
+    ----------
+    state_file : str
+        The path of the :code:`.npz` file.
+    """
+
+    def __init__(self, state_file):
+        """Initialize and start the writer thread.
+
+        Parameters
+        ----------
+        state_file : str
+            The path of the :code:`.npz` file, see :func:`saveState()`.
+        """
+        self.state_file = state_file
+        self.__pending__ = None
+        self.__busy__ = False
+        self.__closed__ = False
+        self.__cond__ = threading.Condition()
+        self.__thread__ = threading.Thread(target=self.__run__, daemon=True)
+        self.__thread__.start()
+
+    def __run__(self):
+        while True:
+            with self.__cond__:
+                while self.__pending__ is None and not self.__closed__:
+                    self.__cond__.wait()
+                if self.__pending__ is None: return
+                state, self.__pending__ = self.__pending__, None
+                self.__busy__ = True
+            try:
+                saveState(state, self.state_file)
+            except Exception as e:
+                add_warning_log("StateWriter : Unable to write '" + str(self.state_file) + 
+                                "' -> " + str(e))
+            with self.__cond__:
+                self.__busy__ = False
+                self.__cond__.notify_all()
+
+    def write(self, state):
+        """Queue a state to be written, replacing the state still waiting if any. The arrays 
+        must not be modified afterward, e.g. use the copies given by :meth:`getState()`.
+
+        Parameters
+        ----------
+        state : dict[str, ndarray]
+            A state.
+        """
+        with self.__cond__:
+            if self.__closed__:
+                msg = "StateWriter : write() -> The writer is closed."
+                add_error_log(msg)
+                raise ValueError(msg)
+            self.__pending__ = state
+            self.__cond__.notify_all()
+
+    def flush(self):
+        """Wait until the queued state is written."""
+        with self.__cond__:
+            while self.__pending__ is not None or self.__busy__:
+                self.__cond__.wait()
+
+    def close(self):
+        """Write the queued state and stop the writer thread."""
+        with self.__cond__:
+            self.__closed__ = True
+            self.__cond__.notify_all()
+        self.__thread__.join()
+
@@ -22,7 +22,7 @@
 import cv2
 import numpy as np
 
-from .persontools import Person
+from .persontools import Person, PeopleFrame
 from .commontools import getCVMat
 from .logtools import add_error_log, add_warning_log
 
@@ -108,8 +108,9 @@ def visualizePeople(img, people, show_box=True, show_skl=(True,True,5), show_ids
     ----------
     img : str or Mat
         An image file or a cv :obj:`Mat`.
-    people : list[Person, ...]
-        Set a list of :class:`Person` object found in the input :obj:`img`.
+    people : list[Person, ...] or PeopleFrame
+        Set a list of :class:`Person` object or a :class:`PeopleFrame` found in the input 
+        :obj:`img`.
     show_box : bool, default=True
         Indicate whether to visualize bounding boxes.
     show_skl : tuple(bool, bool, int), default=(True,True,5)
@@ -138,7 +139,7 @@ def visualizePeople(img, people, show_box=True, show_skl=(True,True,5), show_ids
     # Overwrite `img_is_mat` to False when `img` is a file.
     if img_is_mat and isinstance(img, str): img_is_mat = False
     if not img_is_mat: img = getCVMat(img)
-    if isinstance(people, list):
+    if isinstance(people, (list, PeopleFrame)):
         if len(people) > 0:
             if isinstance(people[0], Person):
                 (h, w, c) = img.shape